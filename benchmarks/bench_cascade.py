@@ -0,0 +1,80 @@
+"""Compare the triage -> Sonnet model cascade with assessing every patient on Sonnet.
+
+Screens a synthetic cohort through the concurrent engine twice with a scripted fake client
+(fake_clients.cascade_script): once on ASSESSMENT_MODEL only and once with --cascade behaviour.
+Each model answers after its own simulated latency. Reports the escalation rate, wall-clock
+time, per-assessment end-to-end latency and estimated cost of both runs.
+
+Usage:
+    python benchmarks/bench_cascade.py [--patients 200] [--sonnet-latency 2.0] [--triage-latency 0.8]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import fake_clients
+from common import load_screener, write_synthetic_patients
+
+
+def run(screener, patients, client, concurrency, cascade=None):
+    """Screen patients on a fresh telemetry collector; return (results, seconds, metrics)."""
+    screener.run_metrics = screener.CallMetrics()
+    scheduler = screener.RateLimitScheduler(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9,
+                                            max_concurrency=concurrency)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(screener.screen_patients_async(
+            patients, None, concurrency, api_client=client, scheduler=scheduler, cascade=cascade
+        ))
+    return results, time.perf_counter() - start, screener.run_metrics
+
+
+def latency_line(screener, latencies):
+    latencies = sorted(latencies)
+    return f"p50 {screener.percentile(latencies, 0.5):.2f}s, p95 {screener.percentile(latencies, 0.95):.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=200, help="synthetic cohort size")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    parser.add_argument("--sonnet-latency", type=float, default=2.0, help="simulated seconds per ASSESSMENT_MODEL call")
+    parser.add_argument("--triage-latency", type=float, default=0.8, help="simulated seconds per triage call")
+    parser.add_argument("--min-confidence", type=float, default=None, help="escalation confidence threshold")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    latency = {screener.ASSESSMENT_MODEL: args.sonnet_latency, screener.TRIAGE_MODEL: args.triage_latency}
+    min_confidence = args.min_confidence if args.min_confidence is not None else screener.DEFAULT_ESCALATION_CONFIDENCE
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_synthetic_patients(os.path.join(tmp, "cohort"), args.patients)
+        patients = [(screener.patient_id_from_path(path), screener.csv_to_toon(path), fake_clients.SIMULATED_CRITERIA)
+                    for path in paths]
+
+    script = fake_clients.cascade_script(screener.ASSESSMENT_MODEL)
+    client = fake_clients.FakeAsyncAnthropic(latency, script)
+    baseline, baseline_seconds, baseline_metrics = run(screener, patients, client, args.concurrency)
+    print(f"{args.patients} patients, concurrency {args.concurrency}, simulated latency "
+          f"{args.sonnet_latency:.2f}s {screener.ASSESSMENT_MODEL} / {args.triage_latency:.2f}s {screener.TRIAGE_MODEL}\n")
+    print(f"All {screener.ASSESSMENT_MODEL}: {baseline_seconds:.2f}s, {baseline_metrics.calls} call(s), "
+          f"latency {latency_line(screener, baseline_metrics.latencies)}, estimated cost ${baseline_metrics.cost:.4f}")
+
+    cascade = screener.ModelCascade(screener.TRIAGE_MODEL, min_confidence)
+    client = fake_clients.FakeAsyncAnthropic(latency, script)
+    results, seconds, metrics = run(screener, patients, client, args.concurrency, cascade)
+    print(f"Cascade: {seconds:.2f}s, {metrics.calls} call(s), end-to-end latency "
+          f"{latency_line(screener, cascade.latencies)}, estimated cost ${metrics.cost:.4f}")
+    print(cascade.summary(metrics).splitlines()[0])
+
+    changed = sum(1 for before, after in zip(baseline, results)
+                  if before["overall_eligibility"] != after["overall_eligibility"])
+    print(f"\nWall clock {1 - seconds / baseline_seconds:.0%} lower, cost {1 - metrics.cost / baseline_metrics.cost:.0%} lower; "
+          f"{changed} of {args.patients} verdict(s) differ from all-{screener.ASSESSMENT_MODEL}")
+
+
+if __name__ == "__main__":
+    main()
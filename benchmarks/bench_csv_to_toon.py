@@ -0,0 +1,107 @@
+"""Benchmark csv_to_toon against the original two-pass converter on synthetic EHR files.
+
+Checks that both produce byte-identical TOON for the bundled patients and every synthetic file,
+then reports files/sec and peak traced memory at each cohort size. Exits with an error if any
+file differs; tests/test_csv_to_toon.py runs the same check under pytest.
+
+Usage:
+    python benchmarks/bench_csv_to_toon.py [--sizes 1000,10000,100000] [--workdir DIR]
+"""
+import argparse
+import csv
+import glob
+import os
+import tempfile
+
+from common import REPO_ROOT, load_screener, measure, write_synthetic_patients
+
+
+def legacy_csv_to_toon(file_path):
+    """The original converter: builds a dict of every section, then formats it in a second pass."""
+    result = {}
+    current_section = None
+    current_headers = None
+
+    with open(file_path, "r") as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if not row or all(cell.strip() == "" for cell in row):
+                continue
+
+            first_cell = row[0].strip()
+            is_section_header = (
+                len(row) == 1 and
+                first_cell.isupper() and
+                all(word.isupper() for word in first_cell.split())
+            )
+            if is_section_header:
+                current_section = first_cell.replace(" ", "_")
+                result[current_section] = {"headers": None, "rows": []}
+                current_headers = None
+                continue
+
+            if current_section and current_headers is None:
+                current_headers = [h.strip() for h in row]
+                result[current_section]["headers"] = current_headers
+                continue
+
+            if current_section and current_headers:
+                row_values = [value.strip() for value in row]
+                while len(row_values) < len(current_headers):
+                    row_values.append("")
+                row_values = row_values[:len(current_headers)]
+                result[current_section]["rows"].append(row_values)
+
+    toon_lines = []
+    for section, data in result.items():
+        headers = data["headers"]
+        rows = data["rows"]
+        if headers and rows:
+            header_str = ",".join(headers)
+            toon_lines.append(f"{section}[{len(rows)}]{{{header_str}}}:")
+            for row in rows:
+                toon_lines.append(f"  {','.join(row)}")
+        toon_lines.append("")
+
+    return "\n".join(toon_lines)
+
+
+def convert_all(convert, paths):
+    """Convert every file, keeping only the total output size so memory reflects one file at a time."""
+    total_characters = 0
+    for path in paths:
+        total_characters += len(convert(path))
+    return total_characters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated cohort sizes")
+    parser.add_argument("--workdir", help="directory for the synthetic CSVs (default: a temporary directory)")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    implementations = [("original", legacy_csv_to_toon), ("single-pass", screener.csv_to_toon)]
+
+    bundled = sorted(glob.glob(os.path.join(REPO_ROOT, "patients", "*.csv")))
+    mismatches = [path for path in bundled if legacy_csv_to_toon(path) != screener.csv_to_toon(path)]
+    print(f"Bundled patients: {len(bundled) - len(mismatches)}/{len(bundled)} byte-identical")
+    differing = len(mismatches)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        print(f"\n{'files':>8}  {'implementation':<12}  {'seconds':>8}  {'files/sec':>10}  {'peak KiB':>9}")
+        for size in [int(size) for size in args.sizes.split(",")]:
+            paths = write_synthetic_patients(os.path.join(workdir, f"cohort_{size}"), size)
+            mismatches = sum(1 for path in paths if legacy_csv_to_toon(path) != screener.csv_to_toon(path))
+            for name, convert in implementations:
+                _, seconds, peak_bytes = measure(convert_all, convert, paths)
+                print(f"{size:>8}  {name:<12}  {seconds:>8.2f}  {size / seconds:>10,.0f}  {peak_bytes / 1024:>9.1f}")
+            print(f"{'':>8}  {mismatches} of {size} synthetic files differ")
+            differing += mismatches
+    if differing:
+        raise SystemExit(f"{differing} file(s) converted differently from the original converter")
+
+
+if __name__ == "__main__":
+    main()
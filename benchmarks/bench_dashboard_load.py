@@ -0,0 +1,108 @@
+"""Time a dashboard rerun with and without the cached results layer (dashboard_data.py).
+
+For each cohort size, writes a synthetic eligibility_results.json and times the data work of
+one Streamlit rerun. Every timed rerun moves the confidence slider to a new value, so no filtered
+view is reused:
+  - uncached: json.load of the file, then the Overview, Patient Details and Full Report tabs
+    each filtering the result list and counting statuses and criteria per result, as dashboard.py
+    did before the cached layer
+  - cached: load_results_data (one os.stat while the file is unchanged), then one boolean-mask
+    filter shared by the three tabs and the KPIs from the columnar patients table
+The first cached load, which parses the file and builds the tables, is reported separately.
+Rendering is not included. The script also checks that rewriting the file invalidates the cache.
+It times the JSON path of dashboard_data; bench_results_store.py covers the SQLite results store.
+
+Usage:
+    python benchmarks/bench_dashboard_load.py [--sizes 100,10000,100000] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from common import write_synthetic_results
+
+import dashboard_data
+
+STATUSES = list(dashboard_data.ELIGIBILITY_STATUSES)
+# No results store, so load_results_data reads the JSON file
+NO_STORE = os.path.join(tempfile.gettempdir(), "no-results-store.sqlite")
+
+
+def uncached_rerun(path, min_confidence=0.0):
+    """The dashboard's per-rerun data work before the cached layer."""
+    with open(path) as f:
+        results = json.load(f)
+    # Overview, Patient Details and Full Report each filter the list again
+    tabs = []
+    for _ in range(3):
+        tabs.append([r for r in results
+                     if r.get("overall_eligibility") in STATUSES and r.get("confidence_score", 0) >= min_confidence])
+    overview, details, report = tabs
+    counts = {status: sum(1 for r in overview if r.get("overall_eligibility") == status) for status in STATUSES}
+    average_confidence = sum(r.get("confidence_score", 0) for r in overview) / max(1, len(overview))
+    criteria_checked = sum(len(r.get("criteria_evaluation", [])) for r in overview)
+    criteria_met = sum(sum(1 for c in r.get("criteria_evaluation", []) if c.get("status") == "MET") for r in overview)
+    patient_ids = [r.get("patient_id") for r in details]
+    summary_rows = [(r.get("patient_id"), sum(1 for c in r.get("criteria_evaluation", []) if c.get("status") == "MET"),
+                     sum(1 for c in r.get("criteria_evaluation", []) if c.get("status") == "NOT_MET"),
+                     sum(1 for c in r.get("criteria_evaluation", []) if c.get("status") == "NEEDS_VERIFICATION"))
+                    for r in report]
+    return counts, average_confidence, criteria_checked, criteria_met, len(patient_ids), len(summary_rows)
+
+
+def cached_rerun(path, min_confidence=0.0):
+    """The same work through dashboard_data."""
+    data = dashboard_data.load_results_data(path, NO_STORE)
+    overview, details, report = (data.filter(STATUSES, min_confidence) for _ in range(3))
+    summary = data.summary(STATUSES, min_confidence)
+    patient_ids = details["patient_id"].tolist()
+    summary_rows = report[["patient_id", "met", "not_met", "review"]]
+    return (summary["status_counts"], summary["average_confidence"], summary["criteria_checked"],
+            summary["criteria_counts"]["MET"], len(patient_ids), len(summary_rows))
+
+
+def time_runs(func, path, repeats):
+    """Median seconds of `repeats` reruns, each at a new confidence threshold; returns the last result too."""
+    seconds = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        result = func(path, repeat / (2 * repeats))
+        seconds.append(time.perf_counter() - start)
+    return result, statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,10000,100000", help="comma-separated result counts")
+    parser.add_argument("--criteria", type=int, default=15, help="criteria per synthetic result")
+    parser.add_argument("--repeats", type=int, default=5, help="reruns timed per size (median reported)")
+    args = parser.parse_args()
+
+    print(f"{'results':>8}  {'file MB':>7}  {'uncached rerun':>14}  {'first load':>10}  {'cached rerun':>12}  {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            path = write_synthetic_results(os.path.join(tmp, f"results_{size}.json"), size, args.criteria)
+            dashboard_data._load_version.cache_clear()
+            start = time.perf_counter()
+            dashboard_data.load_results_data(path, NO_STORE)
+            first_load = time.perf_counter() - start
+
+            expected, uncached = time_runs(uncached_rerun, path, args.repeats)
+            result, cached = time_runs(cached_rerun, path, args.repeats)
+            assert result[0] == expected[0] and result[2:] == expected[2:]
+            assert abs(result[1] - expected[1]) < 1e-9
+            print(f"{size:>8,}  {os.path.getsize(path) / 1e6:>7.1f}  {uncached * 1000:>12.1f}ms  "
+                  f"{first_load * 1000:>8.1f}ms  {cached * 1000:>10.3f}ms  {uncached / cached:>7.0f}x")
+
+            # A rewrite by the screener changes the size or mtime, so the next rerun parses the new file
+            before = dashboard_data.load_results_data(path, NO_STORE)
+            write_synthetic_results(path, size + 1, args.criteria, seed=1)
+            after = dashboard_data.load_results_data(path, NO_STORE)
+            assert after is not before and len(after) == size + 1
+
+
+if __name__ == "__main__":
+    main()
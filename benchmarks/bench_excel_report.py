@@ -0,0 +1,109 @@
+"""Time the dashboard's Excel report: built in memory with pandas vs streamed in openpyxl write-only mode.
+
+For each cohort size, makes synthetic results (15 criteria each by default), loads them as the
+dashboard's JSON tables and adds them to a results store. Then reports wall-clock time and peak
+traced memory (see common.measure) of:
+  - in memory: the report as dashboard.py built it before, two DataFrames written through
+    pd.ExcelWriter into a BytesIO, from the full results (only up to --baseline-max patients,
+    since its memory grows with the cohort)
+  - streamed: dashboard_data.write_excel_report to a file, from the JSON tables and from the store
+  - cached: dashboard_data.excel_report again for the same results version and filter
+Peak memory excludes the loaded results, which the dashboard holds anyway.
+
+Usage:
+    python benchmarks/bench_excel_report.py [--sizes 10000,100000] [--baseline-max 10000]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from io import BytesIO
+
+import pandas as pd
+
+from common import load_screener, measure, synthetic_result
+
+import dashboard_data
+
+STATUSES = list(dashboard_data.ELIGIBILITY_STATUSES)
+
+
+def in_memory_report(data):
+    """The Excel report as dashboard.py built it before streaming."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        summary_data = []
+        for r in data:
+            criteria = r.get("criteria_evaluation", [])
+            summary_data.append({
+                "Patient ID": r.get("patient_id", "N/A"),
+                "Eligibility Status": r.get("overall_eligibility", "N/A"),
+                "Confidence Score": r.get("confidence_score", 0),
+                "Criteria Met": sum(1 for c in criteria if c.get("status") == "MET"),
+                "Criteria Not Met": sum(1 for c in criteria if c.get("status") == "NOT_MET"),
+                "Needs Review": sum(1 for c in criteria if c.get("status") == "NEEDS_VERIFICATION"),
+                "Recommendation": r.get("recommendation", "N/A")
+            })
+        pd.DataFrame(summary_data).to_excel(writer, sheet_name="Summary", index=False)
+        detailed_data = []
+        for r in data:
+            for c in r.get("criteria_evaluation", []):
+                detailed_data.append({
+                    "Patient ID": r.get("patient_id", "N/A"),
+                    "Criterion": c.get("criterion", "N/A"),
+                    "Patient Value": c.get("patient_value", "N/A"),
+                    "Status": c.get("status", "N/A").replace("NEEDS_VERIFICATION", "Review"),
+                    "Score": c.get("score", "N/A")
+                })
+        if detailed_data:
+            pd.DataFrame(detailed_data).to_excel(writer, sheet_name="Detailed Criteria", index=False)
+    output.seek(0)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated patient counts")
+    parser.add_argument("--criteria", type=int, default=15, help="criteria per synthetic result")
+    parser.add_argument("--baseline-max", type=int, default=10000, help="largest cohort for the in-memory report")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    print(f"{'patients':>8}  {'report':<22}  {'seconds':>8}  {'peak MB':>8}  {'file MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            rng = random.Random(0)
+            results = [synthetic_result(number, rng, args.criteria) for number in range(1, size + 1)]
+            jsonl_path = os.path.join(tmp, f"results_{size}.jsonl")
+            with open(jsonl_path, "w") as f:
+                for result in results:
+                    f.write(json.dumps(result) + "\n")
+            db_path = os.path.join(tmp, f"results_{size}.sqlite")
+            store = screener.ResultsStore(db_path)
+            store.import_jsonl(jsonl_path)
+            store.close()
+            backends = [("JSON tables", dashboard_data.ResultsData(results, ("json", size, 0))),
+                        ("store", dashboard_data.StoreResultsData(db_path, ("store", size, 0)))]
+
+            if size <= args.baseline_max:
+                view = backends[0][1].filter(STATUSES)
+                output, seconds, peak = measure(in_memory_report, backends[0][1].results_for(view.index))
+                print(f"{size:>8,}  {'in memory (before)':<22}  {seconds:>8.2f}  {peak / 1e6:>8.1f}  "
+                      f"{len(output.getvalue()) / 1e6:>7.1f}")
+            for name, data in backends:
+                path = os.path.join(tmp, f"report_{size}.xlsx")
+                _, seconds, peak = measure(dashboard_data.write_excel_report, data, STATUSES, 0.0, path)
+                print(f"{size:>8,}  {'streamed, ' + name:<22}  {seconds:>8.2f}  {peak / 1e6:>8.1f}  "
+                      f"{os.path.getsize(path) / 1e6:>7.1f}")
+            # The first call writes the report; later reruns with the same results and filter reuse it
+            data = backends[0][1]
+            report = dashboard_data.excel_report(data, STATUSES)
+            start = time.perf_counter()
+            assert dashboard_data.excel_report(data, STATUSES) == report
+            print(f"{size:>8,}  {'cached rerun':<22}  {time.perf_counter() - start:>8.5f}")
+
+
+if __name__ == "__main__":
+    main()
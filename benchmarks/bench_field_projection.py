@@ -0,0 +1,103 @@
+"""Check that criteria-aware field projection cuts patient tokens without changing verdicts.
+
+For each bundled patient, compares the full TOON with the TOON projected onto the protocol's
+field selection: approximate tokens (see common.approximate_tokens) and the pre-screen verdict,
+which must be the same since the rules read fields the criteria reference.
+
+Offline, the field selection comes from the fake client in fake_clients.py. With --live, the selection
+is made by the extraction model for the bundled protocol, and every patient is assessed twice
+(full and projected) to compare overall eligibility, per-criterion status and latency.
+
+Usage:
+    python benchmarks/bench_field_projection.py [--live] [--protocol PATH] [--profile PATH]
+"""
+import argparse
+import glob
+import os
+import statistics
+import tempfile
+import time
+
+import fake_clients
+from common import REPO_ROOT, approximate_tokens, load_screener
+
+
+def criterion_statuses(result):
+    return {item.get("criterion"): item.get("status") for item in result.get("criteria_evaluation", [])}
+
+
+def assess_timed(screener, patient_id, patient_toon, criteria):
+    start = time.perf_counter()
+    result = screener.assess_patient_eligibility(patient_id, patient_toon, criteria)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="select fields and assess patients with the API")
+    parser.add_argument("--protocol", default=os.path.join(REPO_ROOT, "clinical-trial-protocol.pdf"),
+                        help="protocol PDF for --live (default: the bundled protocol)")
+    parser.add_argument("--profile", help="also apply this JSON compaction profile before projecting")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    profile = screener.load_compact_profile(args.profile) if args.profile else None
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.sqlite")
+        if args.live:
+            criteria, _ = screener.load_eligibility_criteria(args.protocol, cache_path)
+            selection, _ = screener.load_field_selection(criteria, cache_path)
+        else:
+            criteria = fake_clients.SIMULATED_CRITERIA
+            selection, _ = screener.load_field_selection(criteria, cache_path, fake_clients.FakeAnthropic(0))
+    print(f"Field selection: {screener.describe_field_selection(selection)}\n")
+
+    bundled = sorted(glob.glob(os.path.join(REPO_ROOT, "patients", "*.csv")))
+    print(f"{'patient':<10}  {'full':>6}  {'projected':>9}  {'saved':>6}  {'pre-screen':<10}"
+          + ("  verdict (full / projected)" if args.live else ""))
+    totals = [0, 0]
+    prescreen_changes = 0
+    verdict_changes = 0
+    status_changes = 0
+    latencies = ([], [])
+    for path in bundled:
+        patient_id = screener.patient_id_from_path(path)
+        full_toon = screener.csv_to_toon(path, profile)
+        projected_toon = screener.project_toon(full_toon, selection)
+        counts = approximate_tokens(full_toon), approximate_tokens(projected_toon)
+        totals = [total + count for total, count in zip(totals, counts)]
+
+        full_excluded = screener.prescreen_patient(patient_id, full_toon) is not None
+        projected_excluded = screener.prescreen_patient(patient_id, projected_toon) is not None
+        prescreen_changes += full_excluded != projected_excluded
+        line = (f"{patient_id:<10}  {counts[0]:>6,}  {counts[1]:>9,}  {1 - counts[1] / counts[0]:>6.1%}  "
+                f"{'excluded' if full_excluded else 'passed':<10}"
+                + ("" if full_excluded == projected_excluded else " CHANGED"))
+
+        if args.live:
+            full_result, full_seconds = assess_timed(screener, patient_id, full_toon, criteria)
+            projected_result, projected_seconds = assess_timed(screener, patient_id, projected_toon, criteria)
+            latencies[0].append(full_seconds)
+            latencies[1].append(projected_seconds)
+            full_verdict = full_result.get("overall_eligibility")
+            projected_verdict = projected_result.get("overall_eligibility")
+            verdict_changes += full_verdict != projected_verdict
+            full_statuses = criterion_statuses(full_result)
+            projected_statuses = criterion_statuses(projected_result)
+            status_changes += sum(1 for criterion, status in full_statuses.items()
+                                  if projected_statuses.get(criterion, status) != status)
+            line += f"  {full_verdict} / {projected_verdict}"
+        print(line)
+
+    print(f"\nBundled: {len(bundled)} patients, {totals[0]:,} full / {totals[1]:,} projected TOON tokens, "
+          f"{1 - totals[1] / totals[0]:.1%} fewer")
+    print(f"Pre-screen verdicts changed by projection: {prescreen_changes}")
+    if args.live:
+        print(f"Overall eligibility changed: {verdict_changes} of {len(bundled)}; "
+              f"criterion statuses changed: {status_changes}")
+        print(f"Median latency: {statistics.median(latencies[0]):.2f}s full, {statistics.median(latencies[1]):.2f}s projected")
+        print(screener.run_usage.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmark parallel CSV -> TOON ingestion across process-pool sizes.
+
+Converts a synthetic patient directory with iter_patient_toons at increasing worker counts
+(0 = in-process, the old serial path) and reports files/sec and speedup over serial.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--files 20000] [--workers 0,1,2,4,8] [--workdir DIR]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import load_screener, write_synthetic_patients
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({0, 1, 2, 4, cpu_count} & set(range(cpu_count + 1)))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="number of synthetic patient CSVs")
+    parser.add_argument("--workers", default=",".join(str(workers) for workers in default_workers),
+                        help="comma-separated process counts to compare (0 = in-process)")
+    parser.add_argument("--workdir", help="directory for the synthetic CSVs (default: a temporary directory)")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    with tempfile.TemporaryDirectory() as tmp:
+        patient_files = write_synthetic_patients(args.workdir or tmp, args.files)
+        print(f"{args.files} files, {cpu_count} CPU(s)")
+        print(f"\n{'workers':>7}  {'seconds':>8}  {'files/sec':>10}  {'speedup':>8}")
+        serial_seconds = None
+        for workers in [int(workers) for workers in args.workers.split(",")]:
+            start = time.perf_counter()
+            converted = sum(1 for _ in screener.iter_patient_toons(patient_files, workers))
+            seconds = time.perf_counter() - start
+            serial_seconds = serial_seconds or seconds
+            print(f"{workers:>7}  {seconds:>8.2f}  {converted / seconds:>10,.0f}  {serial_seconds / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
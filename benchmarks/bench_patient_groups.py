@@ -0,0 +1,68 @@
+"""Compare screening throughput at several patients-per-request settings.
+
+Screens a synthetic cohort through the concurrent engine with the fake async client once per
+group size, under the given request and token budgets. The fake client's latency is per patient,
+because a grouped request generates one assessment for each. With --drop-rate, that share of the
+patients is left out of each grouped response, which exercises the single-patient fallback.
+Reports wall-clock time, patients/sec, requests, input tokens and estimated cost per group size.
+
+Usage:
+    python benchmarks/bench_patient_groups.py [--patients 100] [--sizes 1,2,4,8] [--rpm 50] [--tpm 30000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import fake_clients
+from common import load_screener, write_synthetic_patients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=100, help="synthetic cohort size")
+    parser.add_argument("--sizes", default="1,2,4,8", help="comma-separated patients-per-request settings")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated seconds per patient in a request")
+    parser.add_argument("--rpm", type=int, default=50, help="requests-per-minute budget (screener default: 50)")
+    parser.add_argument("--tpm", type=int, default=30000, help="input-tokens-per-minute budget (screener default: 30000)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of patients missing from grouped responses")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_synthetic_patients(os.path.join(tmp, "cohort"), args.patients)
+        patients = [(screener.patient_id_from_path(path), screener.csv_to_toon(path), fake_clients.SIMULATED_CRITERIA)
+                    for path in paths]
+
+    print(f"{args.patients} patients, concurrency {args.concurrency}, {args.rpm} rpm / {args.tpm:,} tpm, "
+          f"{args.latency:.2f}s per patient, drop rate {args.drop_rate:.0%}\n")
+    print(f"{'per request':>11}  {'seconds':>8}  {'patients/s':>10}  {'requests':>8}  {'fallbacks':>9}  "
+          f"{'input tokens':>12}  {'cost':>8}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        random.seed(0)
+        screener.run_usage = screener.TokenUsage()
+        screener.run_metrics = screener.CallMetrics()
+        screener.run_groups = screener.GroupedRequestStats()
+        scheduler = screener.RateLimitScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                                                max_concurrency=args.concurrency)
+        client = fake_clients.FakeAsyncAnthropic(args.latency, drop_rate=args.drop_rate)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(screener.screen_patients_async(
+                patients, None, args.concurrency, api_client=client, scheduler=scheduler, patients_per_request=size
+            ))
+        seconds = time.perf_counter() - start
+        usage = screener.run_usage
+        input_tokens = usage.input_tokens + usage.cache_read_input_tokens + usage.cache_creation_input_tokens
+        assert all(result and result["patient_id"] == patient[0] for result, patient in zip(results, patients))
+        print(f"{size:>11}  {seconds:>8.2f}  {args.patients / seconds:>10.1f}  {scheduler.stats['requests']:>8}  "
+              f"{screener.run_groups.fallbacks:>9}  {input_tokens:>12,}  ${screener.run_metrics.cost:>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
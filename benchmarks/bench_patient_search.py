@@ -0,0 +1,108 @@
+"""Time the Patient Details selector on a large cohort: every patient in one selectbox vs a searched page.
+
+Writes a synthetic cohort of EHR files and results, adds the results to a results store (which
+reads each patient's MRN from their EHR file) and exports them as eligibility_results.json.
+Then, on both dashboard backends (the JSON tables and the SQLite store), times the data work of
+one rerun of the selector and counts the options sent to the browser:
+  - all patients: the filtered view and one label per patient, as the selector did before
+  - a page: dashboard_data's search and the page's labels, browsing without a query, sorted by
+    confidence, by a 2-character prefix, by a patient ID substring, and by MRN (store only; the
+    JSON results hold no MRNs)
+Every timed rerun uses a new confidence threshold, so no memoized view or page is reused.
+Browser rendering is not included; the options column is what Streamlit has to send and draw.
+
+Usage:
+    python benchmarks/bench_patient_search.py [--patients 100000] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from common import load_screener, synthetic_result, write_synthetic_patients
+
+import dashboard_data
+
+STATUSES = list(dashboard_data.ELIGIBILITY_STATUSES)
+
+
+def label(patient):
+    return f"📋 {patient['patient_id']}" + (f" · MRN {patient['mrn']}" if patient.get("mrn") else "")
+
+
+def all_patients(data, threshold, query, sort):
+    """The selector before paging: every patient ID in the filtered view becomes an option."""
+    patient_ids = data.filter(STATUSES, threshold)["patient_id"].tolist()
+    return [f"📋 {patient_id}" for patient_id in patient_ids]
+
+
+def search_page(data, threshold, query, sort):
+    page, _ = data.search(STATUSES, threshold, query, sort)
+    return [label(patient) for patient in page.to_dict("records")]
+
+
+def median_rerun(func, data, query, sort, repeats):
+    """Median seconds of `repeats` reruns, each at a new confidence threshold; returns the last options too."""
+    seconds = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        options = func(data, repeat / (2 * repeats), query, sort)
+        seconds.append(time.perf_counter() - start)
+    return options, statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=100000, help="synthetic cohort size")
+    parser.add_argument("--criteria", type=int, default=15, help="criteria per synthetic result")
+    parser.add_argument("--repeats", type=int, default=5, help="reruns timed per case (median reported)")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    target = args.patients // 2
+    cases = [
+        ("all patients", all_patients, "", "patient_id"),
+        ("page", search_page, "", "patient_id"),
+        ("page by confidence", search_page, "", "confidence_desc"),
+        ("prefix 'eh'", search_page, "eh", "patient_id"),
+        (f"substring '{target:06d}'", search_page, f"{target:06d}", "patient_id"),
+        (f"MRN 2026{target:06d}", search_page, f"2026{target:06d}", "patient_id"),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_synthetic_patients(os.path.join(tmp, "cohort"), args.patients)
+        jsonl_path = os.path.join(tmp, "results.jsonl")
+        rng = random.Random(0)
+        with open(jsonl_path, "w") as f:
+            for number in range(1, args.patients + 1):
+                f.write(json.dumps(synthetic_result(number, rng, args.criteria)) + "\n")
+        db_path = os.path.join(tmp, "results.sqlite")
+        store = screener.ResultsStore(db_path)
+        start = time.perf_counter()
+        store.import_jsonl(jsonl_path, patient_files={screener.patient_id_from_path(path): path for path in paths})
+        print(f"{args.patients:,} patients imported with their MRNs in {time.perf_counter() - start:.1f}s\n")
+        store.close()
+        json_path = os.path.join(tmp, "results.json")
+        screener.export_results_json(db_path, json_path)
+        with open(json_path) as f:
+            backends = [("JSON", dashboard_data.ResultsData(json.load(f))), ("store", dashboard_data.StoreResultsData(db_path))]
+
+        print(f"{'selector rerun':<26}  {'JSON':>9}  {'store':>9}  {'options':>8}  {'matches':>8}")
+        for name, func, query, sort in cases:
+            timings = []
+            for backend, data in backends:
+                if func is search_page and query.startswith("2026") and backend == "JSON":
+                    timings.append(None)
+                    continue
+                options, seconds = median_rerun(func, data, query, sort, args.repeats)
+                timings.append(seconds)
+            matches = len(options) if func is all_patients else data.search(STATUSES, 0.0, query, sort)[1]
+            print(f"{name:<26}  " + "  ".join(f"{seconds * 1000:>7.1f}ms" if seconds is not None else f"{'-':>9}"
+                                              for seconds in timings)
+                  + f"  {len(options):>8,}  {matches:>8,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare the dashboard's SQLite results store with the in-memory JSON tables.
+
+For each cohort size, imports --runs screening runs of synthetic results into a fresh results
+store with ResultsStore.import_jsonl, as the screener does at the end of each run. Later runs
+re-assess the same patients, so the store holds a history and only the last run is is_latest.
+The script then writes the latest results as eligibility_results.json and times:
+  - first load: parsing the JSON into ResultsData vs opening StoreResultsData
+  - rerun: filter and KPIs with a new confidence threshold each time (no view reused)
+  - criteria: one patient's criteria_evaluation rows
+Also reports import time, store size and the JSON export time.
+
+Usage:
+    python benchmarks/bench_results_store.py [--sizes 10000,100000] [--runs 3] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from common import load_screener, synthetic_result
+
+import dashboard_data
+
+STATUSES = list(dashboard_data.ELIGIBILITY_STATUSES)
+
+
+def write_run_jsonl(path, count, criteria_count, seed):
+    """Write one run's synthetic results as the screener's results JSONL."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for number in range(1, count + 1):
+            f.write(json.dumps(synthetic_result(number, rng, criteria_count)) + "\n")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def median_rerun(data, repeats):
+    """Median seconds of filter + KPIs, each at a new confidence threshold."""
+    seconds = []
+    for repeat in range(repeats):
+        threshold = repeat / (2 * repeats)
+        start = time.perf_counter()
+        view = data.filter(STATUSES, threshold)
+        data.summary(STATUSES, threshold)
+        view["patient_id"].tolist()
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def median_criteria(data, rows, repeats):
+    seconds = []
+    for row in rows[:repeats]:
+        start = time.perf_counter()
+        data.criteria_for(row)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated patients per run")
+    parser.add_argument("--runs", type=int, default=3, help="screening runs imported into the store")
+    parser.add_argument("--criteria", type=int, default=15, help="criteria per synthetic result")
+    parser.add_argument("--repeats", type=int, default=5, help="timed reruns and criteria lookups (median reported)")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    print(f"{args.runs} run(s) per store, {args.criteria} criteria per result; JSON = in-memory tables, "
+          f"store = indexed SQL\n")
+    print(f"{'patients':>8}  {'import/run':>10}  {'store MB':>8}  {'first load JSON/store':>21}  "
+          f"{'rerun JSON/store':>18}  {'criteria JSON/store':>19}  {'export':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            db_path = os.path.join(tmp, f"results_{size}.sqlite")
+            jsonl_path = os.path.join(tmp, f"results_{size}.jsonl")
+            json_path = os.path.join(tmp, f"results_{size}.json")
+            store = screener.ResultsStore(db_path)
+            import_seconds = []
+            for run in range(args.runs):
+                write_run_jsonl(jsonl_path, size, args.criteria, seed=run)
+                _, seconds = timed(store.import_jsonl, jsonl_path)
+                import_seconds.append(seconds)
+            store.close()
+            _, export_seconds = timed(screener.export_results_json, db_path, json_path)
+
+            start = time.perf_counter()
+            with open(json_path) as f:
+                json_data = dashboard_data.ResultsData(json.load(f))
+            json_load = time.perf_counter() - start
+            store_data, store_load = timed(dashboard_data.StoreResultsData, db_path)
+            assert len(store_data) == len(json_data) == size
+            store_summary, json_summary = store_data.summary(STATUSES, 0.5), json_data.summary(STATUSES, 0.5)
+            # SQL and numpy sum the confidences in a different order
+            assert abs(store_summary.pop("average_confidence") - json_summary.pop("average_confidence")) < 1e-9
+            assert store_summary == json_summary
+
+            json_rerun = median_rerun(json_data, args.repeats)
+            store_rerun = median_rerun(store_data, args.repeats)
+            json_criteria = median_criteria(json_data, list(range(0, size, size // args.repeats)), args.repeats)
+            store_view = store_data.filter(STATUSES)
+            store_criteria = median_criteria(store_data, list(store_view.index[::size // args.repeats]), args.repeats)
+            print(f"{size:>8,}  {statistics.median(import_seconds):>9.2f}s  {os.path.getsize(db_path) / 1e6:>8.1f}  "
+                  f"{json_load * 1000:>9.0f} / {store_load * 1000:>6.1f}ms  "
+                  f"{json_rerun * 1000:>7.1f} / {store_rerun * 1000:>6.1f}ms  "
+                  f"{json_criteria * 1000:>8.3f} / {store_criteria * 1000:>6.3f}ms  {export_seconds:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare prompt token counts for raw CSV, full TOON and compact TOON patient data.
+
+Counts use a local tokenizer approximation (see common.approximate_tokens), so no API key is
+needed. Reports the bundled patients one by one and totals for them and for a synthetic cohort.
+
+Usage:
+    python benchmarks/bench_toon_tokens.py [--synthetic 1000] [--profile PATH] [--workdir DIR]
+"""
+import argparse
+import glob
+import os
+import tempfile
+
+from common import REPO_ROOT, approximate_tokens, load_screener, write_synthetic_patients
+
+
+def token_counts(screener, path, profile):
+    """Return approximate tokens for the raw CSV, full TOON and compact TOON of one patient file."""
+    with open(path, "r") as f:
+        raw_csv = f.read()
+    return (
+        approximate_tokens(raw_csv),
+        approximate_tokens(screener.csv_to_toon(path)),
+        approximate_tokens(screener.csv_to_toon(path, profile))
+    )
+
+
+def print_totals(label, totals, count):
+    raw_csv, full_toon, compact_toon = totals
+    print(f"{label}: {count} patients, {raw_csv:,} raw CSV / {full_toon:,} TOON / {compact_toon:,} compact TOON tokens")
+    print(f"  TOON saves {1 - full_toon / raw_csv:.1%} vs raw CSV; compact TOON saves {1 - compact_toon / full_toon:.1%} "
+          f"vs TOON and {1 - compact_toon / raw_csv:.1%} vs raw CSV")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=1000, help="synthetic cohort size (0 to skip)")
+    parser.add_argument("--profile", help="JSON compaction profile (default: the screener's COMPACT_PROFILE)")
+    parser.add_argument("--workdir", help="directory for the synthetic CSVs (default: a temporary directory)")
+    args = parser.parse_args()
+
+    screener = load_screener()
+    profile = screener.load_compact_profile(args.profile) if args.profile else screener.COMPACT_PROFILE
+
+    bundled = sorted(glob.glob(os.path.join(REPO_ROOT, "patients", "*.csv")))
+    print(f"{'patient':<10}  {'raw CSV':>8}  {'TOON':>8}  {'compact':>8}  {'saved':>6}")
+    totals = [0, 0, 0]
+    for path in bundled:
+        counts = token_counts(screener, path, profile)
+        totals = [total + count for total, count in zip(totals, counts)]
+        print(f"{screener.patient_id_from_path(path):<10}  {counts[0]:>8,}  {counts[1]:>8,}  {counts[2]:>8,}  "
+              f"{1 - counts[2] / counts[1]:>6.1%}")
+    print()
+    print_totals("Bundled", totals, len(bundled))
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_synthetic_patients(os.path.join(args.workdir or tmp, f"cohort_{args.synthetic}"), args.synthetic)
+            totals = [0, 0, 0]
+            for path in paths:
+                totals = [total + count for total, count in zip(totals, token_counts(screener, path, profile))]
+            print_totals("Synthetic", totals, len(paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Shared helpers for the benchmark scripts: loading the screener and generating synthetic EHR files and results."""
+import importlib.util
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Lets the benchmarks import dashboard_data.py and the other top-level modules
+sys.path.insert(0, REPO_ROOT)
+
+MEDICATIONS = [
+    ("Donepezil", "10mg", "AD"),
+    ("Memantine", "20mg", "AD"),
+    ("Rivastigmine", "9.5mg/24h", "AD"),
+    ("Lisinopril", "10mg", "Hypertension"),
+    ("Metformin", "500mg", "Type 2 Diabetes"),
+    ("Sertraline", "25mg", "Anxiety"),
+    ("Atorvastatin", "20mg", "Hyperlipidemia"),
+    ("Warfarin", "5mg", "Atrial Fibrillation"),
+]
+PROBLEMS = [
+    ("Mild Cognitive Impairment", "G31.84"),
+    ("Alzheimer's Disease", "G30.9"),
+    ("Essential Hypertension", "I10"),
+    ("Type 2 Diabetes", "E11.9"),
+    ("Anxiety", "F41.1"),
+    ("Major Depressive Disorder", "F32.9"),
+    ("Atrial Fibrillation", "I48.91"),
+]
+ALLERGIES = [("None", "N/A", "N/A"), ("Penicillin", "Anaphylaxis", "Severe"), ("Sulfa", "Rash", "Mild")]
+
+
+def load_screener():
+    """Import elgibility-screener.py as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("screener", os.path.join(REPO_ROOT, "elgibility-screener.py"))
+    screener = importlib.util.module_from_spec(spec)
+    # Registered so worker processes can unpickle functions such as convert_patient_files
+    sys.modules["screener"] = screener
+    spec.loader.exec_module(screener)
+    return screener
+
+
+def synthetic_ehr_csv(patient_number, rng):
+    """Return the text of one synthetic patient CSV in the same layout as patients/EHR_*.csv."""
+    age = rng.randint(50, 90)
+    sex = rng.choice(["Male", "Female"])
+    weight_kg = rng.randint(50, 110)
+    height_cm = rng.randint(150, 195)
+    lines = [
+        "PATIENT DEMOGRAPHICS",
+        "Field,Value",
+        f'"name","Patient {patient_number:06d}"',
+        f'"mrn","2026{patient_number:06d}"',
+        f'"dob","01/01/{2026 - age}"',
+        f'"age","{age}"',
+        f'"sex","{sex}"',
+        f'"gender","{sex}"',
+        '"race","Other"',
+        '"ethnicity","Non-Hispanic"',
+        '"language","English"',
+        f'"maritalStatus","{rng.choice(["Married", "Single", "Widowed"])}"',
+        '"address","123 Clinical Way, Research City"',
+        '"insurance","Study Sponsor"',
+        "",
+        "",
+        "VITAL SIGNS",
+        "Measurement,Value,Date",
+        f'"bp","{rng.randint(110, 160)}/{rng.randint(70, 95)} mmHg","01/03/2026"',
+        f'"hr","{rng.randint(55, 95)} bpm","01/03/2026"',
+        '"temp","98.6 F","01/03/2026"',
+        f'"weight","{weight_kg * 2.2046:.1f} lbs ({weight_kg} kg)","01/03/2026"',
+        f'"height","{height_cm // 30.48:.0f}\'{(height_cm % 30.48) / 2.54:.0f}" ({height_cm} cm)","01/03/2026"',
+        f'"bmi","{weight_kg / (height_cm / 100) ** 2:.1f}","01/03/2026"',
+        "",
+        "",
+        "MEDICATIONS",
+        "Medication,Dose,Route,Frequency,Indication,Prescriber",
+    ]
+    for name, dose, indication in rng.sample(MEDICATIONS, rng.randint(1, 4)):
+        lines.append(f'"{name}","{dose}","Oral","Once daily","{indication}","Dr. Neurologist"')
+    lines += ["", "", "ALLERGIES", "Allergen,Reaction,Severity,Verified"]
+    allergen, reaction, severity = rng.choice(ALLERGIES)
+    lines.append(f'"{allergen}","{reaction}","{severity}","2026"')
+    lines += ["", "", "PROBLEM LIST", "Condition,ICD-10 Code,Onset,Status"]
+    for condition, code in rng.sample(PROBLEMS, rng.randint(1, 3)):
+        lines.append(f'"{condition}","{code}","{rng.randint(2015, 2025)}","Active"')
+    lines += ["", "", "LABORATORY RESULTS", "Test,Value,Reference Range,Date,Flag"]
+    mmse = rng.randint(15, 30)
+    lines.append(f'"MMSE","{mmse}","24-30","01/03/2026","{"Normal" if mmse >= 24 else "Low"}"')
+    if rng.random() < 0.8:
+        lines.append(f'"CDR Global","{rng.choice(["0", "0.5", "1.0", "2.0"])}","0","01/03/2026","High"')
+    if rng.random() < 0.7:
+        amyloid = rng.choice(["Positive", "Negative"])
+        lines.append(f'"Amyloid {rng.choice(["PET", "CSF"])}","{amyloid}","Negative","01/03/2026","{amyloid}"')
+    # Ragged row: fewer values than headers, as some EHR exports produce
+    if rng.random() < 0.1:
+        lines.append('"HbA1c","6.1"')
+    return "\n".join(lines) + "\n"
+
+
+def write_synthetic_patients(directory, count, seed=0):
+    """Write `count` synthetic EHR CSVs into directory and return their paths in sorted order."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for patient_number in range(1, count + 1):
+        path = os.path.join(directory, f"EHR_{patient_number:06d}.csv")
+        with open(path, "w") as f:
+            f.write(synthetic_ehr_csv(patient_number, rng))
+        paths.append(path)
+    return paths
+
+
+CRITERIA = [
+    ("Age 55-85 years", "{age} years"),
+    ("Diagnostic Status - MCI due to AD or Probable AD", "Mild Cognitive Impairment (G31.84)"),
+    ("MMSE Score 22-30", "{mmse}"),
+    ("CDR Global Score 0.5 or 1.0", "0.5"),
+    ("Positive amyloid biomarker (PET or CSF)", "Amyloid PET Positive"),
+    ("Stable AD medication for 8 weeks", "Donepezil 10mg"),
+    ("Study partner available", "Not documented"),
+    ("Adequate vision and hearing", "Not documented"),
+    ("No significant cerebrovascular disease", "No stroke history"),
+    ("No uncontrolled hypertension", "130/80 mmHg"),
+    ("No anticoagulant therapy", "None listed"),
+    ("No major depressive disorder", "Anxiety only"),
+    ("No contraindication to MRI", "Not documented"),
+    ("BMI 17-35", "26.8"),
+    ("No participation in another trial", "Not documented"),
+]
+ELIGIBILITY_WEIGHTS = [("ELIGIBLE", 0.2), ("NOT_ELIGIBLE", 0.45), ("LIKELY_ELIGIBLE", 0.25), ("UNCLEAR", 0.1)]
+
+
+def synthetic_result(patient_number, rng, criteria_count=15):
+    """Return one synthetic assessment in the layout of eligibility_results.json."""
+    status = rng.choices([s for s, _ in ELIGIBILITY_WEIGHTS], [w for _, w in ELIGIBILITY_WEIGHTS])[0]
+    values = {"age": rng.randint(50, 90), "mmse": rng.randint(15, 30)}
+    evaluation = []
+    for index in range(criteria_count):
+        criterion, value = CRITERIA[index % len(CRITERIA)]
+        criterion_status = rng.choices(["MET", "NOT_MET", "NEEDS_VERIFICATION"], [0.7, 0.1, 0.2])[0]
+        evaluation.append({"criterion": criterion, "status": criterion_status,
+                           "score": {"MET": 1.0, "NOT_MET": 0.0}.get(criterion_status, 0.5),
+                           "patient_value": value.format(**values)})
+    return {
+        "patient_id": f"EHR_{patient_number:06d}",
+        "trial_id": "clinical-trial-protocol",
+        "overall_eligibility": status,
+        "confidence_score": round(rng.uniform(0.4, 1.0), 2),
+        "criteria_evaluation": evaluation,
+        "recommendation": f"Synthetic assessment for patient {patient_number}: {status.replace('_', ' ').lower()}.",
+        "next_steps": ["Confirm amyloid status", "Schedule screening visit"],
+    }
+
+
+def write_synthetic_results(path, count, criteria_count=15, seed=0):
+    """Write `count` synthetic assessments as an eligibility_results.json array and return the path."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        json.dump([synthetic_result(number, rng, criteria_count) for number in range(1, count + 1)], f, indent=2)
+    return path
+
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|\n| {2,}|[^\sA-Za-z\d]")
+
+
+def approximate_tokens(text):
+    """Approximate a BPE tokenizer's count without calling the API.
+
+    Letter runs cost one token per 4 characters (rounded up) and digit runs one per 3 digits.
+    Each newline, indentation run and punctuation character costs one token. Single spaces are
+    absorbed into the following word, as BPE vocabularies do.
+    """
+    tokens = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            tokens += -(-len(piece) // 4)
+        elif piece[0].isdigit():
+            tokens += -(-len(piece) // 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+def measure(func, *args):
+    """Run func(*args) twice: once for wall-clock time, once under tracemalloc for peak memory.
+
+    Returns (result, seconds, peak_bytes).
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak_bytes
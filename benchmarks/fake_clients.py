@@ -0,0 +1,241 @@
+"""Local fake Anthropic clients for offline runs, benchmarks and tests.
+
+The clients mimic messages.create and the Message Batches endpoint with a simulated latency and
+canned record_eligibility_assessment answers, so the screener can run without an API key:
+elgibility-screener.py --simulate-latency loads this module, and the benchmarks and tests use it
+directly.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from types import SimpleNamespace
+
+import anthropic
+import httpx
+
+SIMULATED_CRITERIA = """Inclusion Criteria:
+1. Age 55-85 years
+2. MMSE score 22-30
+3. CDR Global score 0.5 or 1.0
+4. Positive amyloid biomarker (PET or CSF)
+Exclusion Criteria:
+1. Non-AD dementia"""
+# What the model selects for the bundled Alzheimer's protocol; age, sex and the vitals behind the
+# cardiovascular exclusion, plus every clinical list except allergies
+SIMULATED_FIELD_SELECTION = {"sections": [
+    {"section": "PATIENT_DEMOGRAPHICS", "fields": ["age", "sex"]},
+    {"section": "VITAL_SIGNS", "fields": ["bp", "hr"]},
+    {"section": "MEDICATIONS", "fields": []},
+    {"section": "PROBLEM_LIST", "fields": []},
+    {"section": "LABORATORY_RESULTS", "fields": []},
+]}
+
+
+def fake_usage(request, cached_prefixes=None):
+    """Estimate a usage block for a fake response, reporting cache hits for previously seen prefixes.
+
+    `cached_prefixes` is a set owned by the fake client; pass None to report everything as uncached.
+    """
+    # Roughly 4 characters per token, as in the screener's estimate_request_tokens
+    prefix = json.dumps([request.get("tools", []), request.get("system", "")])
+    prefix_tokens = len(prefix) // 4
+    patient_tokens = len(json.dumps(request["messages"])) // 4 + 1
+    usage = SimpleNamespace(input_tokens=patient_tokens, output_tokens=400,
+                            cache_read_input_tokens=0, cache_creation_input_tokens=0)
+    if cached_prefixes is None:
+        usage.input_tokens += prefix_tokens
+    elif prefix in cached_prefixes:
+        usage.cache_read_input_tokens = prefix_tokens
+    else:
+        cached_prefixes.add(prefix)
+        usage.cache_creation_input_tokens = prefix_tokens
+    return usage
+
+
+def fake_assessment_response(request, cached_prefixes=None, script=None, drop_rate=0.0):
+    """Build a canned record_eligibility_assessment response for a messages.create request.
+
+    Grouped requests get one tool call per patient, each left out with probability `drop_rate`.
+    `script(model, patient_id)` may return fields that override the canned UNCLEAR assessment.
+    """
+    prompt = request["messages"][-1]["content"]
+    patient_ids = re.findall(r"<patientid>\s*(.*?)\s*</patientid>", prompt, re.S) or ["<UNKNOWN>"]
+    criteria = re.findall(r"\[((?:IN|EX|CR)-[0-9a-f]{8})\] *(.*)", request["system"][-1]["text"])
+    content = []
+    for patient_id in patient_ids:
+        if len(patient_ids) > 1 and random.random() < drop_rate:
+            continue
+        assessment = {
+            "patient_id": patient_id,
+            "trial_id": "<UNKNOWN>",
+            "overall_eligibility": "UNCLEAR",
+            "confidence_score": 0.5,
+            "criteria_evaluation": [{"criterion_id": criterion_id, "criterion": text, "status": "NEEDS_VERIFICATION",
+                                     "score": 0.5} for criterion_id, text in criteria],
+            "recommendation": "Simulated assessment - no model was called.",
+            "next_steps": []
+        }
+        if script is not None:
+            assessment.update(script(request["model"], patient_id))
+        content.append(SimpleNamespace(type="tool_use", name="record_eligibility_assessment", input=assessment))
+    usage = fake_usage(request, cached_prefixes)
+    usage.output_tokens *= max(1, len(content))
+    return SimpleNamespace(content=content, usage=usage)
+
+
+def cascade_script(decisive_model):
+    """Return a script(model, patient_id) of scripted assessments for simulated cascade runs.
+
+    `decisive_model` (the screener's ASSESSMENT_MODEL) is always decisive. Any other model is decisive
+    for about half the patients and returns UNCLEAR or a NEEDS_VERIFICATION criterion for the rest,
+    so they escalate.
+    """
+
+    def script(model, patient_id):
+        digest = int(hashlib.sha256(patient_id.encode("utf-8")).hexdigest(), 16)
+        verdict = "ELIGIBLE" if digest % 2 else "NOT_ELIGIBLE"
+        evaluation = [{"criterion": "Age 55-85 years", "status": "MET", "score": 1.0}]
+        if model != decisive_model and digest % 3 == 0:
+            return {}
+        if model != decisive_model and digest % 3 == 1 and digest % 2:
+            evaluation.append({"criterion": "Positive amyloid biomarker (PET or CSF)", "status": "NEEDS_VERIFICATION",
+                               "score": 0.5})
+        return {"overall_eligibility": verdict, "confidence_score": 0.9, "criteria_evaluation": evaluation,
+                "recommendation": f"Simulated {model} assessment - no model was called."}
+
+    return script
+
+
+class FakeAnthropic:
+    """Stand-in for anthropic.Anthropic that sleeps for `latency` seconds per request.
+
+    `latency` may be a {model: seconds} dict and is per patient, since a grouped request generates
+    one assessment for each. `script` and `drop_rate` are passed to fake_assessment_response.
+    """
+
+    def __init__(self, latency=0.5, script=None, drop_rate=0.0):
+        self.latency = latency
+        self.script = script
+        self.drop_rate = drop_rate
+        self.cached_prefixes = set()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def latency_for(self, request):
+        latency = self.latency.get(request.get("model"), 0.0) if isinstance(self.latency, dict) else self.latency
+        return latency * max(1, request["messages"][-1]["content"].count("<patientid>"))
+
+    def _create(self, **request):
+        time.sleep(self.latency_for(request))
+        if "tools" not in request:
+            # Protocol extraction call: answer with placeholder criteria text
+            return SimpleNamespace(content=[SimpleNamespace(type="text", text=SIMULATED_CRITERIA)])
+        if request["tools"][0]["name"] == "record_field_selection":
+            return SimpleNamespace(content=[SimpleNamespace(type="tool_use", name="record_field_selection",
+                                                            input=SIMULATED_FIELD_SELECTION)])
+        return fake_assessment_response(request, self.cached_prefixes, self.script, self.drop_rate)
+
+
+class FakeAsyncAnthropic(FakeAnthropic):
+    """Stand-in for anthropic.AsyncAnthropic that awaits `latency` seconds per request."""
+
+    async def _create(self, **request):
+        await asyncio.sleep(self.latency_for(request))
+        return fake_assessment_response(request, self.cached_prefixes, self.script, self.drop_rate)
+
+
+def synthetic_status_error(status_code, retry_after=None):
+    """Build the anthropic.APIStatusError the SDK raises for a given HTTP status (e.g. 429 or 529)."""
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    error_class = anthropic.RateLimitError if status_code == 429 else anthropic.APIStatusError
+    return error_class(f"Synthetic {status_code} response", response=response, body=None)
+
+
+class ThrottlingFakeAsyncAnthropic(FakeAsyncAnthropic):
+    """Fake async client that enforces a server-side request rate and returns synthetic 429/529 errors.
+
+    `requests_per_second` rejects calls beyond that rate with a 429 carrying retry-after,
+    `overload_rate` is the probability of a 529, and `scripted_errors` is a list of status codes
+    returned, in order, by the first calls before any other behaviour applies.
+    """
+
+    def __init__(self, latency=0.5, requests_per_second=None, overload_rate=0.0, scripted_errors=None, retry_after=1,
+                 script=None):
+        super().__init__(latency, script)
+        self.requests_per_second = requests_per_second
+        self.overload_rate = overload_rate
+        self.scripted_errors = list(scripted_errors or [])
+        self.retry_after = retry_after
+        self.accepted = []
+        self.responses = {"ok": 0, 429: 0, 529: 0}
+
+    async def _create(self, **request):
+        if self.scripted_errors:
+            status_code = self.scripted_errors.pop(0)
+            self.responses[status_code] = self.responses.get(status_code, 0) + 1
+            raise synthetic_status_error(status_code, self.retry_after if status_code == 429 else None)
+
+        now = time.monotonic()
+        if self.requests_per_second is not None:
+            self.accepted = [t for t in self.accepted if now - t < 1.0]
+            if len(self.accepted) >= self.requests_per_second:
+                self.responses[429] += 1
+                raise synthetic_status_error(429, self.retry_after)
+        if random.random() < self.overload_rate:
+            self.responses[529] += 1
+            raise synthetic_status_error(529)
+
+        self.accepted.append(now)
+        self.responses["ok"] += 1
+        return await super()._create(**request)
+
+
+class FakeBatchAnthropic:
+    """Fake Message Batches endpoint: batches end after `polls_until_ended` polls.
+
+    Requests whose patient ID is in `fail_patient_ids` come back errored with `error_type`
+    (once each, so a resubmission succeeds), which exercises partial-failure handling.
+    `script` is passed to fake_assessment_response.
+    """
+
+    def __init__(self, polls_until_ended=1, fail_patient_ids=(), error_type="api_error", script=None):
+        self.polls_until_ended = polls_until_ended
+        self.script = script
+        self.fail_patient_ids = set(fail_patient_ids)
+        self.error_type = error_type
+        self.cached_prefixes = set()
+        self.batches = {}
+        self.messages = SimpleNamespace(batches=SimpleNamespace(
+            create=self._create, retrieve=self._retrieve, results=self._results
+        ))
+
+    def _create(self, requests):
+        batch_id = f"msgbatch_fake_{len(self.batches) + 1}"
+        self.batches[batch_id] = {"requests": list(requests), "polls": 0}
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def _retrieve(self, batch_id):
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        ended = batch["polls"] > self.polls_until_ended
+        pending = 0 if ended else len(batch["requests"])
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status="ended" if ended else "in_progress",
+            request_counts=SimpleNamespace(processing=pending, succeeded=len(batch["requests"]) - pending, errored=0)
+        )
+
+    def _results(self, batch_id):
+        for batch_request in self.batches[batch_id]["requests"]:
+            response = fake_assessment_response(batch_request["params"], self.cached_prefixes, self.script)
+            patient_id = response.content[0].input["patient_id"]
+            if patient_id in self.fail_patient_ids:
+                self.fail_patient_ids.discard(patient_id)
+                result = SimpleNamespace(type="errored", error=SimpleNamespace(error=SimpleNamespace(type=self.error_type)))
+            else:
+                result = SimpleNamespace(type="succeeded", message=response)
+            yield SimpleNamespace(custom_id=batch_request["custom_id"], result=result)
@@ -1,12 +1,22 @@
 import streamlit as st
 import pandas as pd
-import json
-import os
+import argparse
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-from io import BytesIO
 import urllib.parse
+from dashboard_data import (load_results_data, load_call_metrics, load_patient_tokens, cached_excel_report, excel_report,
+                            report_download, CRITERIA_COLUMNS, PAGE_SIZE, RESULTS_PATH, RESULTS_DB_PATH)
+
+# Patient selector sort orders (dashboard_data.SORT_ORDERS)
+PATIENT_SORT_LABELS = {
+    "patient_id": "Patient ID",
+    "confidence_desc": "Confidence ↓",
+    "confidence_asc": "Confidence ↑",
+    "status": "Status",
+}
+# Patients shown in the Tokens per Patient bar chart; the histogram covers every patient
+TOP_TOKEN_PATIENTS = 20
 
 # Page configuration
 st.set_page_config(
@@ -367,13 +377,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def load_eligibility_results():
-    """Load eligibility results from JSON file."""
-    results_file = "eligibility_results.json"
-    if os.path.exists(results_file):
-        with open(results_file, "r") as f:
-            return json.load(f)
-    return []
+def reset_patient_page():
+    """Return the patient selector to its first page when the search or sort changes."""
+    st.session_state.patient_page = 1
 
 def get_status_badge(status):
     """Return HTML for status badge."""
@@ -425,53 +431,11 @@ def create_gauge_chart(value, title="Confidence"):
 
     return fig
 
-def create_excel_report(data):
-    """Create Excel report with multiple sheets."""
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Summary sheet
-        summary_data = []
-        for r in data:
-            criteria = r.get("criteria_evaluation", [])
-            summary_data.append({
-                "Patient ID": r.get("patient_id", "N/A"),
-                "Eligibility Status": r.get("overall_eligibility", "N/A"),
-                "Confidence Score": r.get("confidence_score", 0),
-                "Criteria Met": sum(1 for c in criteria if c.get("status") == "MET"),
-                "Criteria Not Met": sum(1 for c in criteria if c.get("status") == "NOT_MET"),
-                "Needs Review": sum(1 for c in criteria if c.get("status") == "NEEDS_VERIFICATION"),
-                "Recommendation": r.get("recommendation", "N/A")
-            })
-
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel(writer, sheet_name='Summary', index=False)
-
-        # Detailed criteria sheet
-        detailed_data = []
-        for r in data:
-            patient_id = r.get("patient_id", "N/A")
-            for c in r.get("criteria_evaluation", []):
-                detailed_data.append({
-                    "Patient ID": patient_id,
-                    "Criterion": c.get("criterion", "N/A"),
-                    "Patient Value": c.get("patient_value", "N/A"),
-                    "Status": c.get("status", "N/A").replace("NEEDS_VERIFICATION", "Review"),
-                    "Score": c.get("score", "N/A")
-                })
-
-        if detailed_data:
-            detailed_df = pd.DataFrame(detailed_data)
-            detailed_df.to_excel(writer, sheet_name='Detailed Criteria', index=False)
-
-    output.seek(0)
-    return output
-
-def generate_email_body(data):
-    """Generate email body with summary."""
-    total = len(data)
-    eligible = sum(1 for r in data if r.get("overall_eligibility") == "ELIGIBLE")
-    not_eligible = sum(1 for r in data if r.get("overall_eligibility") == "NOT_ELIGIBLE")
+def generate_email_body(view):
+    """Generate email body with summary of a filtered view of the results."""
+    total = len(view)
+    eligible = int((view["status"] == "ELIGIBLE").sum())
+    not_eligible = int((view["status"] == "NOT_ELIGIBLE").sum())
     review = total - eligible - not_eligible
 
     body = f"""Clinical Trial Eligibility Screening Report
@@ -484,15 +448,26 @@ Summary:
 
 Patient Details:
 """
-    for r in data:
-        body += f"\n- {r.get('patient_id', 'N/A')}: {r.get('overall_eligibility', 'N/A')} (Confidence: {r.get('confidence_score', 0):.0%})"
+    for patient_id, status, confidence in zip(view["patient_id"], view["status"], view["confidence"]):
+        body += f"\n- {patient_id}: {status} (Confidence: {confidence:.0%})"
 
     body += "\n\nPlease find the detailed report attached."
 
     return body
 
-# Load data
-results = load_eligibility_results()
+# Results sources, passed after "--": streamlit run dashboard.py -- --no-results-db
+parser = argparse.ArgumentParser(description="Clinical trial eligibility dashboard")
+parser.add_argument("--results", default=RESULTS_PATH,
+                    help="JSON results file, read when there is no results store (default: %(default)s)")
+parser.add_argument("--results-db", default=RESULTS_DB_PATH,
+                    help="SQLite results store, read instead of --results when it exists (default: %(default)s)")
+parser.add_argument("--no-results-db", action="store_true",
+                    help="read --results even when the results store exists")
+args = parser.parse_args()
+
+# Load data: the SQLite results store, or the JSON results file without one; read once per
+# version of the file and reused by every rerun
+data = load_results_data(args.results, None if args.no_results_db else args.results_db)
 
 # Main content - Header aligned to top
 st.markdown("""
@@ -502,7 +477,7 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-if not results:
+if not len(data):
     st.markdown("""
     <div class="empty-state">
         <h3>No Results Found</h3>
@@ -537,7 +512,7 @@ else:
         st.session_state.confidence_min = 0.0
 
     # Tabs immediately below header
-    tab1, tab2, tab3 = st.tabs(["📊  OVERVIEW", "👤  PATIENT DETAILS", "📋  FULL REPORT"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊  OVERVIEW", "👤  PATIENT DETAILS", "📋  FULL REPORT", "⚙️  OPERATIONS"])
 
     with tab1:
         # Filter expander
@@ -573,21 +548,18 @@ else:
             ov_selected_statuses.append("UNCLEAR")
 
         # Apply filters
-        filtered_results = [
-            r for r in results
-            if r.get("overall_eligibility") in ov_selected_statuses
-            and r.get("confidence_score", 0) >= st.session_state.confidence_min
-        ]
+        ov_view = data.filter(ov_selected_statuses, st.session_state.confidence_min)
 
-        if not filtered_results:
+        if ov_view.empty:
             st.warning("No patients match the current filter criteria. Adjust filters to see results.")
         else:
             # Calculate metrics
-            total_patients = len(filtered_results)
-            eligible = sum(1 for r in filtered_results if r.get("overall_eligibility") == "ELIGIBLE")
-            not_eligible = sum(1 for r in filtered_results if r.get("overall_eligibility") == "NOT_ELIGIBLE")
-            likely_eligible = sum(1 for r in filtered_results if r.get("overall_eligibility") == "LIKELY_ELIGIBLE")
-            unclear = sum(1 for r in filtered_results if r.get("overall_eligibility") == "UNCLEAR")
+            ov_summary = data.summary(ov_selected_statuses, st.session_state.confidence_min)
+            total_patients = ov_summary["total"]
+            eligible = ov_summary["status_counts"]["ELIGIBLE"]
+            not_eligible = ov_summary["status_counts"]["NOT_ELIGIBLE"]
+            likely_eligible = ov_summary["status_counts"]["LIKELY_ELIGIBLE"]
+            unclear = ov_summary["status_counts"]["UNCLEAR"]
 
             # Add spacing between filters and KPIs
             st.markdown("<div style='margin-top: 1rem;'></div>", unsafe_allow_html=True)
@@ -689,14 +661,11 @@ else:
             with chart_col2:
                 st.markdown('<p class="section-header">Confidence Scores by Patient</p>', unsafe_allow_html=True)
 
-                confidence_data = []
-                for r in filtered_results:
-                    status = r.get("overall_eligibility", "UNKNOWN")
-                    confidence_data.append({
-                        "Patient": r.get("patient_id", "N/A").replace("EHR_", ""),
-                        "Confidence": r.get("confidence_score", 0),
-                        "Status": status.replace("_", " ").title()
-                    })
+                confidence_data = pd.DataFrame({
+                    "Patient": ov_view["patient_id"].str.replace("EHR_", "", regex=False),
+                    "Confidence": ov_view["confidence"],
+                    "Status": ov_view["status"].cat.rename_categories(lambda status: status.replace("_", " ").title())
+                })
 
                 # Light colors for bar chart
                 color_map_bar = {
@@ -706,7 +675,7 @@ else:
                     "Unclear": "#cbd5e1"
                 }
 
-                if confidence_data:
+                if not confidence_data.empty:
                     fig_bar = px.bar(
                         confidence_data,
                         x="Patient",
@@ -753,12 +722,9 @@ else:
 
             stat_col1, stat_col2, stat_col3 = st.columns(3)
 
-            avg_confidence = sum(r.get("confidence_score", 0) for r in filtered_results) / len(filtered_results)
-            total_criteria = sum(len(r.get("criteria_evaluation", [])) for r in filtered_results)
-            avg_criteria_met = sum(
-                sum(1 for c in r.get("criteria_evaluation", []) if c.get("status") == "MET")
-                for r in filtered_results
-            ) / total_patients if total_patients > 0 else 0
+            avg_confidence = ov_summary["average_confidence"]
+            total_criteria = ov_summary["criteria_checked"]
+            avg_criteria_met = ov_summary["criteria_counts"]["MET"] / total_patients if total_patients > 0 else 0
 
             with stat_col1:
                 st.metric("Average Confidence", f"{avg_confidence:.1%}")
@@ -805,30 +771,56 @@ else:
                 if st.session_state.show_unclear:
                     pd_selected_statuses.append("UNCLEAR")
 
-                # Apply filters
-                pd_filtered_results = [
-                    r for r in results
-                    if r.get("overall_eligibility") in pd_selected_statuses
-                    and r.get("confidence_score", 0) >= st.session_state.confidence_min
-                ]
-
-                patient_ids = [r.get("patient_id", f"Patient {i}") for i, r in enumerate(pd_filtered_results)]
-
-                if patient_ids:
-                    selected_patient = st.selectbox(
+                # Server-side search, sort and paging: only one page of patients is sent to the browser
+                search_col, sort_col = st.columns([3, 2])
+                with search_col:
+                    patient_query = st.text_input("Search patients", key="patient_search", placeholder="Patient ID or MRN",
+                                                  on_change=reset_patient_page, label_visibility="collapsed")
+                with sort_col:
+                    patient_sort = st.selectbox("Sort patients", list(PATIENT_SORT_LABELS), key="patient_sort",
+                                                format_func=PATIENT_SORT_LABELS.get, on_change=reset_patient_page,
+                                                label_visibility="collapsed")
+
+                _, pd_total = data.search(pd_selected_statuses, st.session_state.confidence_min, patient_query)
+                page_count = max(1, -(-pd_total // PAGE_SIZE))
+                if st.session_state.get("patient_page", 1) > page_count:
+                    st.session_state.patient_page = page_count
+                pd_page, _ = data.search(pd_selected_statuses, st.session_state.confidence_min, patient_query,
+                                         patient_sort, st.session_state.get("patient_page", 1) - 1)
+
+                if pd_total:
+                    # Options are rows of the page: a result index, or an assessment ID in the store
+                    show_trials = pd_page["trial_id"].nunique() > 1
+                    labels = {
+                        row: f"📋 {patient['patient_id']}"
+                             + (f" · MRN {patient['mrn']}" if pd.notna(patient.get("mrn")) else "")
+                             + (f" · {patient['trial_id']}" if show_trials else "")
+                        for row, patient in pd_page.iterrows()
+                    }
+                    selected_row = st.selectbox(
                         "Select patient",
-                        patient_ids,
+                        list(labels),
                         key="patient_select",
-                        format_func=lambda x: f"📋 {x}",
+                        format_func=labels.get,
                         label_visibility="collapsed"
                     )
-                else:
-                    selected_patient = None
-
-        if not pd_filtered_results:
-            st.warning("No patients match the current filter criteria. Adjust filters to see results.")
+                    if page_count > 1:
+                        page_col, count_col = st.columns([1, 2])
+                        with page_col:
+                            page = st.number_input("Page", 1, page_count, key="patient_page", label_visibility="collapsed")
+                        with count_col:
+                            first = (page - 1) * PAGE_SIZE + 1
+                            st.caption(f"{first:,}–{first + len(pd_page) - 1:,} of {pd_total:,} patients")
+
+        if not pd_total:
+            if patient_query.strip():
+                st.warning(f"No patients match \"{patient_query.strip()}\". Search by patient ID or MRN.")
+            else:
+                st.warning("No patients match the current filter criteria. Adjust filters to see results.")
         else:
-            selected_data = next((r for r in pd_filtered_results if r.get("patient_id") == selected_patient), pd_filtered_results[0])
+            # Only the selected patient's full assessment and criteria are loaded
+            selected_patient = pd_page.loc[selected_row, "patient_id"]
+            selected_data = data.result_for(selected_row)
 
             # Patient header with badge aligned to patient ID
             status = selected_data.get("overall_eligibility", "UNKNOWN")
@@ -860,13 +852,11 @@ else:
 
                 # Bottom section: Criteria Evaluation (full width)
                 st.markdown('<p class="section-header">Criteria Evaluation</p>', unsafe_allow_html=True)
-                criteria = selected_data.get("criteria_evaluation", [])
+                criteria = data.criteria_for(selected_row)
 
-                if criteria:
+                if not criteria.empty:
                     # Summary metrics
-                    met = sum(1 for c in criteria if c.get("status") == "MET")
-                    not_met = sum(1 for c in criteria if c.get("status") == "NOT_MET")
-                    verify = sum(1 for c in criteria if c.get("status") == "NEEDS_VERIFICATION")
+                    met, not_met, verify = (int(count) for count in pd_page.loc[selected_row, ["met", "not_met", "review"]])
 
                     sum_col1, sum_col2, sum_col3 = st.columns(3)
                     sum_col1.metric("✅ Met", met)
@@ -876,7 +866,7 @@ else:
                     st.markdown("<br>", unsafe_allow_html=True)
 
                     # Criteria table with updated colors and Review label
-                    criteria_df = pd.DataFrame(criteria)
+                    criteria_df = criteria[CRITERIA_COLUMNS].astype({"status": str})
 
                     column_map = {
                         "criterion": "Criterion",
@@ -965,13 +955,9 @@ else:
             fr_selected_statuses.append("UNCLEAR")
 
         # Apply filters
-        fr_filtered_results = [
-            r for r in results
-            if r.get("overall_eligibility") in fr_selected_statuses
-            and r.get("confidence_score", 0) >= st.session_state.confidence_min
-        ]
+        fr_view = data.filter(fr_selected_statuses, st.session_state.confidence_min)
 
-        if not fr_filtered_results:
+        if fr_view.empty:
             st.warning("No patients match the current filter criteria. Adjust filters to see results.")
         else:
             st.markdown('<p class="section-header">Patient Summary Table</p>', unsafe_allow_html=True)
@@ -980,26 +966,30 @@ else:
             action_col1, action_col2, action_col3, action_col4 = st.columns([1, 1, 1, 2])
 
             with action_col1:
-                # Excel export
-                excel_data = create_excel_report(fr_filtered_results)
-                st.download_button(
-                    label="📥 Download Excel",
-                    data=excel_data,
-                    file_name=f"eligibility_report_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                # Excel export: written only when requested, then kept for this results version and filter
+                excel_path = cached_excel_report(data, fr_selected_statuses, st.session_state.confidence_min)
+                if excel_path is None and st.button("📥 Prepare Excel"):
+                    with st.spinner(f"Writing Excel report for {len(fr_view):,} patients..."):
+                        excel_path = excel_report(data, fr_selected_statuses, st.session_state.confidence_min)
+                excel_download = report_download(excel_path, data.signature is None) if excel_path is not None else None
+                if excel_download is not None:
+                    # Deferred: the file is only read when the button is clicked, not on every rerun. It is
+                    # kept until the next rerun drops the download, then deleted if evicted or unsaved
+                    st.download_button(
+                        label="📥 Download Excel",
+                        data=excel_download,
+                        file_name=f"eligibility_report_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
 
             with action_col2:
                 # CSV export
-                summary_for_csv = []
-                for r in fr_filtered_results:
-                    summary_for_csv.append({
-                        "Patient ID": r.get("patient_id", "N/A"),
-                        "Eligibility": r.get("overall_eligibility", "N/A"),
-                        "Confidence": r.get("confidence_score", 0),
-                        "Recommendation": r.get("recommendation", "N/A")
-                    })
-                csv_df = pd.DataFrame(summary_for_csv)
+                csv_df = fr_view[["patient_id", "status", "confidence", "recommendation"]].rename(columns={
+                    "patient_id": "Patient ID",
+                    "status": "Eligibility",
+                    "confidence": "Confidence",
+                    "recommendation": "Recommendation"
+                })
                 csv_data = csv_df.to_csv(index=False)
 
                 st.download_button(
@@ -1012,7 +1002,7 @@ else:
             with action_col3:
                 # Email button - using link_button for consistent styling
                 email_subject = urllib.parse.quote(f"Clinical Trial Eligibility Report - {datetime.now().strftime('%Y-%m-%d')}")
-                email_body = urllib.parse.quote(generate_email_body(fr_filtered_results))
+                email_body = urllib.parse.quote(generate_email_body(fr_view))
                 email_link = f"mailto:?subject={email_subject}&body={email_body}"
 
                 st.link_button("✉️ Send via Email", email_link)
@@ -1020,21 +1010,16 @@ else:
             st.markdown("<br>", unsafe_allow_html=True)
 
             # Full summary table
-            summary_data = []
-            for r in fr_filtered_results:
-                criteria = r.get("criteria_evaluation", [])
-                rec = r.get("recommendation", "N/A")
-                summary_data.append({
-                    "Patient ID": r.get("patient_id", "N/A"),
-                    "Status": r.get("overall_eligibility", "N/A"),
-                    "Confidence": f"{r.get('confidence_score', 0):.0%}",
-                    "Met": sum(1 for c in criteria if c.get("status") == "MET"),
-                    "Not Met": sum(1 for c in criteria if c.get("status") == "NOT_MET"),
-                    "Review": sum(1 for c in criteria if c.get("status") == "NEEDS_VERIFICATION"),
-                    "Recommendation": rec[:60] + "..." if len(rec) > 60 else rec
-                })
-
-            summary_df = pd.DataFrame(summary_data)
+            recommendations = fr_view["recommendation"].astype(str)
+            summary_df = pd.DataFrame({
+                "Patient ID": fr_view["patient_id"],
+                "Status": fr_view["status"].astype(str),
+                "Confidence": (fr_view["confidence"] * 100).round().astype(int).astype(str) + "%",
+                "Met": fr_view["met"],
+                "Not Met": fr_view["not_met"],
+                "Review": fr_view["review"],
+                "Recommendation": recommendations.where(recommendations.str.len() <= 60, recommendations.str[:60] + "...")
+            })
 
             # Replace status values with display-friendly labels
             summary_df["Status"] = summary_df["Status"].replace({
@@ -1076,3 +1061,118 @@ else:
                 </span>
             </div>
             """, unsafe_allow_html=True)
+
+    with tab4:
+        metrics_df = load_call_metrics()
+
+        if metrics_df.empty:
+            st.info("No call metrics found. The screener writes eligibility_metrics.jsonl on each run.")
+        else:
+            timed_df = metrics_df.dropna(subset=["latency_s"])
+            total_input = metrics_df["total_input_tokens"].sum()
+            cache_hit_rate = metrics_df["cache_read_input_tokens"].sum() / total_input if total_input else 0
+
+            ops_col1, ops_col2, ops_col3, ops_col4 = st.columns(4)
+            with ops_col1:
+                st.metric("Model Calls", f"{len(metrics_df):,}")
+            with ops_col2:
+                if timed_df.empty:
+                    st.metric("Latency p50 / p95 / p99", "N/A")
+                else:
+                    latency_p50, latency_p95, latency_p99 = timed_df["latency_s"].quantile([0.5, 0.95, 0.99])
+                    st.metric("Latency p50 / p95 / p99", f"{latency_p50:.1f}s / {latency_p95:.1f}s / {latency_p99:.1f}s")
+            with ops_col3:
+                st.metric("Estimated Cost", f"${metrics_df['cost_usd'].fillna(0).sum():,.2f}")
+            with ops_col4:
+                st.metric("Input Served From Cache", f"{cache_hit_rate:.0%}")
+
+            st.markdown("<br>", unsafe_allow_html=True)
+            ops_chart_col1, ops_chart_col2 = st.columns(2)
+
+            with ops_chart_col1:
+                st.markdown('<p class="section-header">Latency Distribution</p>', unsafe_allow_html=True)
+                if timed_df.empty:
+                    st.caption("Latency is not recorded for Message Batches runs.")
+                else:
+                    fig_latency = px.histogram(timed_df, x="latency_s", color="model", nbins=30)
+                    fig_latency.update_layout(
+                        xaxis_title="Latency (s)",
+                        yaxis_title="Calls",
+                        legend_title="",
+                        margin=dict(l=20, r=20, t=20, b=20),
+                        height=340,
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        font=dict(family="Inter")
+                    )
+                    st.plotly_chart(fig_latency, use_container_width=True)
+
+            with ops_chart_col2:
+                st.markdown('<p class="section-header">Latency and Retries Over the Run</p>', unsafe_allow_html=True)
+                if timed_df.empty:
+                    st.caption("Latency is not recorded for Message Batches runs.")
+                else:
+                    fig_timeline = px.scatter(
+                        timed_df, x="timestamp", y="latency_s", color="status", size=timed_df["retries"] + 1,
+                        hover_data=["patient_id", "trial_id", "retries"]
+                    )
+                    fig_timeline.update_layout(
+                        xaxis_title="",
+                        yaxis_title="Latency (s)",
+                        legend_title="",
+                        margin=dict(l=20, r=20, t=20, b=20),
+                        height=340,
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        font=dict(family="Inter")
+                    )
+                    st.plotly_chart(fig_timeline, use_container_width=True)
+
+            st.markdown('<p class="section-header">Tokens per Patient</p>', unsafe_allow_html=True)
+            token_columns = {
+                "cache_read_input_tokens": "Cache Hit",
+                "cache_creation_input_tokens": "Cache Write",
+                "input_tokens": "Uncached Input",
+                "output_tokens": "Output"
+            }
+            patient_tokens_df = load_patient_tokens()
+            st.caption(f"{len(patient_tokens_df):,} patient(s). A grouped request's tokens are split evenly across its patients.")
+            tokens_chart_col1, tokens_chart_col2 = st.columns(2)
+
+            with tokens_chart_col1:
+                tokens_df = (
+                    patient_tokens_df.head(TOP_TOKEN_PATIENTS)[list(token_columns)]
+                    .rename(columns=token_columns)
+                    .rename_axis("patient_id")
+                    .reset_index()
+                    .melt(id_vars="patient_id", var_name="Token Type", value_name="Tokens")
+                )
+                fig_tokens = px.bar(tokens_df, x="patient_id", y="Tokens", color="Token Type")
+                fig_tokens.update_layout(
+                    title=dict(text=f"Top {TOP_TOKEN_PATIENTS} Patients", font=dict(size=14)),
+                    xaxis_title="",
+                    legend_title="",
+                    margin=dict(l=20, r=20, t=40, b=60),
+                    height=380,
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    font=dict(family="Inter")
+                )
+                st.plotly_chart(fig_tokens, use_container_width=True)
+
+            with tokens_chart_col2:
+                fig_token_spread = px.histogram(patient_tokens_df, x="total", nbins=30)
+                fig_token_spread.update_layout(
+                    title=dict(text="All Patients", font=dict(size=14)),
+                    xaxis_title="Tokens per patient",
+                    yaxis_title="Patients",
+                    margin=dict(l=20, r=20, t=40, b=60),
+                    height=380,
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    font=dict(family="Inter")
+                )
+                st.plotly_chart(fig_token_spread, use_container_width=True)
+
+            st.markdown('<p class="section-header">Call Log</p>', unsafe_allow_html=True)
+            st.dataframe(metrics_df.drop(columns=["total_input_tokens"]), use_container_width=True, hide_index=True)
@@ -0,0 +1,668 @@
+"""Cached loading of the screener's results for dashboard.py.
+
+Results come from the screener's SQLite results store (eligibility_results.sqlite) when it
+exists: filters and aggregates run as indexed SQL queries, and criteria are fetched only for the
+patient on screen (StoreResultsData). Otherwise eligibility_results.json is parsed into columnar
+tables the tabs filter and aggregate in memory (ResultsData). Both are built once per version of
+their file, identified by its path, size and modification time, so a rerun costs one os.stat
+until the screener writes new results. The per-call telemetry (eligibility_metrics.jsonl) is
+cached the same way. Excel reports are streamed from either source to a
+file on disk when requested, and kept per results version and filter. Nothing here imports
+Streamlit, so the benchmarks can time the same code the dashboard runs.
+"""
+import atexit
+import functools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+RESULTS_PATH = "eligibility_results.json"
+RESULTS_DB_PATH = "eligibility_results.sqlite"
+METRICS_PATH = "eligibility_metrics.jsonl"
+# Token counts of each logged call, in the order the Operations tab stacks them
+TOKEN_COLUMNS = ["cache_read_input_tokens", "cache_creation_input_tokens", "input_tokens", "output_tokens"]
+ELIGIBILITY_STATUSES = ("ELIGIBLE", "NOT_ELIGIBLE", "LIKELY_ELIGIBLE", "UNCLEAR")
+CRITERION_STATUSES = ("MET", "NOT_MET", "NEEDS_VERIFICATION")
+# patients columns holding the per-result count of each CRITERION_STATUSES entry
+TALLY_COLUMNS = ("met", "not_met", "review")
+CRITERIA_COLUMNS = ["criterion", "patient_value", "status", "score"]
+# Orders of the patient selector; status follows ELIGIBILITY_STATUSES
+SORT_ORDERS = ("patient_id", "confidence_desc", "confidence_asc", "status")
+PAGE_SIZE = 50
+# Shorter searches match the start of a patient ID or MRN, longer ones anywhere in it
+MIN_SUBSTRING_SEARCH = 3
+MAX_CACHED_VIEWS = 8
+MAX_CACHED_REPORTS = 4
+# Results read per step while a report streams
+EXPORT_CHUNK_SIZE = 1000
+SUMMARY_SHEET_COLUMNS = ["Patient ID", "Eligibility Status", "Confidence Score", "Criteria Met", "Criteria Not Met",
+                         "Needs Review", "Recommendation"]
+CRITERIA_SHEET_COLUMNS = ["Patient ID", "Criterion", "Patient Value", "Status", "Score"]
+
+
+# Guards the view caches of ResultsData and StoreResultsData, which every session thread shares.
+# Lookups are single dict reads and need no lock; eviction iterates the dict, so updates take it.
+_views_lock = threading.Lock()
+
+
+def _remember(cache, key, value):
+    """Keep value under key in a dict holding at most MAX_CACHED_VIEWS entries, dropping the oldest."""
+    with _views_lock:
+        if key not in cache and len(cache) >= MAX_CACHED_VIEWS:
+            cache.pop(next(iter(cache)))
+        cache[key] = value
+    return value
+
+
+def _filter_key(statuses, min_confidence):
+    return tuple(sorted(statuses)), float(min_confidence)
+
+
+def _search_key(query):
+    return query.strip().lower()
+
+
+class ResultsData:
+    """One version of the results file as two columnar tables, built once and shared by every tab.
+
+    patients has one row per result, indexed by its position in the file: patient_id, trial_id,
+    status (categorical), confidence, recommendation, the number of criteria and the MET, NOT_MET
+    and NEEDS_VERIFICATION tallies. criteria is the exploded criteria_evaluation of every result,
+    one row per criterion, with the `row` of its result. The object is shared by every rerun and
+    session that sees the same file version, so callers must not modify it.
+    """
+
+    def __init__(self, results, signature=None):
+        self.results = results
+        self.signature = signature
+        columns = {"row": [], "patient_id": [], "criterion": [], "patient_value": [], "status": [], "score": []}
+        patient_ids = []
+        for row, r in enumerate(results):
+            patient_id = r.get("patient_id", f"Patient {row}")
+            patient_ids.append(patient_id)
+            for c in r.get("criteria_evaluation") or []:
+                columns["row"].append(row)
+                columns["patient_id"].append(patient_id)
+                columns["criterion"].append(c.get("criterion", "N/A"))
+                columns["patient_value"].append(c.get("patient_value", "N/A"))
+                columns["status"].append(c.get("status"))
+                columns["score"].append(c.get("score"))
+        self.criteria = pd.DataFrame(columns)
+        self.criteria["row"] = self.criteria["row"].astype(np.int64)
+        self.criteria["status"] = pd.Categorical(self.criteria["status"], categories=CRITERION_STATUSES)
+        self.criteria["score"] = pd.to_numeric(self.criteria["score"], errors="coerce")
+
+        statuses = [r.get("overall_eligibility") or "UNKNOWN" for r in results]
+        self.patients = pd.DataFrame({
+            "patient_id": patient_ids,
+            "trial_id": [r.get("trial_id", "N/A") for r in results],
+            "status": pd.Categorical(statuses, categories=ELIGIBILITY_STATUSES + ("UNKNOWN",)),
+            "confidence": np.array([float(r.get("confidence_score") or 0) for r in results], dtype=float),
+            "recommendation": [r.get("recommendation", "N/A") for r in results],
+        })
+        tallies = (self.criteria.groupby(["row", "status"], observed=False).size().unstack(fill_value=0)
+                   .reindex(index=self.patients.index, columns=list(CRITERION_STATUSES), fill_value=0))
+        self.patients["criteria"] = tallies.sum(axis=1).to_numpy()
+        for status, column in zip(CRITERION_STATUSES, TALLY_COLUMNS):
+            self.patients[column] = tallies[status].to_numpy()
+
+        self.status_counts = self._summarize(self.patients)["status_counts"]
+        # Where each result's criteria start in the criteria table, which is ordered by row
+        self._criteria_starts = np.searchsorted(self.criteria["row"].to_numpy(), np.arange(len(results) + 1))
+        # Filtered views by (statuses, min_confidence); the tabs of one rerun share the same filter
+        self._views = {}
+        # Patient selector: row positions in each sort order, and the rows matching each search
+        self._orders = {}
+        self._searches = {}
+        self._search_ids = None
+
+    def __len__(self):
+        return len(self.results)
+
+    def filter(self, statuses, min_confidence=0.0):
+        """Return the patients rows whose status is in statuses and confidence >= min_confidence.
+
+        One boolean mask over the columns; the result is kept so every tab applying the same
+        filter in a rerun gets the same frame.
+        """
+        key = _filter_key(statuses, min_confidence)
+        view = self._views.get(key)
+        if view is None:
+            view = _remember(self._views, key, self.patients[self._mask(key)])
+        return view
+
+    def _mask(self, key):
+        selected = self.patients["status"].cat.categories.isin(key[0])
+        return selected[self.patients["status"].cat.codes.to_numpy()] & (self.patients["confidence"].to_numpy() >= key[1])
+
+    def summary(self, statuses, min_confidence=0.0):
+        """KPIs of a filter: counts per eligibility status, average confidence and criteria tallies."""
+        return self._summarize(self.filter(statuses, min_confidence))
+
+    def _summarize(self, view):
+        # Aggregated on the underlying arrays: pandas' per-call overhead dominates small views
+        codes = view["status"].cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(ELIGIBILITY_STATUSES) + 1)
+        tallies = view[list(TALLY_COLUMNS)].to_numpy().sum(axis=0) if len(view) else np.zeros(len(TALLY_COLUMNS))
+        return {
+            "total": len(view),
+            "status_counts": {status: int(count) for status, count in zip(ELIGIBILITY_STATUSES, counts)},
+            "average_confidence": float(view["confidence"].to_numpy().mean()) if len(view) else 0.0,
+            "criteria_checked": int(view["criteria"].to_numpy().sum()),
+            "criteria_counts": {status: int(count) for status, count in zip(CRITERION_STATUSES, tallies)},
+        }
+
+    def search(self, statuses, min_confidence=0.0, query="", sort="patient_id", page=0, page_size=PAGE_SIZE):
+        """Return (one page of the filter's rows whose patient ID matches query, number of matches).
+
+        Rows come in a SORT_ORDERS order. The JSON results hold no MRNs, so only patient IDs are searched.
+        """
+        key = (_filter_key(statuses, min_confidence), _search_key(query), sort)
+        rows = self._searches.get(key)
+        if rows is None:
+            # Every row is sorted once per order; a filter then keeps its rows in that order
+            order = self._orders.get(sort)
+            if order is None:
+                order = self._orders[sort] = self._sort(sort)
+            rows = order[self._mask(key[0])[order]]
+            if key[1]:
+                if self._search_ids is None:
+                    self._search_ids = self.patients["patient_id"].astype(str).str.lower()
+                ids = self._search_ids.iloc[rows]
+                found = ids.str.startswith(key[1]) if len(key[1]) < MIN_SUBSTRING_SEARCH else ids.str.contains(key[1], regex=False)
+                rows = rows[found.to_numpy()]
+            rows = _remember(self._searches, key, rows)
+        return self.patients.iloc[rows[page * page_size:(page + 1) * page_size]], len(rows)
+
+    def _sort(self, sort):
+        """Return the row positions of patients in a SORT_ORDERS order."""
+        columns = {"confidence_desc": ["confidence"], "confidence_asc": ["confidence"], "status": ["status"]}.get(sort, [])
+        ascending = [sort != "confidence_desc"] * len(columns)
+        ordered = self.patients.sort_values(columns + ["patient_id", "trial_id"], ascending=ascending + [True, True])
+        return self.patients.index.get_indexer(ordered.index)
+
+    def criteria_rows(self, statuses, min_confidence=0.0):
+        """Yield (patient_id, criterion, patient_value, status, score) for every criterion of the filter's results.
+
+        Follows the order of filter(), reading the criteria of EXPORT_CHUNK_SIZE results at a time.
+        """
+        view_rows = self.filter(statuses, min_confidence).index.to_numpy()
+        for start in range(0, len(view_rows), EXPORT_CHUNK_SIZE):
+            rows = view_rows[start:start + EXPORT_CHUNK_SIZE]
+            starts = self._criteria_starts[rows]
+            lengths = self._criteria_starts[rows + 1] - starts
+            # Positions in the criteria table of each row's criteria, one row after the other
+            positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+            chunk = self.criteria.iloc[positions]
+            yield from zip(chunk["patient_id"].tolist(), chunk["criterion"].tolist(), chunk["patient_value"].tolist(),
+                           chunk["status"].astype(object).tolist(), chunk["score"].tolist())
+
+    def criteria_for(self, row):
+        """Return the criteria table rows of one result."""
+        return self.criteria.iloc[self._criteria_starts[row]:self._criteria_starts[row + 1]]
+
+    def result_for(self, row):
+        """Return one result as the screener wrote it."""
+        return self.results[row]
+
+    def results_for(self, rows):
+        return [self.results[row] for row in rows]
+
+
+class StoreResultsData:
+    """Latest results in the screener's SQLite results store, queried on demand.
+
+    Offers the same methods as ResultsData. Views are indexed by assessment_id and hold only the
+    assessments' summary columns; criteria and full results are read per assessment. Each query
+    opens its own read-only connection, so one object can serve every Streamlit session thread.
+    """
+
+    # Columns of a view row; a search page adds the patient's MRN
+    VIEW_COLUMNS = ("assessment_id, patient_id, trial_id, overall_eligibility AS status, confidence_score AS confidence, "
+                    "recommendation, criteria_count AS criteria, met, not_met, review")
+    SORT_SQL = {
+        "patient_id": "patient_id, trial_id",
+        "confidence_desc": "confidence_score DESC, patient_id, trial_id",
+        "confidence_asc": "confidence_score, patient_id, trial_id",
+        "status": "CASE overall_eligibility "
+                  + " ".join(f"WHEN '{status}' THEN {index}" for index, status in enumerate(ELIGIBILITY_STATUSES))
+                  + f" ELSE {len(ELIGIBILITY_STATUSES)} END, patient_id, trial_id",
+    }
+
+    def __init__(self, db_path, signature=None):
+        self.db_path = db_path
+        self.signature = signature
+        self._views = {}
+        self._summaries = {}
+        self._counts = {}
+        self._pages = {}
+        self._length = self._query("SELECT COUNT(*) FROM assessments WHERE is_latest = 1")[0][0]
+        self._has_search_index = bool(self._query("SELECT 1 FROM sqlite_master WHERE name = 'patient_search'"))
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True)
+
+    def _query(self, sql, parameters=()):
+        connection = self._connect()
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _where(key):
+        statuses, min_confidence = key
+        placeholders = ", ".join("?" for _ in statuses) or "NULL"
+        return (f"is_latest = 1 AND overall_eligibility IN ({placeholders}) AND confidence_score >= ?",
+                (*statuses, min_confidence))
+
+    def _search_where(self, query):
+        """SQL condition and parameters restricting assessments to patients whose ID or MRN matches query."""
+        if not query:
+            return "", ()
+        if len(query) < MIN_SUBSTRING_SEARCH:
+            # Served by the NOCASE indexes on patients
+            pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return (" AND patient_id IN (SELECT patient_id FROM patients WHERE patient_id LIKE ? ESCAPE '\\' "
+                    "UNION SELECT patient_id FROM patients WHERE mrn LIKE ? ESCAPE '\\')", (pattern, pattern))
+        if self._has_search_index:
+            phrase = '"' + query.replace('"', '""') + '"'
+            return " AND patient_id IN (SELECT patient_id FROM patient_search WHERE patient_search MATCH ?)", (phrase,)
+        return (" AND patient_id IN (SELECT patient_id FROM patients "
+                "WHERE instr(lower(patient_id), ?) OR instr(lower(mrn), ?))", (query, query))
+
+    def __len__(self):
+        return self._length
+
+    def filter(self, statuses, min_confidence=0.0):
+        """Return the latest assessments matching the filter, in patient and trial order."""
+        key = _filter_key(statuses, min_confidence)
+        view = self._views.get(key)
+        if view is None:
+            where, parameters = self._where(key)
+            view = _remember(self._views, key, self._read_view(
+                f"SELECT {self.VIEW_COLUMNS} FROM assessments WHERE {where} ORDER BY patient_id, trial_id", parameters
+            ))
+        return view
+
+    def _read_view(self, sql, parameters):
+        connection = self._connect()
+        try:
+            view = pd.read_sql_query(sql, connection, params=parameters, index_col="assessment_id")
+        finally:
+            connection.close()
+        view["status"] = pd.Categorical(view["status"], categories=ELIGIBILITY_STATUSES + ("UNKNOWN",))
+        return view
+
+    def search(self, statuses, min_confidence=0.0, query="", sort="patient_id", page=0, page_size=PAGE_SIZE):
+        """Return (one page of the filter's assessments whose patient ID or MRN matches query, number of matches).
+
+        The count and the page are separate queries, and only the page's rows are read, with
+        their patients' MRNs.
+        """
+        key = (_filter_key(statuses, min_confidence), _search_key(query))
+        where, parameters = self._where(key[0])
+        search_where, search_parameters = self._search_where(key[1])
+        count = self._counts.get(key)
+        if count is None:
+            count = _remember(self._counts, key, self._query(
+                f"SELECT COUNT(*) FROM assessments WHERE {where}{search_where}", (*parameters, *search_parameters)
+            )[0][0])
+        page_key = (*key, sort, page, page_size)
+        rows = self._pages.get(page_key)
+        if rows is None:
+            rows = self._read_view(
+                f"SELECT {self.VIEW_COLUMNS} FROM assessments WHERE {where}{search_where} "
+                f"ORDER BY {self.SORT_SQL[sort]} LIMIT ? OFFSET ?",
+                (*parameters, *search_parameters, page_size, page * page_size)
+            )
+            patient_ids = rows["patient_id"].unique().tolist()
+            mrns = dict(self._query(
+                f"SELECT patient_id, mrn FROM patients WHERE patient_id IN ({', '.join('?' for _ in patient_ids)})",
+                patient_ids
+            )) if patient_ids else {}
+            rows["mrn"] = rows["patient_id"].map(mrns)
+            rows = _remember(self._pages, page_key, rows)
+        return rows, count
+
+    def summary(self, statuses, min_confidence=0.0):
+        """KPIs of a filter from one GROUP BY query over the status and confidence index."""
+        key = _filter_key(statuses, min_confidence)
+        summary = self._summaries.get(key)
+        if summary is None:
+            where, parameters = self._where(key)
+            rows = self._query(
+                "SELECT overall_eligibility, COUNT(*), SUM(confidence_score), SUM(criteria_count), SUM(met), "
+                f"SUM(not_met), SUM(review) FROM assessments WHERE {where} GROUP BY overall_eligibility",
+                parameters
+            )
+            total = sum(row[1] for row in rows)
+            counts = {row[0]: row[1] for row in rows}
+            summary = _remember(self._summaries, key, {
+                "total": total,
+                "status_counts": {status: counts.get(status, 0) for status in ELIGIBILITY_STATUSES},
+                "average_confidence": sum(row[2] for row in rows) / total if total else 0.0,
+                "criteria_checked": sum(row[3] for row in rows),
+                "criteria_counts": {status: sum(row[4 + index] for row in rows)
+                                    for index, status in enumerate(CRITERION_STATUSES)},
+            })
+        return summary
+
+    def criteria_rows(self, statuses, min_confidence=0.0):
+        """Yield (patient_id, criterion, patient_value, status, score) for every criterion of the filter's assessments.
+
+        Follows the order of filter(), streamed from one query without holding the rows in memory.
+        """
+        where, parameters = self._where(_filter_key(statuses, min_confidence))
+        connection = self._connect()
+        try:
+            yield from connection.execute(
+                "SELECT assessments.patient_id, criterion, patient_value, status, score FROM assessments "
+                f"JOIN criteria ON criteria.assessment_id = assessments.assessment_id WHERE {where} "
+                "ORDER BY assessments.patient_id, trial_id, position",
+                parameters
+            )
+        finally:
+            connection.close()
+
+    def criteria_for(self, assessment_id):
+        """Return the criteria rows of one assessment, read through the criteria primary key."""
+        rows = self._query(
+            f"SELECT {', '.join(CRITERIA_COLUMNS)} FROM criteria WHERE assessment_id = ? ORDER BY position",
+            (int(assessment_id),)
+        )
+        criteria = pd.DataFrame(rows, columns=CRITERIA_COLUMNS)
+        criteria["status"] = pd.Categorical(criteria["status"], categories=CRITERION_STATUSES)
+        return criteria
+
+    def result_for(self, assessment_id):
+        """Return one assessment in the JSON results format, with its criteria_evaluation."""
+        return self.results_for([assessment_id])[0]
+
+    def results_for(self, assessment_ids):
+        connection = self._connect()
+        try:
+            results = []
+            for assessment_id in assessment_ids:
+                (stored,) = connection.execute(
+                    "SELECT result FROM assessments WHERE assessment_id = ?", (int(assessment_id),)
+                ).fetchone()
+                result = json.loads(stored)
+                criteria = connection.execute(
+                    "SELECT criterion_id, criterion, patient_value, status, score FROM criteria "
+                    "WHERE assessment_id = ? ORDER BY position", (int(assessment_id),)
+                )
+                result["criteria_evaluation"] = [
+                    {field: value for field, value in zip(("criterion_id", *CRITERIA_COLUMNS), row) if value is not None}
+                    for row in criteria
+                ]
+                results.append(result)
+            return results
+        finally:
+            connection.close()
+
+
+def write_excel_report(data, statuses, min_confidence, path):
+    """Write the Summary and Detailed Criteria sheets of a filter to an .xlsx file.
+
+    openpyxl's write-only mode writes each row as it is appended, so memory does not grow with the
+    number of rows: the summary comes from the filter's view and the criteria stream from
+    data.criteria_rows.
+    """
+    workbook = Workbook(write_only=True)
+
+    def header(sheet, columns):
+        cells = []
+        for column in columns:
+            cell = WriteOnlyCell(sheet, value=column)
+            cell.font = Font(bold=True)
+            cells.append(cell)
+        sheet.append(cells)
+
+    summary = workbook.create_sheet("Summary")
+    header(summary, SUMMARY_SHEET_COLUMNS)
+    view = data.filter(statuses, min_confidence)
+    for start in range(0, len(view), EXPORT_CHUNK_SIZE):
+        chunk = view.iloc[start:start + EXPORT_CHUNK_SIZE]
+        for row in zip(chunk["patient_id"].tolist(), chunk["status"].astype(str).tolist(), chunk["confidence"].tolist(),
+                       *(chunk[column].tolist() for column in TALLY_COLUMNS), chunk["recommendation"].tolist()):
+            summary.append([*row[:-1], row[-1] if row[-1] is not None else "N/A"])
+
+    detailed = None
+    for patient_id, criterion, patient_value, status, score in data.criteria_rows(statuses, min_confidence):
+        if detailed is None:
+            detailed = workbook.create_sheet("Detailed Criteria")
+            header(detailed, CRITERIA_SHEET_COLUMNS)
+        detailed.append([
+            patient_id,
+            criterion if criterion is not None else "N/A",
+            patient_value if patient_value is not None else "N/A",
+            status.replace("NEEDS_VERIFICATION", "Review") if isinstance(status, str) else "N/A",
+            score if score is not None and score == score else "N/A",
+        ])
+    workbook.save(path)
+
+
+# Written reports by (results signature, filter key); _reports_lock guards them, _report_locks,
+# _report_downloads, _released_reports and _report_dir, and is only held briefly. Each report is
+# written under its own lock in _report_locks. The lock is reentrant because a download can be
+# released by the garbage collector while a thread holds it.
+_reports = {}
+_reports_lock = threading.RLock()
+_report_locks = {}
+# Live ReportDownload objects per report path, and the paths to delete once none is left
+_report_downloads = {}
+_released_reports = set()
+_report_dir = None
+
+
+def _report_directory():
+    """Return the temporary directory for reports, created on first use and removed at exit."""
+    global _report_dir
+    if _report_dir is None:
+        _report_dir = tempfile.mkdtemp(prefix="eligibility-reports-")
+        atexit.register(shutil.rmtree, _report_dir, True)
+    return _report_dir
+
+
+def cached_excel_report(data, statuses, min_confidence=0.0):
+    """Return the path of the filter's Excel report for this version of the results, or None if not written yet."""
+    path = _reports.get((data.signature, _filter_key(statuses, min_confidence)))
+    return path if path is not None and os.path.exists(path) else None
+
+
+def excel_report(data, statuses, min_confidence=0.0):
+    """Return the path of the filter's Excel report, writing it first unless it is cached.
+
+    Reports are temporary files, one per results version and filter; the oldest beyond
+    MAX_CACHED_REPORTS are deleted once no ReportDownload refers to them. Sessions asking for the
+    same report at the same time write it once, and reports for different versions or filters are
+    written in parallel. A report for unsaved results (no signature) is not kept: download it with
+    report_download(path, remove=True).
+    """
+    key = (data.signature, _filter_key(statuses, min_confidence))
+    with _reports_lock:
+        path = cached_excel_report(data, statuses, min_confidence)
+        if path is not None:
+            return path
+        report_lock = _report_locks.setdefault(key, threading.Lock())
+        directory = _report_directory()
+
+    with report_lock:
+        # Written by another session while this one waited
+        path = cached_excel_report(data, statuses, min_confidence)
+        if path is not None:
+            return path
+        descriptor, path = tempfile.mkstemp(suffix=".xlsx", dir=directory)
+        os.close(descriptor)
+        try:
+            write_excel_report(data, statuses, min_confidence, path)
+        except BaseException:
+            os.remove(path)
+            with _reports_lock:
+                _report_locks.pop(key, None)
+            raise
+        # The report and the end of its lock are published together, so no session writes it twice
+        with _reports_lock:
+            _report_locks.pop(key, None)
+            if data.signature is not None:
+                if len(_reports) >= MAX_CACHED_REPORTS:
+                    _release_report(_reports.pop(next(iter(_reports))))
+                _reports[key] = path
+    return path
+
+
+def _release_report(path):
+    """Delete a report file that is no longer cached, or defer that until its last download is gone."""
+    with _reports_lock:
+        if _report_downloads.get(path):
+            _released_reports.add(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def _end_report_download(path):
+    with _reports_lock:
+        _report_downloads[path] -= 1
+        if not _report_downloads[path]:
+            del _report_downloads[path]
+            if path in _released_reports:
+                _released_reports.discard(path)
+                _release_report(path)
+
+
+class ReportDownload:
+    """A written report's bytes on demand, for st.download_button(data=...).
+
+    The file is kept while the object exists, even if the report is evicted from the cache in the
+    meantime; Streamlit drops the object on the session's next rerun. Create it with report_download.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        _report_downloads[path] = _report_downloads.get(path, 0) + 1
+        weakref.finalize(self, _end_report_download, path)
+
+    def __call__(self):
+        return read_excel_report(self.path)
+
+
+def report_download(path, remove=False):
+    """Return a ReportDownload of a report returned by excel_report, or None if it was already deleted.
+
+    With remove set, as for a report of unsaved results, the file is deleted once no download of
+    it is left.
+    """
+    with _reports_lock:
+        if not os.path.exists(path):
+            return None
+        download = ReportDownload(path)
+        if remove:
+            _released_reports.add(path)
+        return download
+
+
+def read_excel_report(path, remove=False):
+    """Return the bytes of a written report for a download, deleting the file afterwards when remove is set."""
+    with open(path, "rb") as f:
+        content = f.read()
+    if remove:
+        os.remove(path)
+    return content
+
+
+def file_signature(path):
+    """Return (absolute path, size, mtime in ns) identifying one version of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+@functools.lru_cache(maxsize=4)
+def _load_version(path, size, mtime_ns):
+    with open(path, "r") as f:
+        return ResultsData(json.load(f), (path, size, mtime_ns))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_store_version(path, size, mtime_ns):
+    return StoreResultsData(path, (path, size, mtime_ns))
+
+
+def load_results_data(path=RESULTS_PATH, db_path=RESULTS_DB_PATH):
+    """Return the results for the dashboard: the SQLite results store if it exists, else the JSON file.
+
+    db_path=None reads the JSON file even when a store exists. Returns an empty ResultsData when
+    neither exists. Only a new size or modification time makes a file be read again; earlier
+    versions drop out of the small LRU caches.
+    """
+    signature = file_signature(db_path) if db_path is not None else None
+    if signature is not None:
+        return _load_store_version(*signature)
+    signature = file_signature(path)
+    if signature is None:
+        return ResultsData([])
+    return _load_version(*signature)
+
+
+@functools.lru_cache(maxsize=2)
+def _load_metrics_version(path, size, mtime_ns):
+    metrics = pd.read_json(path, lines=True, convert_dates=False)
+    metrics["timestamp"] = pd.to_datetime(metrics["timestamp"], unit="s")
+    metrics["total_input_tokens"] = (
+        metrics["input_tokens"] + metrics["cache_read_input_tokens"] + metrics["cache_creation_input_tokens"]
+    )
+    return metrics
+
+
+def load_call_metrics(path=METRICS_PATH):
+    """Return the screener's per-call telemetry, one row per call, or an empty DataFrame if there is none.
+
+    Like the results, the file is only parsed again when its size or modification time changes. The
+    DataFrame is shared by every rerun and session, so callers must not modify it.
+    """
+    signature = file_signature(path)
+    if signature is None or signature[1] == 0:
+        return pd.DataFrame()
+    return _load_metrics_version(*signature)
+
+
+def patient_tokens(metrics):
+    """Return the tokens each patient's calls used, indexed by patient_id, with a total column, largest first.
+
+    A grouped call is logged once with its patient IDs joined by commas; its tokens are split
+    evenly across those patients.
+    """
+    patient_ids = metrics["patient_id"].astype(str).str.split(",")
+    shares = metrics[TOKEN_COLUMNS].div(patient_ids.str.len(), axis=0)
+    shares["patient_id"] = patient_ids
+    shares = shares.explode("patient_id")
+    shares["patient_id"] = shares["patient_id"].str.strip()
+    tokens = shares.groupby("patient_id")[TOKEN_COLUMNS].sum()
+    tokens["total"] = tokens.sum(axis=1)
+    return tokens.sort_values("total", ascending=False)
+
+
+@functools.lru_cache(maxsize=2)
+def _patient_tokens_version(path, size, mtime_ns):
+    return patient_tokens(_load_metrics_version(path, size, mtime_ns))
+
+
+def load_patient_tokens(path=METRICS_PATH):
+    """Return patient_tokens of the telemetry file, computed once per file version; empty if there is none."""
+    signature = file_signature(path)
+    if signature is None or signature[1] == 0:
+        return pd.DataFrame(columns=TOKEN_COLUMNS + ["total"])
+    return _patient_tokens_version(*signature)
@@ -1,24 +1,68 @@
 #!git clone https://github.com/JPortilloHub/clinical-trial-eligibility-screener.git
 import anthropic
 from pypdf import PdfReader
-from langchain_voyageai import VoyageAIEmbeddings
-from langchain_chroma import Chroma
 import os
 import glob
 import csv
 import json
+import re
+import sqlite3
+import hashlib
+import time
+import asyncio
+import random
+import argparse
+import textwrap
+import functools
+import importlib.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+# Retries for the async client are handled by RateLimitScheduler so 429/529 responses reach it; it also
+# retries timeouts, dropped connections and 5xx responses, which the SDK would otherwise have retried
+async_client = anthropic.AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"), max_retries=0)
+
+PROTOCOL_PATH = "clinical-trial-protocol.pdf"
+EXTRACTION_MODEL = "claude-haiku-4-5-20251001"
+ASSESSMENT_MODEL = "claude-sonnet-4-20250514"
+TRIAGE_MODEL = "claude-haiku-4-5-20251001"
+DEFAULT_ESCALATION_CONFIDENCE = 0.8
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REQUEST_TIMEOUT = 120.0
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_TOKENS_PER_MINUTE = 30000
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BATCH_POLL_INTERVAL = 60.0
+# Output budget per patient assessment. The SDK refuses non-streaming requests whose max_tokens it
+# expects to take over 10 minutes (128,000 tokens an hour), which caps the patients per request
+ASSESSMENT_MAX_TOKENS = 2000
+MAX_REQUEST_OUTPUT_TOKENS = 128000 * 10 // 60
+MAX_PATIENTS_PER_REQUEST = MAX_REQUEST_OUTPUT_TOKENS // ASSESSMENT_MAX_TOKENS
+# Message Batches API limits per batch; the byte limit keeps headroom below the 256 MB cap
+MAX_BATCH_REQUESTS = 100000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+RESULT_CACHE_PATH = ".screener_cache.sqlite"
+DEFAULT_RESULT_CACHE_MAX_ENTRIES = 100000
+INGEST_CHUNK_SIZE = 32
+DEFAULT_EXTRACTION_WORKERS = 4
+VECTOR_STORE_PATH = ".screener_chroma"
+EMBEDDING_BATCH_SIZE = 128
 
 #1. Read clinical protocol and save it in a string
-file_path = "clinical-trial-protocol.pdf"
-reader = PdfReader(file_path)
-clinical_trial_protocol = ""
-for page in reader.pages:
-    clinical_trial_protocol += page.extract_text()
+def read_protocol(file_path=PROTOCOL_PATH):
+    """Return the text of every page of a clinical trial protocol PDF."""
+    reader = PdfReader(file_path)
+    clinical_trial_protocol = ""
+    for page in reader.pages:
+        clinical_trial_protocol += page.extract_text()
+    return clinical_trial_protocol
 
 #2. and extract the part you are interested in: Eligibility criteria
-extraction_prompt= f"""" You are a a clinician, and your task is to extract the section Patient Selection Criteria, 
+def extract_eligibility_criteria(clinical_trial_protocol, api_client=None, model=EXTRACTION_MODEL):
+    """Ask Claude for the Patient Selection Criteria section of the protocol text."""
+    api_client = api_client or client
+    extraction_prompt= f"""" You are a a clinician, and your task is to extract the section Patient Selection Criteria, 
 including Inclusion Criteria and Exclusion Criteria from the document in pdf wihtin curly brackets. 
 Return only the text of that section
 
@@ -27,88 +71,876 @@ Return only the text of that section
 </document>
 """
 
-response = client.messages.create(
-    model = "claude-haiku-4-5-20251001",
-    max_tokens = 2000,
-    messages = [{"role": "user", "content": extraction_prompt}]
-)
+    response = api_client.messages.create(
+        model = model,
+        max_tokens = 2000,
+        messages = [{"role": "user", "content": extraction_prompt}]
+    )
+
+    return response.content[0].text
+
+def load_eligibility_criteria(file_path=PROTOCOL_PATH, cache_path=RESULT_CACHE_PATH, api_client=None, model=EXTRACTION_MODEL):
+    """Return (criteria, cache_hit) for a protocol PDF, extracting only when the PDF is new or changed.
+
+    Extracted criteria are stored in the screener's SQLite cache keyed by the PDF's content hash
+    and the extraction model, so unchanged protocols skip both the PDF parse and the API call.
+    """
+    with open(file_path, "rb") as f:
+        pdf_hash = hashlib.sha256(f.read()).hexdigest()
+
+    connection = sqlite3.connect(cache_path)
+    try:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS protocol_criteria (
+                pdf_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                source TEXT,
+                criteria TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (pdf_hash, model)
+            )
+        """)
+        row = connection.execute(
+            "SELECT criteria FROM protocol_criteria WHERE pdf_hash = ? AND model = ?", (pdf_hash, model)
+        ).fetchone()
+        if row:
+            return row[0], True
+
+        criteria = extract_eligibility_criteria(read_protocol(file_path), api_client, model)
+        connection.execute(
+            "INSERT OR REPLACE INTO protocol_criteria (pdf_hash, model, source, criteria, created_at) VALUES (?, ?, ?, ?, ?)",
+            (pdf_hash, model, os.path.basename(file_path), criteria, time.time())
+        )
+        connection.commit()
+        return criteria, False
+    finally:
+        connection.close()
+
+def trial_id_from_path(protocol_path):
+    """Return the trial ID for a protocol PDF, e.g. protocols/NCT01234567.pdf -> NCT01234567."""
+    return os.path.splitext(os.path.basename(protocol_path))[0]
+
+def load_trials(protocol_paths, cache_path=RESULT_CACHE_PATH, api_client=None, model=EXTRACTION_MODEL,
+                max_workers=DEFAULT_EXTRACTION_WORKERS):
+    """Return one trial dict (trial_id, protocol, criteria, cached) per protocol PDF, in input order.
+
+    Criteria come from load_eligibility_criteria, so each protocol is extracted at most once per
+    content hash; protocols that are not cached yet are extracted on a small thread pool.
+    """
+    def load(protocol_path):
+        criteria, cached = load_eligibility_criteria(protocol_path, cache_path, api_client, model)
+        return {"trial_id": trial_id_from_path(protocol_path), "protocol": protocol_path,
+                "criteria": criteria, "cached": cached}
+
+    with ThreadPoolExecutor(max(1, max_workers)) as executor:
+        return list(executor.map(load, protocol_paths))
+
+# Field selection: the EHR sections, and rows within them, that the criteria actually reference.
+# Sections listed with row names are key/value sections; the others are lists kept or dropped whole.
+EHR_SCHEMA = {
+    "PATIENT_DEMOGRAPHICS": ["name", "mrn", "dob", "age", "sex", "gender", "race", "ethnicity", "language",
+                             "maritalStatus", "address", "insurance"],
+    "VITAL_SIGNS": ["bp", "hr", "temp", "weight", "height", "bmi"],
+    "MEDICATIONS": [],
+    "ALLERGIES": [],
+    "PROBLEM_LIST": [],
+    "LABORATORY_RESULTS": [],
+}
+# Rows kept whatever the selection says: every protocol in practice screens on age and sex
+ALWAYS_SELECTED_FIELDS = {"PATIENT_DEMOGRAPHICS": ["age", "sex"]}
+
+field_selection_tools = [
+    {
+        "name": "record_field_selection",
+        "description": "Record the EHR sections and fields needed to evaluate the eligibility criteria",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "sections": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "section": {"type": "string", "enum": list(EHR_SCHEMA)},
+                            "fields": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Rows to keep in a key/value section; empty keeps the whole section"
+                            },
+                            "criteria": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "The criteria that need this section"
+                            }
+                        },
+                        "required": ["section", "fields"]
+                    }
+                }
+            },
+            "required": ["sections"]
+        }
+    }
+]
+
+def select_ehr_fields(eligibility_criteria, api_client=None, model=EXTRACTION_MODEL):
+    """Ask Claude which EHR sections and fields the criteria need; return {section: [row names]}.
+
+    An empty row list keeps the whole section. Unknown sections and row names are ignored, and
+    a key/value section left without any known row name is kept whole.
+    """
+    api_client = api_client or client
+    schema = "\n".join(f"{section}: {', '.join(fields) if fields else '(list of records)'}"
+                       for section, fields in EHR_SCHEMA.items())
+    selection_prompt = f"""You are a clinician preparing patient records for an eligibility review.
+List every EHR section, and for the key/value sections every field, that could bear on any of the
+eligibility criteria below. Include anything that could be evidence for or against a criterion,
+directly or indirectly; when in doubt, include it.
+
+<ehr_schema>
+{schema}
+</ehr_schema>
+
+<eligibility_criteria>
+{eligibility_criteria}
+</eligibility_criteria>
+"""
+    response = api_client.messages.create(
+        model=model,
+        max_tokens=2000,
+        tools=field_selection_tools,
+        tool_choice={"type": "tool", "name": "record_field_selection"},
+        messages=[{"role": "user", "content": selection_prompt}]
+    )
+    selected = next(block.input for block in response.content if block.type == "tool_use")
+
+    selection = {}
+    for entry in selected.get("sections", []):
+        section = entry.get("section")
+        if section not in EHR_SCHEMA:
+            continue
+        known = {field.lower(): field for field in EHR_SCHEMA[section]}
+        fields = [known[field.lower()] for field in entry.get("fields", []) if field.lower() in known]
+        if not fields or section in selection and not selection[section]:
+            selection[section] = []
+        else:
+            selection[section] = list(dict.fromkeys(selection.get(section, []) + fields))
+    for section, fields in ALWAYS_SELECTED_FIELDS.items():
+        if selection.get(section):
+            selection[section] = list(dict.fromkeys(selection[section] + fields))
+        elif section not in selection:
+            selection[section] = list(fields)
+    return selection
+
+def load_field_selection(eligibility_criteria, cache_path=RESULT_CACHE_PATH, api_client=None, model=EXTRACTION_MODEL):
+    """Return (selection, cache_hit) for a protocol's criteria, asking the model only for new criteria.
 
-eligibility_criteria_extraction = response.content[0].text
+    Selections are stored next to the extracted criteria, keyed by the criteria's content hash and
+    the model, so an amended protocol gets a fresh selection and an unchanged one costs nothing.
+    """
+    criteria_hash = hashlib.sha256(eligibility_criteria.encode("utf-8")).hexdigest()
+    connection = sqlite3.connect(cache_path)
+    try:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS field_selections (
+                criteria_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                selection TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (criteria_hash, model)
+            )
+        """)
+        row = connection.execute(
+            "SELECT selection FROM field_selections WHERE criteria_hash = ? AND model = ?", (criteria_hash, model)
+        ).fetchone()
+        if row:
+            return json.loads(row[0]), True
+
+        selection = select_ehr_fields(eligibility_criteria, api_client, model)
+        connection.execute(
+            "INSERT OR REPLACE INTO field_selections (criteria_hash, model, selection, created_at) VALUES (?, ?, ?, ?)",
+            (criteria_hash, model, json.dumps(selection), time.time())
+        )
+        connection.commit()
+        return selection, False
+    finally:
+        connection.close()
 
+def describe_field_selection(selection):
+    """Return a one-line summary of a field selection, e.g. PATIENT_DEMOGRAPHICS(age, sex), MEDICATIONS."""
+    return ", ".join(f"{section}({', '.join(fields)})" if fields else section for section, fields in selection.items())
 
-#(optional)3 Embed the eligibility criteria into the vector database in case of having several protocols
-eligibility_criteria_embedded = VoyageAIEmbeddings(model="voyage-3", voyage_api_key=os.environ.get("VOYAGE_API_KEY"))
+def union_field_selections(selections):
+    """Return a field selection keeping every section and row that any of `selections` keeps.
 
-eligibility_criteria_vector_db = Chroma.from_texts(
-    texts=[eligibility_criteria_extraction],
-    embedding=eligibility_criteria_embedded,
-    collection_name="eligibility_criteria",
-    metadatas=[{"source": "clinical-trial-protocol.pdf", "section": "Patient Selection Criteria"}]
-)
+    A selection of None keeps the whole record, and so does the union; an empty field list keeps
+    every row of its section.
+    """
+    union = {}
+    for selection in selections:
+        if selection is None:
+            return None
+        for section, fields in selection.items():
+            if not fields or section in union and not union[section]:
+                union[section] = []
+            else:
+                union[section] = list(dict.fromkeys(union.get(section, []) + fields))
+    return union
+
+# Criterion items: the criteria text split into individual criteria with IDs derived from their
+# wording, so an unchanged criterion keeps its ID across protocol amendments and renumbering
+CRITERION_ITEM_PATTERN = re.compile(r"^(\s*)(?:\d+[.)]|[-*•]|[a-z][.)])\s+")
+CRITERION_ID_PATTERN = re.compile(r"\[((?:IN|EX|CR)-[0-9a-f]{8})\]")
+
+def _criterion_section(line):
+    """Return "IN" or "EX" for an Inclusion/Exclusion Criteria heading line, otherwise None."""
+    heading = re.sub(r"[#*_:]", "", line).strip().lower()
+    if len(heading) > 40:
+        return None
+    if "inclusion" in heading:
+        return "IN"
+    if "exclusion" in heading:
+        return "EX"
+    return None
+
+def parse_criteria_items(eligibility_criteria):
+    """Split criteria text into [{"id", "section", "text", "line"}] items, in order.
+
+    An item starts at a numbered or bulleted line no deeper than the first item of its section;
+    deeper bullets and wrapped lines belong to the item above. IDs are the section (IN, EX, or
+    CR before any heading) and a hash of the item's normalized wording. `line` is the index of
+    the item's first line. Returns [] when the text has no recognizable items.
+    """
+    items = []
+    section = "CR"
+    base_indent = None
+    for number, line in enumerate(eligibility_criteria.splitlines()):
+        match = CRITERION_ITEM_PATTERN.match(line)
+        heading = _criterion_section(line) if not match else None
+        if heading:
+            section = heading
+            base_indent = None
+        elif match and (base_indent is None or len(match.group(1)) <= base_indent):
+            base_indent = len(match.group(1))
+            items.append({"section": section, "lines": [line[match.end():]], "line": number})
+        elif items and line.strip():
+            items[-1]["lines"].append(line.strip())
+
+    seen = {}
+    for item in items:
+        item["text"] = " ".join(CRITERION_ID_PATTERN.sub("", part).strip() for part in item.pop("lines")).strip()
+        normalized = re.sub(r"\s+", " ", re.sub(r"[*_`]", "", item["text"])).strip().lower()
+        item_id = f"{item['section']}-{hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:8]}"
+        seen[item_id] = seen.get(item_id, 0) + 1
+        item["id"] = item_id if seen[item_id] == 1 else f"{item_id}-{seen[item_id]}"
+    return items
+
+@functools.lru_cache(maxsize=64)
+def tag_criteria(eligibility_criteria):
+    """Return the criteria text with each item's ID in square brackets at the start of the item.
+
+    The rest of the text is left as it is; text without recognizable items is returned unchanged.
+    """
+    lines = eligibility_criteria.splitlines()
+    for item in parse_criteria_items(eligibility_criteria):
+        line = lines[item["line"]]
+        if CRITERION_ID_PATTERN.search(line):
+            continue
+        start = CRITERION_ITEM_PATTERN.match(line).end()
+        lines[item["line"]] = f"{line[:start]}[{item['id']}] {line[start:]}"
+    return "\n".join(lines)
+
+def criteria_version(eligibility_criteria):
+    """Short content hash identifying one version of a protocol's criteria."""
+    return hashlib.sha256(eligibility_criteria.encode("utf-8")).hexdigest()[:16]
+
+def find_criteria_version(version, cache_path=RESULT_CACHE_PATH):
+    """Return the criteria text for a criteria_version from the extraction cache, or None if it is gone."""
+    if not os.path.exists(cache_path):
+        return None
+    connection = sqlite3.connect(cache_path)
+    try:
+        connection.execute("CREATE TABLE IF NOT EXISTS protocol_criteria (pdf_hash TEXT, model TEXT, source TEXT, "
+                           "criteria TEXT, created_at REAL, PRIMARY KEY (pdf_hash, model))")
+        for (criteria,) in connection.execute("SELECT criteria FROM protocol_criteria ORDER BY created_at DESC"):
+            if criteria_version(criteria) == version:
+                return criteria
+        return None
+    finally:
+        connection.close()
+
+def diff_criteria(old_criteria, new_criteria):
+    """Compare two versions of a protocol's criteria item by item.
+
+    Returns {"added": [...], "removed": [...], "unchanged": [...]} lists of items; a reworded
+    criterion shows up as one removed and one added item.
+    """
+    old_items = {item["id"]: item for item in parse_criteria_items(old_criteria)}
+    new_items = parse_criteria_items(new_criteria)
+    new_ids = {item["id"] for item in new_items}
+    return {
+        "added": [item for item in new_items if item["id"] not in old_items],
+        "removed": [item for item_id, item in old_items.items() if item_id not in new_ids],
+        "unchanged": [item for item in new_items if item["id"] in old_items],
+    }
+
+def delta_criteria(items):
+    """Format criterion items as criteria text that parses back to the same IDs."""
+    headings = {"IN": "Inclusion Criteria:", "EX": "Exclusion Criteria:", "CR": "Criteria:"}
+    lines = []
+    for section in ("CR", "IN", "EX"):
+        section_items = [item for item in items if item["section"] == section]
+        if section_items:
+            lines.append(headings[section])
+            lines += [f"{number}. {item['text']}" for number, item in enumerate(section_items, 1)]
+    return "\n".join(lines)
+
+def overall_eligibility_from_criteria(criteria_evaluation):
+    """Derive overall_eligibility from per-criterion statuses: any NOT_MET excludes, any
+    NEEDS_VERIFICATION leaves the patient LIKELY_ELIGIBLE, and all MET is ELIGIBLE."""
+    statuses = {item.get("status") for item in criteria_evaluation}
+    if not statuses:
+        return "UNCLEAR"
+    if "NOT_MET" in statuses:
+        return "NOT_ELIGIBLE"
+    if "NEEDS_VERIFICATION" in statuses:
+        return "LIKELY_ELIGIBLE"
+    return "ELIGIBLE"
+
+def merge_delta_assessment(previous, delta, diff, version):
+    """Combine a previous assessment with a re-assessment of only the amended criteria.
+
+    Evaluations of removed criteria are dropped, those of unchanged criteria are kept and the
+    delta's evaluations of added criteria are appended. overall_eligibility is recomputed from
+    the merged evaluations, and the confidence is the lower of the two assessments'.
+    """
+    removed = {item["id"] for item in diff["removed"]}
+    added = {item["id"] for item in diff["added"]}
+    kept = [item for item in previous.get("criteria_evaluation") or [] if item.get("criterion_id") not in removed]
+    fresh = [item for item in delta.get("criteria_evaluation") or [] if item.get("criterion_id") in added]
+    merged = dict(previous)
+    merged["criteria_evaluation"] = kept + fresh
+    merged["overall_eligibility"] = overall_eligibility_from_criteria(merged["criteria_evaluation"])
+    previous_confidence = previous.get("confidence_score", 0)
+    merged["confidence_score"] = min(previous_confidence, delta.get("confidence_score", previous_confidence))
+    merged["criteria_version"] = version
+    merged["rescreened_criteria"] = sorted(added)
+    return merged
+
+def can_merge_delta(previous):
+    """A previous assessment can be updated in place only if every evaluation names its criterion ID."""
+    evaluation = previous.get("criteria_evaluation") or []
+    return bool(evaluation) and all(item.get("criterion_id") for item in evaluation)
+
+#(optional)3 Embed the eligibility criteria into the vector database in case of having several protocols,
+# and use it to pick the candidate trials for each patient
+EMBEDDING_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "of",
+                       "on", "or", "the", "to", "with", "within", "who", "must", "have", "has", "not"}
+
+class HashingEmbeddings:
+    """Deterministic local embeddings: signed feature hashing of word unigrams and bigrams.
+
+    Needs no API key or network, so the trial index can be built and queried offline with the
+    same vectors on every run. Provides the embed_documents/embed_query methods Chroma calls.
+    """
+
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        words = [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in EMBEDDING_STOPWORDS]
+        for feature in words + [f"{first} {second}" for first, second in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def get_embeddings(backend="voyage"):
+    """Return the embedding model for a backend name: "voyage" (Voyage AI voyage-3) or "hashing" (local)."""
+    if backend == "hashing":
+        return HashingEmbeddings()
+    # Imported here so that loading the screener does not pull in the embedding stack
+    from langchain_voyageai import VoyageAIEmbeddings
+    return VoyageAIEmbeddings(model="voyage-3", voyage_api_key=os.environ.get("VOYAGE_API_KEY"))
+
+def embed_eligibility_criteria(trials, embeddings=None, persist_directory=VECTOR_STORE_PATH,
+                               collection_name="eligibility_criteria", batch_size=EMBEDDING_BATCH_SIZE, prune=False):
+    """Sync each trial's criteria into a persistent Chroma collection, one document per trial ID.
+
+    Returns (vector_store, stats). Documents carry a hash of the criteria text, so only new or
+    changed protocols are embedded, handed to Chroma in batches of batch_size (the embedding
+    backend may split a batch into several API calls), and an unchanged protocol set makes no
+    embedding calls. Indexed trials missing from `trials` are
+    kept, so a single-protocol run leaves the portfolio alone; with prune they are removed.
+    """
+    from langchain_chroma import Chroma
+
+    vector_store = Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings or get_embeddings(),
+        persist_directory=persist_directory
+    )
+    indexed = vector_store.get(include=["metadatas"])
+    indexed_hashes = {
+        trial_id: (metadata or {}).get("content_hash") for trial_id, metadata in zip(indexed["ids"], indexed["metadatas"])
+    }
+
+    changed = []
+    for trial in trials:
+        content_hash = hashlib.sha256(trial["criteria"].encode("utf-8")).hexdigest()
+        if indexed_hashes.get(trial["trial_id"]) != content_hash:
+            changed.append((trial, content_hash))
+    removed = sorted(set(indexed_hashes) - {trial["trial_id"] for trial in trials}) if prune else []
+    if removed:
+        vector_store.delete(ids=removed)
+
+    stats = {"embedded": len(changed), "unchanged": len(trials) - len(changed), "removed": len(removed), "batches": 0}
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        # add_texts upserts by ID, so a changed protocol replaces its previous document
+        vector_store.add_texts(
+            texts=[trial["criteria"] for trial, _ in batch],
+            metadatas=[
+                {"trial_id": trial["trial_id"], "source": os.path.basename(trial["protocol"]),
+                 "section": "Patient Selection Criteria", "content_hash": content_hash}
+                for trial, content_hash in batch
+            ],
+            ids=[trial["trial_id"] for trial, _ in batch]
+        )
+        stats["batches"] += 1
+    return vector_store, stats
+
+def patient_summary(sections):
+    """Condense parsed TOON sections into a short retrieval query: age and sex, conditions, medications and labs."""
+    demographics = {
+        row.get("Field", "").strip().lower(): row.get("Value", "").strip()
+        for row in sections.get("PATIENT_DEMOGRAPHICS", [])
+    }
+    lines = [f"{demographics.get('age', 'Unknown age')} year old {demographics.get('sex', '')}".strip()]
+    conditions = [row.get("Condition", "").strip() for row in sections.get("PROBLEM_LIST", [])]
+    medications = [
+        f"{row.get('Medication', '').strip()} for {row.get('Indication', '').strip()}"
+        for row in sections.get("MEDICATIONS", [])
+    ]
+    labs = [f"{row.get('Test', '').strip()} {row.get('Value', '').strip()}" for row in sections.get("LABORATORY_RESULTS", [])]
+    for heading, items in (("Conditions", conditions), ("Medications", medications), ("Labs", labs)):
+        items = [item for item in items if item]
+        if items:
+            lines.append(f"{heading}: {'; '.join(items)}")
+    return "\n".join(lines)
+
+def candidate_trial_ids(vector_store, summary, k):
+    """Return the IDs of the k trials whose indexed criteria are closest to a patient summary."""
+    return [document.metadata["trial_id"] for document in vector_store.similarity_search(summary, k=k)]
 
 
 #4 Define how to convert csv to TOON format. This way it consumes less tokens
-def csv_to_toon(file_path):
-    """Convert a patient CSV file to TOON (Token-Oriented Object Notation) format."""
-    result = {}
-    current_section = None
-    current_headers = None
+# Compaction profile: fields that carry no eligibility signal are left out and values are normalized.
+# drop_sections lists whole sections, drop_columns the columns and drop_rows the rows (matched on the
+# first column, case-insensitive) to leave out per section. A section whose rows were all dropped is
+# kept as an explicit empty list, e.g. ALLERGIES[0]: for "None" allergy rows. normalize_dates,
+# normalize_units and abbreviate name the columns, per section, whose values compact_value rewrites,
+# so free text elsewhere (medication names, onset strings) is never touched.
+COMPACT_PROFILE = {
+    "drop_sections": [],
+    "drop_columns": {
+        "MEDICATIONS": ["Prescriber"],
+        "ALLERGIES": ["Verified"],
+        "LABORATORY_RESULTS": ["Reference Range"],
+    },
+    "drop_rows": {
+        "PATIENT_DEMOGRAPHICS": ["name", "mrn", "dob", "gender", "address", "insurance", "language", "maritalStatus"],
+        "ALLERGIES": ["None"],
+    },
+    "normalize_dates": {"VITAL_SIGNS": ["Date"], "LABORATORY_RESULTS": ["Date"]},
+    "normalize_units": {"VITAL_SIGNS": ["Value"]},
+    "abbreviate": {"MEDICATIONS": ["Route", "Frequency"]},
+    "abbreviations": {
+        "Once daily": "QD", "Twice daily": "BID", "Three times daily": "TID", "Four times daily": "QID",
+        "At bedtime": "QHS", "As needed": "PRN", "Oral": "PO",
+    },
+}
+
+def column_normalizations(profile, section, column):
+    """Return which of compact_value's normalizations a profile applies to a column: (dates, units, abbreviations).
+
+    Each profile setting maps sections to column names; True, as in older profiles, applies it to every column.
+    """
+    def applies(setting):
+        if isinstance(setting, dict):
+            return column in setting.get(section, [])
+        return bool(setting)
+
+    return applies(profile.get("normalize_dates")), applies(profile.get("normalize_units")), applies(profile.get("abbreviate"))
+
+def compact_value(value, profile=COMPACT_PROFILE, normalizations=(True, True, True)):
+    """Normalize one EHR value: US dates to ISO, imperial measurements to their metric value, abbreviations.
+
+    `normalizations` is column_normalizations for the value's column and selects which of the three apply.
+    """
+    dates, units, abbreviate = normalizations
+    if dates:
+        match = re.fullmatch(r"(\d{1,2})/(\d{1,2})/(\d{4})", value)
+        if match:
+            return f"{match.group(3)}-{int(match.group(1)):02d}-{int(match.group(2)):02d}"
+    if units:
+        # e.g. "194.0 lbs (88 kg)" or 5'9" (175 cm) -> the metric value the EHR already gives
+        match = re.search(r"\((\d+(?:\.\d+)?) ?(kg|cm)\)", value)
+        if match:
+            return f"{match.group(1)} {match.group(2)}"
+        match = re.fullmatch(r"(\d+(?:\.\d+)?) ?lbs?", value)
+        if match:
+            return f"{float(match.group(1)) * 0.4536:.1f} kg"
+        match = re.fullmatch(r"(\d+(?:\.\d+)?) ?°?F", value)
+        if match:
+            return f"{(float(match.group(1)) - 32) * 5 / 9:.1f} C"
+    if abbreviate:
+        return profile.get("abbreviations", {}).get(value, value)
+    return value
+
+def load_compact_profile(file_path):
+    """Load a TOON compaction profile from a JSON file with the same structure as COMPACT_PROFILE."""
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+def csv_to_toon(file_path, profile=None):
+    """Convert a patient CSV file to TOON (Token-Oriented Object Notation) format.
+
+    Works in a single pass: each data row is formatted as soon as it is read and each section is
+    emitted as one finished block of text when the next section starts. With a compaction
+    `profile` such as COMPACT_PROFILE, the dropped sections, columns and rows are skipped while
+    reading and the values of the columns the profile normalizes go through compact_value.
+    """
+    # Finished section blocks by name; re-assigning a repeated section keeps its first position
+    blocks = {}
+    section = None
+    header_line = None
+    header_count = 0
+    row_lines = []
+    dropped_rows = 0
+    dropped_sections = set(profile.get("drop_sections", [])) if profile else set()
 
     with open(file_path, "r") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row or all(cell.strip() == "" for cell in row):
+        for row in csv.reader(f):
+            # Skip blank rows
+            if not row or not "".join(row).strip():
                 continue
 
-            # Check if this is a section header (single cell that is all uppercase words)
-            # Section headers are like "PATIENT DEMOGRAPHICS", "VITAL SIGNS", "LABORATORY RESULTS"
-            first_cell = row[0].strip()
-            is_section_header = (
-                len(row) == 1 and
-                first_cell.isupper() and
-                all(word.isupper() for word in first_cell.split())
-            )
-            if is_section_header:
-                current_section = first_cell.replace(" ", "_")
-                result[current_section] = {"headers": None, "rows": []}
-                current_headers = None
+            # Section headers are a single all-uppercase cell like "PATIENT DEMOGRAPHICS" or "VITAL SIGNS"
+            if len(row) == 1:
+                first_cell = row[0].strip()
+                if first_cell.isupper() and all(word.isupper() for word in first_cell.split()):
+                    if section is not None and section not in dropped_sections:
+                        blocks[section] = _toon_block(section, header_line, row_lines, dropped_rows)
+                    section = first_cell.replace(" ", "_")
+                    header_line = None
+                    row_lines = []
+                    dropped_rows = 0
+                    continue
+
+            if section is None:
                 continue
 
-            # If we don't have headers yet, this row is the header
-            if current_section and current_headers is None:
-                current_headers = [h.strip() for h in row]
-                result[current_section]["headers"] = current_headers
+            # The first row after a section header holds the field names
+            if header_line is None:
+                header_count = len(row)
+                headers = [h.strip() for h in row]
+                if profile:
+                    dropped_columns = profile.get("drop_columns", {}).get(section, [])
+                    kept_columns = [index for index, header in enumerate(headers) if header not in dropped_columns]
+                    dropped_keys = {key.lower() for key in profile.get("drop_rows", {}).get(section, [])}
+                    headers = [headers[index] for index in kept_columns]
+                    # Kept columns that no normalization applies to are copied as they are
+                    normalized_columns = []
+                    for position, header in enumerate(headers):
+                        normalizations = column_normalizations(profile, section, header)
+                        if any(normalizations):
+                            normalized_columns.append((position, normalizations))
+                header_line = ",".join(headers)
                 continue
 
-            # Data row - store as list of values, padded to match header count
-            if current_section and current_headers:
-                row_values = [value.strip() for value in row]
-                # Pad row to match header count if needed
-                while len(row_values) < len(current_headers):
-                    row_values.append("")
-                # Trim row if it has more values than headers
-                row_values = row_values[:len(current_headers)]
-                result[current_section]["rows"].append(row_values)
-
-    # Convert to TOON format string
-    toon_lines = []
-    for section, data in result.items():
-        headers = data["headers"]
-        rows = data["rows"]
-        if headers and rows:
-            # TOON tabular format: section[count]{fields}:
-            header_str = ",".join(headers)
-            toon_lines.append(f"{section}[{len(rows)}]{{{header_str}}}:")
-            for row in rows:
-                # Ensure row has exactly the same number of fields as headers
-                toon_lines.append(f"  {','.join(row)}")
-        toon_lines.append("")  # Empty line between sections
-
-    return "\n".join(toon_lines)
-
-
-
-#5 Define the tool schema for structured output
+            # Data row, padded or trimmed to the header count
+            row_values = [value.strip() for value in row[:header_count]]
+            if len(row_values) < header_count:
+                row_values += [""] * (header_count - len(row_values))
+            if profile:
+                if row_values[0].lower() in dropped_keys:
+                    dropped_rows += 1
+                    continue
+                row_values = [row_values[index] for index in kept_columns]
+                for position, normalizations in normalized_columns:
+                    row_values[position] = compact_value(row_values[position], profile, normalizations)
+            row_lines.append("  " + ",".join(row_values))
+
+    if section is not None and section not in dropped_sections:
+        blocks[section] = _toon_block(section, header_line, row_lines, dropped_rows)
+
+    # Every block ends with a blank separator line; the final newline is dropped
+    return "".join(blocks.values())[:-1]
+
+def _toon_block(section, header_line, row_lines, dropped_rows=0):
+    """Format one section as TOON tabular text: section[count]{fields}: followed by indented rows."""
+    if header_line is not None and not row_lines and dropped_rows:
+        return f"{section}[0]:\n\n"
+    if header_line is None or not row_lines:
+        return "\n"
+    return f"{section}[{len(row_lines)}]{{{header_line}}}:\n" + "\n".join(row_lines) + "\n\n"
+
+def project_toon(patient_toon, selection):
+    """Keep only the sections, and the rows within them, named in a field selection.
+
+    Rows of a section with a row list are matched on their first column, case-insensitive. A
+    section whose selected rows are all missing is left out; explicit empty lists such as
+    ALLERGIES[0]: are kept.
+    """
+    blocks = []
+    current = None
+    for line in patient_toon.splitlines():
+        if line.startswith("  ") and current is not None:
+            current[2].append(line)
+            continue
+        match = re.match(r"^(\w+)\[\d+\](?:\{(.*)\})?:$", line)
+        if match and match.group(1) in selection:
+            current = (match.group(1), match.group(2), [])
+            blocks.append(current)
+        else:
+            current = None
+
+    projected = []
+    for section, header_line, row_lines in blocks:
+        fields = {field.lower() for field in selection[section]}
+        if header_line is None:
+            projected.append(f"{section}[0]:\n\n")
+            continue
+        if fields:
+            row_lines = [line for line in row_lines if line[2:].split(",", 1)[0].lower() in fields]
+        if row_lines:
+            projected.append(_toon_block(section, header_line, row_lines))
+    return "".join(projected)[:-1]
+
+
+
+#5 Parallel ingestion: convert patient CSVs to TOON on a process pool, ahead of the assessment stage
+def patient_id_from_path(patient_file):
+    """Return the patient ID for an EHR file, e.g. patients/EHR_001.csv -> EHR_001."""
+    return os.path.basename(patient_file).replace(".csv", "")
+
+def patient_mrn(patient_file):
+    """Return the MRN in an EHR file's PATIENT DEMOGRAPHICS section, or None; stops reading at the next section."""
+    with open(patient_file, "r") as f:
+        in_demographics = False
+        for row in csv.reader(f):
+            if len(row) == 1 and row[0].strip().isupper():
+                if in_demographics:
+                    return None
+                in_demographics = row[0].strip() == "PATIENT DEMOGRAPHICS"
+            elif in_demographics and len(row) >= 2 and row[0].strip().lower() == "mrn":
+                return row[1].strip() or None
+    return None
+
+def convert_patient_files(patient_files, profile=None):
+    """Convert a chunk of patient files, optionally with a compaction profile; runs in a worker process."""
+    return [(patient_id_from_path(patient_file), csv_to_toon(patient_file, profile)) for patient_file in patient_files]
+
+def _chunks(items, chunk_size):
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+class StageCounter:
+    """Items processed by one pipeline stage and its throughput since the stage was created."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.started = time.perf_counter()
+        self.last = self.started
+
+    def record(self, items=1):
+        self.items += items
+        self.last = time.perf_counter()
+
+    def summary(self):
+        elapsed = self.last - self.started
+        rate = self.items / elapsed if elapsed > 0 else 0
+        return f"{self.name}: {self.items} in {elapsed:.2f}s ({rate:,.1f}/s)"
+
+def iter_patient_toons(patient_files, max_workers=None, chunk_size=INGEST_CHUNK_SIZE, profile=None):
+    """Yield (patient_id, patient_toon) for every file in input order, converting on a process pool.
+
+    max_workers defaults to the CPU count; 0 converts in this process. `profile` is passed to csv_to_toon.
+    """
+    if max_workers == 0:
+        for patient_file in patient_files:
+            yield patient_id_from_path(patient_file), csv_to_toon(patient_file, profile)
+        return
+    with ProcessPoolExecutor(max_workers) as executor:
+        chunks = _chunks(patient_files, chunk_size)
+        for converted in executor.map(convert_patient_files, chunks, [profile] * len(chunks)):
+            yield from converted
+
+async def feed_patient_queue(patient_files, queue, prepare, max_workers=None, chunk_size=INGEST_CHUNK_SIZE,
+                             counter=None, profile=None, retrieve=None):
+    """Convert patient files on a process pool and put the jobs returned by prepare on queue.
+
+    prepare(patient_id, patient_toon) returns the (index, patient_id, patient_toon[, eligibility_criteria])
+    jobs for the assessment workers, one per trial the patient still needs a model call for, so
+    each patient is converted once however many trials it is screened against. Conversion runs at most
+    two chunks per worker ahead of the queue, which is bounded, so parsing stays ahead of the
+    model workers without reading the whole directory into memory. A None sentinel marks the
+    end of the jobs, even if conversion fails.
+
+    retrieve(converted), if given, runs on a thread for each converted chunk and returns one value
+    per patient, which is passed to prepare as a third argument. Blocking lookups, such as querying
+    the trial index through an embedding API, then run without stalling the assessment workers.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def enqueue(converted):
+        if retrieve:
+            retrieved = await loop.run_in_executor(None, retrieve, converted)
+        for position, (patient_id, patient_toon) in enumerate(converted):
+            if counter:
+                counter.record()
+            extra = (retrieved[position],) if retrieve else ()
+            for job in prepare(patient_id, patient_toon, *extra):
+                await queue.put(job)
+
+    try:
+        if max_workers == 0:
+            for patient_file in patient_files:
+                await enqueue(convert_patient_files([patient_file], profile))
+            return
+
+        max_workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers) as executor:
+            ahead = deque()
+            for chunk in _chunks(patient_files, chunk_size):
+                ahead.append(loop.run_in_executor(executor, convert_patient_files, chunk, profile))
+                if len(ahead) >= max_workers * 2:
+                    await enqueue(await ahead.popleft())
+            while ahead:
+                await enqueue(await ahead.popleft())
+    finally:
+        await queue.put(None)
+
+#6 Deterministic pre-screen: exclude patients who fail a structured criterion without calling the model
+# Rules for the bundled Alzheimer's protocol. Each rule reads the `value` column of the rows in `section`
+# whose `key` column is one of `names`, and checks it against a numeric range (min/max) or a set of
+# allowed values (one_of). Text results only fail a one_of rule when they are listed in none_of. Only
+# values that are present and fail a rule exclude a patient; anything missing, unparseable or not
+# listed (e.g. "Pending") is left for the model to judge.
+PRESCREEN_RULES = [
+    {"criterion": "Age 55-85 years", "section": "PATIENT_DEMOGRAPHICS", "key": "Field", "names": ["age"],
+     "value": "Value", "min": 55, "max": 85},
+    {"criterion": "MMSE Score 22-30", "section": "LABORATORY_RESULTS", "key": "Test", "names": ["MMSE"],
+     "value": "Value", "min": 22, "max": 30},
+    {"criterion": "CDR Global Score 0.5 or 1.0", "section": "LABORATORY_RESULTS", "key": "Test", "names": ["CDR Global"],
+     "value": "Value", "one_of": [0.5, 1.0]},
+    {"criterion": "Biomarker Confirmation - Positive amyloid (PET or CSF)", "section": "LABORATORY_RESULTS", "key": "Test",
+     "names": ["Amyloid PET", "Amyloid CSF"], "value": "Value", "one_of": ["Positive"], "none_of": ["Negative"]},
+]
+
+def parse_toon(patient_toon):
+    """Parse TOON text from csv_to_toon back into {section: [row dicts]}.
+
+    TOON rows are not quoted, so commas inside a value only survive in the last column.
+    """
+    sections = {}
+    headers = None
+    for line in patient_toon.splitlines():
+        if line.startswith("  ") and headers is not None:
+            values = line[2:].split(",", len(headers) - 1)
+            sections[section].append(dict(zip(headers, values)))
+            continue
+        match = re.match(r"^(\w+)\[\d+\]\{(.*)\}:$", line)
+        if match:
+            section = match.group(1)
+            headers = match.group(2).split(",")
+            sections[section] = []
+        else:
+            headers = None
+    return sections
+
+def _parse_number(value):
+    match = re.search(r"-?\d+(?:\.\d+)?", value)
+    return float(match.group()) if match else None
+
+def evaluate_prescreen_rule(rule, sections):
+    """Return a criteria_evaluation entry for one rule, or None when the patient has no usable value."""
+    names = {name.lower() for name in rule["names"]}
+    values = [
+        row.get(rule["value"], "").strip()
+        for row in sections.get(rule["section"], [])
+        if row.get(rule["key"], "").strip().lower() in names
+    ]
+    values = [value for value in values if value]
+    if not values:
+        return None
+
+    def passes(value):
+        """True or False when the value decides the rule, None when it cannot be parsed or recognized."""
+        number = _parse_number(value)
+        if "one_of" in rule:
+            numbers = [allowed for allowed in rule["one_of"] if isinstance(allowed, (int, float))]
+            labels = {str(allowed).lower() for allowed in rule["one_of"] if allowed not in numbers}
+            if value.lower() in labels or (number is not None and number in numbers):
+                return True
+            if value.lower() in {str(excluded).lower() for excluded in rule.get("none_of", [])}:
+                return False
+            return False if numbers and number is not None else None
+        if number is None:
+            return None
+        return rule.get("min", float("-inf")) <= number <= rule.get("max", float("inf"))
+
+    outcomes = [passes(value) for value in values]
+    if any(outcomes):
+        status = "MET"
+    elif all(outcome is False for outcome in outcomes):
+        status = "NOT_MET"
+    else:
+        return None
+    return {
+        "criterion": rule["criterion"],
+        "patient_value": ", ".join(values),
+        "status": status,
+        "score": 1.0 if status == "MET" else 0.0
+    }
+
+def prescreen_patient(patient_id, patient_toon, rules=PRESCREEN_RULES, sections=None):
+    """Return a NOT_ELIGIBLE record_eligibility_assessment if a rule is definitely failed, else None.
+
+    Pass `sections` from parse_toon to reuse one parse when the patient is checked against several trials.
+    """
+    if sections is None:
+        sections = parse_toon(patient_toon)
+    evaluations = [evaluation for evaluation in (evaluate_prescreen_rule(rule, sections) for rule in rules) if evaluation]
+    failed = [evaluation for evaluation in evaluations if evaluation["status"] == "NOT_MET"]
+    if not failed:
+        return None
+
+    reasons = "; ".join(f"{evaluation['criterion']} (patient value: {evaluation['patient_value']})" for evaluation in failed)
+    return {
+        "patient_id": patient_id,
+        "trial_id": "<UNKNOWN>",
+        "overall_eligibility": "NOT_ELIGIBLE",
+        "confidence_score": 1.0,
+        "criteria_evaluation": evaluations,
+        "recommendation": f"Not eligible by rule-based pre-screen, without model review: {reasons}.",
+        "next_steps": ["Confirm the excluding values in the source EHR before closing this patient's screening."]
+    }
+
+def load_prescreen_rules(file_path):
+    """Load pre-screen rules from a JSON file with the same structure as PRESCREEN_RULES."""
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+#7 Define the tool schema for structured output
 tools = [
     {
         "name": "record_eligibility_assessment",
@@ -132,6 +964,10 @@ tools = [
                     "items": {
                         "type": "object",
                         "properties": {
+                            "criterion_id": {
+                                "type": "string",
+                                "description": "ID in square brackets before the criterion, e.g. IN-1a2b3c4d"
+                            },
                             "criterion": {"type": "string"},
                             "patient_value": {"type": "string"},
                             "status": {
@@ -154,12 +990,20 @@ tools = [
     }
 ]
 
-def assess_patient_eligibility(patient_id, patient_toon, eligibility_criteria):
-    """Assess a single patient's eligibility for the clinical trial."""
-    prompt = f"""
-Analyze the patient's eligibility for the clinical trial based on their data and the eligibility criteria.
+ASSESSMENT_INSTRUCTIONS = """Analyze the patient's eligibility for the clinical trial based on their data and the eligibility criteria.
+Evaluate each criterion separately and copy its ID from the square brackets into criterion_id.
+Use the record_eligibility_assessment tool to record your assessment."""
 
-<patientid>
+def build_assessment_request(patient_id, patient_toon, eligibility_criteria, model=ASSESSMENT_MODEL):
+    """Build the messages.create arguments for a single patient assessment.
+
+    The tools, instructions and eligibility criteria are identical for every patient in a run,
+    so they form the prompt prefix and the cache breakpoint sits at the end of the criteria
+    (tools are cached along with the system prompt). Only the per-patient TOON block after it
+    is billed as uncached input once the prefix is warm. Criteria are tagged with their item IDs
+    (tag_criteria) so each evaluation names the criterion it belongs to.
+    """
+    prompt = f"""<patientid>
 {patient_id}
 </patientid>
 
@@ -167,60 +1011,1957 @@ Analyze the patient's eligibility for the clinical trial based on their data and
 {patient_toon}
 </patientdata>
 
-<trialeligibilitycriteria>
-{eligibility_criteria}
-</trialeligibilitycriteria>
-
-Use the record_eligibility_assessment tool to record your assessment.
+Use the record_eligibility_assessment tool to record your assessment for this patient.
 """
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=2000,
-        tools=tools,
-        tool_choice={"type": "tool", "name": "record_eligibility_assessment"},
-        messages=[{"role": "user", "content": prompt}]
-    )
+    return {
+        "model": model,
+        "max_tokens": ASSESSMENT_MAX_TOKENS,
+        "tools": tools,
+        "tool_choice": {"type": "tool", "name": "record_eligibility_assessment"},
+        "system": [
+            {"type": "text", "text": ASSESSMENT_INSTRUCTIONS},
+            {
+                "type": "text",
+                "text": f"<trialeligibilitycriteria>\n{tag_criteria(eligibility_criteria)}\n</trialeligibilitycriteria>",
+                "cache_control": {"type": "ephemeral"}
+            }
+        ],
+        "messages": [{"role": "user", "content": prompt}]
+    }
+
+def build_group_assessment_request(patients, eligibility_criteria, model=ASSESSMENT_MODEL):
+    """Build one messages.create request that assesses several (patient_id, patient_toon) pairs.
+
+    The prefix (tools, instructions and criteria) is the same as for single-patient requests, so
+    both kinds share the prompt cache; the model is asked for one tool call per patient.
+    """
+    if len(patients) > MAX_PATIENTS_PER_REQUEST:
+        raise ValueError(f"{len(patients)} patients need more than {MAX_REQUEST_OUTPUT_TOKENS} output tokens; "
+                         f"group at most {MAX_PATIENTS_PER_REQUEST} per request")
+    request = build_assessment_request(patients[0][0], patients[0][1], eligibility_criteria, model)
+    blocks = "\n".join(f"""<patient>
+<patientid>
+{patient_id}
+</patientid>
 
-    # Extract the tool use response
+<patientdata>
+{patient_toon}
+</patientdata>
+</patient>
+""" for patient_id, patient_toon in patients)
+    request["max_tokens"] = ASSESSMENT_MAX_TOKENS * len(patients)
+    request["messages"] = [{"role": "user", "content": f"""{blocks}
+Use the record_eligibility_assessment tool once for each of the {len(patients)} patients above, with
+patient_id set exactly as given in <patientid>.
+"""}]
+    return request
+
+def extract_assessment(response):
+    """Return the record_eligibility_assessment tool input from a model response."""
     for block in response.content:
         if block.type == "tool_use":
             return block.input
 
     return None
 
-#6 Main: Read all patient CSV files and assess eligibility
-if __name__ == "__main__":
-    patients_folder = "patients"
-    patient_files = sorted(glob.glob(os.path.join(patients_folder, "*.csv")))
+def extract_group_assessments(response, patient_ids):
+    """Map the record_eligibility_assessment calls of a grouped response to {patient_id: assessment}.
+
+    Calls are matched on patient_id, ignoring case and surrounding whitespace. Calls for unknown
+    patients, repeats of a patient already matched and malformed calls (no valid verdict or
+    confidence) are ignored, so every patient missing from the result can be re-assessed alone.
+    """
+    verdicts = tools[0]["input_schema"]["properties"]["overall_eligibility"]["enum"]
+    expected = {patient_id.strip().lower(): patient_id for patient_id in patient_ids}
+    assessments = {}
+    for block in response.content:
+        if block.type != "tool_use" or block.name != "record_eligibility_assessment" or not isinstance(block.input, dict):
+            continue
+        patient_id = expected.get(str(block.input.get("patient_id", "")).strip().lower())
+        if patient_id is None or patient_id in assessments:
+            continue
+        if block.input.get("overall_eligibility") not in verdicts or not isinstance(block.input.get("confidence_score"), (int, float)):
+            continue
+        assessments[patient_id] = dict(block.input, patient_id=patient_id)
+    return assessments
 
-    # Store all eligibility results
-    all_results = []
+class TokenUsage:
+    """Run-level token totals, splitting input into cache hits, cache writes and uncached tokens."""
 
-    print(f"Processing {len(patient_files)} patients...")
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.output_tokens = 0
 
-    for patient_file in patient_files:
-        patient_id = os.path.basename(patient_file).replace(".csv", "")
-        patient_toon = csv_to_toon(patient_file)
+    def record(self, usage):
+        """Add the usage block of one model response."""
+        if usage is None:
+            return
+        self.calls += 1
+        self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+        self.cache_read_input_tokens += getattr(usage, "cache_read_input_tokens", 0) or 0
+        self.cache_creation_input_tokens += getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self.output_tokens += getattr(usage, "output_tokens", 0) or 0
 
-        print(f"Assessing {patient_id}...")
+    def summary(self):
+        total_input = self.input_tokens + self.cache_read_input_tokens + self.cache_creation_input_tokens
+        hit_rate = self.cache_read_input_tokens / total_input if total_input else 0
+        return (f"Tokens over {self.calls} call(s): {self.cache_read_input_tokens:,} cache hit, "
+                f"{self.cache_creation_input_tokens:,} cache write, {self.input_tokens:,} uncached input, "
+                f"{self.output_tokens:,} output ({hit_rate:.0%} of input served from cache)")
+
+run_usage = TokenUsage()
+
+# USD per million tokens; Message Batches are billed at half these rates
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": {"input": 3.00, "cache_write": 3.75, "cache_read": 0.30, "output": 15.00},
+    "claude-haiku-4-5-20251001": {"input": 1.00, "cache_write": 1.25, "cache_read": 0.10, "output": 5.00},
+}
+BATCH_DISCOUNT = 0.5
+
+def estimate_cost(model, usage, batch=False):
+    """Estimate the USD cost of one call from its usage block, or None for a model without pricing."""
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None or usage is None:
+        return None
+    cost = (
+        (getattr(usage, "input_tokens", 0) or 0) * pricing["input"]
+        + (getattr(usage, "cache_creation_input_tokens", 0) or 0) * pricing["cache_write"]
+        + (getattr(usage, "cache_read_input_tokens", 0) or 0) * pricing["cache_read"]
+        + (getattr(usage, "output_tokens", 0) or 0) * pricing["output"]
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list, e.g. fraction=0.95 for p95."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+class CallMetrics:
+    """Per-call telemetry: tokens, latency, retries, model and estimated cost of every assessment call.
+
+    Each call is appended to a JSONL file (when one is opened) as soon as it is recorded, and the
+    run summary reports latency percentiles and throughput over all recorded calls.
+    """
+
+    def __init__(self):
+        self.file = None
+        self.latencies = []
+        self.calls = 0
+        self.tokens = 0
+        self.cost = 0.0
+        # What the calls made on other models would have cost on ASSESSMENT_MODEL
+        self.assessment_model_cost = 0.0
+        self.window_start = None
+        self.window_end = None
+
+    def open(self, path, append=False):
+        self.file = open(path, "a" if append else "w")
+
+    def record(self, patient_id, trial_id, model, usage, latency, retries=0, status="ok", mode="interactive"):
+        """Record one call; latency is None when it is not known, e.g. for a Message Batches entry."""
+        now = time.time()
+        cost = estimate_cost(model, usage, batch=mode == "batch")
+        metrics = {
+            "timestamp": now,
+            "patient_id": patient_id,
+            "trial_id": trial_id,
+            "model": model,
+            "mode": mode,
+            "status": status,
+            "latency_s": round(latency, 4) if latency is not None else None,
+            "retries": retries,
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cost_usd": round(cost, 6) if cost is not None else None
+        }
+        self.calls += 1
+        self.tokens += sum(metrics[field] for field in
+                           ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens", "output_tokens"))
+        self.cost += cost or 0.0
+        if model != ASSESSMENT_MODEL:
+            self.assessment_model_cost += estimate_cost(ASSESSMENT_MODEL, usage, batch=mode == "batch") or 0.0
+        started = now - (latency or 0.0)
+        self.window_start = started if self.window_start is None else min(self.window_start, started)
+        self.window_end = now if self.window_end is None else max(self.window_end, now)
+        if latency is not None:
+            self.latencies.append(latency)
+        if self.file:
+            self.file.write(json.dumps(metrics) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def summary(self):
+        elapsed = (self.window_end - self.window_start) if self.calls else 0
+        calls_per_second = self.calls / elapsed if elapsed > 0 else 0
+        tokens_per_second = self.tokens / elapsed if elapsed > 0 else 0
+        latencies = sorted(self.latencies)
+        if not latencies:
+            # Message Batches entries carry no per-call timing
+            return f"Calls: {self.calls}, latency not measured; estimated cost ${self.cost:.4f}"
+        latency = ", ".join(f"p{int(fraction * 100)} {percentile(latencies, fraction):.2f}s" for fraction in (0.5, 0.95, 0.99))
+        return (f"Calls: {self.calls}, latency {latency}; throughput {calls_per_second:.2f} calls/s "
+                f"({calls_per_second * 60:,.0f}/min), {tokens_per_second:,.0f} tokens/s; estimated cost ${self.cost:.4f}")
+
+run_metrics = CallMetrics()
+
+# Model cascade: a cheaper model triages every assessment and only uncertain ones go to ASSESSMENT_MODEL
+ESCALATION_VERDICTS = ("UNCLEAR", "LIKELY_ELIGIBLE")
+
+class ModelCascade:
+    """Escalation policy and counters for a triage -> ASSESSMENT_MODEL cascade.
+
+    A triage result is kept when its verdict is ELIGIBLE or NOT_ELIGIBLE, its confidence is at
+    least min_confidence and no criterion NEEDS_VERIFICATION; anything else is re-assessed by
+    ASSESSMENT_MODEL. Kept results are stamped with the model that produced them.
+    """
 
-        result = assess_patient_eligibility(
-            patient_id,
-            patient_toon,
-            eligibility_criteria_extraction
+    def __init__(self, triage_model=TRIAGE_MODEL, min_confidence=DEFAULT_ESCALATION_CONFIDENCE):
+        self.triage_model = triage_model
+        self.min_confidence = min_confidence
+        self.triaged = 0
+        self.escalations = {}
+        self.latencies = []
+
+    @property
+    def cache_model(self):
+        """Stands in for the model in result cache keys, so cascaded and single-model results never mix."""
+        return f"{self.triage_model}>{ASSESSMENT_MODEL}@{self.min_confidence}"
+
+    def review(self, result):
+        """Count a triage result and return why it needs escalating, or None to keep it."""
+        self.triaged += 1
+        if not result:
+            reason = "triage failed"
+        elif result.get("overall_eligibility") in ESCALATION_VERDICTS:
+            reason = result["overall_eligibility"]
+        elif (result.get("confidence_score") or 0) < self.min_confidence:
+            reason = "low confidence"
+        elif any(item.get("status") == "NEEDS_VERIFICATION" for item in result.get("criteria_evaluation") or []):
+            reason = "NEEDS_VERIFICATION"
+        else:
+            return None
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        return reason
+
+    def stamp(self, result, reason, latency=None):
+        """Label a final result with its model and escalation reason; latency is end to end over both tiers."""
+        if latency is not None:
+            self.latencies.append(latency)
+        if result:
+            result["assessed_by"] = ASSESSMENT_MODEL if reason else self.triage_model
+            if reason:
+                result["escalation_reason"] = reason
+        return result
+
+    def summary(self, metrics):
+        escalated = sum(self.escalations.values())
+        reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(self.escalations.items(), key=lambda item: -item[1]))
+        lines = [f"Cascade ({self.triage_model} -> {ASSESSMENT_MODEL}, min confidence {self.min_confidence:.2f}): "
+                 f"{escalated} of {self.triaged} assessment(s) escalated "
+                 f"({escalated / self.triaged if self.triaged else 0:.0%}{': ' + reasons if reasons else ''})"]
+        latencies = sorted(self.latencies)
+        if latencies:
+            lines.append(f"  End-to-end latency p50 {percentile(latencies, 0.5):.2f}s, p95 {percentile(latencies, 0.95):.2f}s")
+        # Each triage call's tokens priced at ASSESSMENT_MODEL rates stand in for the single-model call
+        all_assessment_cost = metrics.assessment_model_cost
+        if all_assessment_cost:
+            lines.append(f"  Estimated cost ${metrics.cost:.4f} vs ${all_assessment_cost:.4f} all-{ASSESSMENT_MODEL} "
+                         f"({1 - metrics.cost / all_assessment_cost:.0%} saved)")
+        return "\n".join(lines)
+
+class GroupedRequestStats:
+    """Run-level counts for multi-patient requests: requests sent, patients packed and fallbacks."""
+
+    def __init__(self):
+        self.requests = 0
+        self.patients = 0
+        self.fallbacks = 0
+
+    def summary(self):
+        per_request = self.patients / self.requests if self.requests else 0
+        return (f"Grouped requests: {self.patients} patient(s) in {self.requests} request(s) "
+                f"({per_request:.1f} per request), {self.fallbacks} re-assessed alone")
+
+run_groups = GroupedRequestStats()
+
+def assess_patient_eligibility(patient_id, patient_toon, eligibility_criteria, api_client=None, trial_id=None,
+                               model=ASSESSMENT_MODEL):
+    """Assess a single patient's eligibility for the clinical trial."""
+    api_client = api_client or client
+    request = build_assessment_request(patient_id, patient_toon, eligibility_criteria, model)
+    start = time.perf_counter()
+    try:
+        response = api_client.messages.create(**request)
+    except anthropic.APIError:
+        run_metrics.record(patient_id, trial_id, request["model"], None, time.perf_counter() - start, status="error")
+        raise
+    usage = getattr(response, "usage", None)
+    run_usage.record(usage)
+    run_metrics.record(patient_id, trial_id, request["model"], usage, time.perf_counter() - start)
+    return extract_assessment(response)
+
+def assess_patient_cascade(cascade, patient_id, patient_toon, eligibility_criteria, api_client=None, trial_id=None):
+    """Assess with cascade.triage_model, re-assessing with ASSESSMENT_MODEL when the cascade escalates."""
+    start = time.perf_counter()
+    try:
+        result = assess_patient_eligibility(patient_id, patient_toon, eligibility_criteria, api_client, trial_id,
+                                            cascade.triage_model)
+    except anthropic.APIError:
+        result = None
+    reason = cascade.review(result)
+    if reason:
+        result = assess_patient_eligibility(patient_id, patient_toon, eligibility_criteria, api_client, trial_id)
+    return cascade.stamp(result, reason, time.perf_counter() - start)
+
+def assess_patient_group(patients, eligibility_criteria, api_client=None, trial_id=None, model=ASSESSMENT_MODEL):
+    """Assess several (patient_id, patient_toon) pairs in one request and return their results in order.
+
+    Patients missing or malformed in the grouped response, or all of them if the request fails,
+    are re-assessed with single-patient requests.
+    """
+    if len(patients) == 1:
+        return [assess_patient_eligibility(*patients[0], eligibility_criteria, api_client, trial_id, model)]
+    api_client = api_client or client
+    patient_ids = [patient_id for patient_id, _ in patients]
+    request = build_group_assessment_request(patients, eligibility_criteria, model)
+    run_groups.requests += 1
+    run_groups.patients += len(patients)
+    start = time.perf_counter()
+    try:
+        response = api_client.messages.create(**request)
+    except anthropic.APIError as e:
+        run_metrics.record(",".join(patient_ids), trial_id, model, None, time.perf_counter() - start, status="error")
+        print(f"  Grouped request for {', '.join(patient_ids)} failed: {e}")
+        assessments = {}
+    else:
+        usage = getattr(response, "usage", None)
+        run_usage.record(usage)
+        run_metrics.record(",".join(patient_ids), trial_id, model, usage, time.perf_counter() - start)
+        assessments = extract_group_assessments(response, patient_ids)
+
+    for patient_id, patient_toon in patients:
+        if patient_id not in assessments:
+            run_groups.fallbacks += 1
+            assessments[patient_id] = assess_patient_eligibility(patient_id, patient_toon, eligibility_criteria,
+                                                                 api_client, trial_id, model)
+    return [assessments[patient_id] for patient_id in patient_ids]
+
+#8 Rate-limit-aware scheduling: request/token budgets, 429/529 backoff and adaptive concurrency
+# The API pushing back: these shrink concurrency as well as being retried
+THROTTLE_STATUS_CODES = (429, 529)
+# Transient failures that are retried with backoff but say nothing about the rate (as the SDK's own retries)
+TRANSIENT_STATUS_CODES = (408, 409, 500, 502, 503, 504)
+
+def is_transient_error(error):
+    """Return True for a timeout, dropped connection or transient status code worth retrying as is."""
+    if isinstance(error, (asyncio.TimeoutError, anthropic.APIConnectionError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in TRANSIENT_STATUS_CODES
+
+def estimate_request_tokens(request):
+    """Estimate the input tokens of a messages.create request (roughly 4 characters per token)."""
+    characters = len(json.dumps(request.get("tools", []))) + len(json.dumps(request.get("system", "")))
+    for message in request["messages"]:
+        content = message["content"]
+        characters += len(content) if isinstance(content, str) else len(json.dumps(content))
+    return characters // 4 + 1
+
+def retry_after_seconds(error):
+    """Return the delay requested by a retry-after(-ms) header on an API error, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units, e.g. requests or input tokens per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.refill_rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    async def acquire(self, amount):
+        """Wait until `amount` units are available and take them."""
+        # A single request larger than the whole budget waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return
+            await asyncio.sleep((amount - self.available) / self.refill_rate)
+
+class RateLimitScheduler:
+    """Gate API calls on RPM/TPM budgets, retry 429/529 and transient errors and tune in-flight concurrency.
+
+    Concurrency follows additive-increase/multiplicative-decrease: the limit grows by one after a
+    full window of successful calls and halves when the API pushes back, so it settles just under
+    the sustained rate the account allows.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_concurrency=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=1.0, max_delay=60.0):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = max(1, max_concurrency // 2)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._slot_available = asyncio.Condition()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "overloaded": 0, "transient": 0,
+                      "peak_concurrency": 0}
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with full jitter for the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _acquire_slot(self):
+        async with self._slot_available:
+            await self._slot_available.wait_for(lambda: self.in_flight < self.concurrency_limit)
+            self.in_flight += 1
+            self.stats["peak_concurrency"] = max(self.stats["peak_concurrency"], self.in_flight)
+
+    async def _release_slot(self):
+        async with self._slot_available:
+            self.in_flight -= 1
+            self._slot_available.notify_all()
+
+    def _record_success(self):
+        self._successes += 1
+        if self._successes >= self.concurrency_limit and self.concurrency_limit < self.max_concurrency:
+            self.concurrency_limit += 1
+            self._successes = 0
+
+    def _record_throttle(self):
+        # Many in-flight calls fail together on one overload; treat them as a single signal
+        now = time.monotonic()
+        if now - self._last_decrease > 1.0:
+            self.concurrency_limit = max(1, self.concurrency_limit // 2)
+            self._last_decrease = now
+        self._successes = 0
+
+    async def run(self, make_call, estimated_tokens, call_stats=None):
+        """Call `make_call()` within the budgets, retrying 429/529 responses and transient errors with backoff.
+
+        If given, call_stats["retries"] is kept at the number of retries made so far.
+        """
+        attempt = 0
+        while True:
+            if call_stats is not None:
+                call_stats["retries"] = attempt
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(estimated_tokens)
+            await self._acquire_slot()
+            self.stats["requests"] += 1
+            try:
+                response = await make_call()
+            except (asyncio.TimeoutError, anthropic.APIError) as e:
+                status_code = getattr(e, "status_code", None)
+                if not (status_code in THROTTLE_STATUS_CODES or is_transient_error(e)) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+                if status_code not in THROTTLE_STATUS_CODES:
+                    self.stats["transient"] += 1
+                elif status_code == 429:
+                    # The rate limit is account-wide, so hold back every worker, not just this one
+                    self._record_throttle()
+                    self.stats["rate_limited"] += 1
+                    self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                else:
+                    self._record_throttle()
+                    self.stats["overloaded"] += 1
+            else:
+                self._record_success()
+                return response
+            finally:
+                await self._release_slot()
+
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+#9 Concurrent screening engine: a bounded pool of asyncio workers sharing one queue of patients
+def unpack_patient(patient, eligibility_criteria):
+    """Return (patient_id, patient_toon, criteria, trial_id) for a
+    (patient_id, patient_toon[, eligibility_criteria[, trial_id]]) entry.
+
+    Entries that carry their own criteria (one per trial when screening against several
+    protocols) override the run-wide eligibility_criteria; trial_id only labels telemetry.
+    """
+    patient_id, patient_toon, *trial = patient
+    criteria = trial[0] if trial else eligibility_criteria
+    trial_id = trial[1] if len(trial) > 1 else None
+    return patient_id, patient_toon, criteria, trial_id
+
+async def assess_patient_eligibility_async(api_client, patient_id, patient_toon, eligibility_criteria,
+                                           request_timeout=DEFAULT_REQUEST_TIMEOUT, scheduler=None, trial_id=None,
+                                           model=ASSESSMENT_MODEL):
+    """Assess a single patient with the async client, giving up after request_timeout seconds per attempt.
+
+    The recorded latency covers the final attempt only; time spent waiting for the rate-limit
+    budgets or backing off between retries is reflected in the retry count instead.
+    """
+    request = build_assessment_request(patient_id, patient_toon, eligibility_criteria, model)
+    call_stats = {"retries": 0}
+
+    async def make_call():
+        call_stats["sent"] = time.perf_counter()
+        return await asyncio.wait_for(api_client.messages.create(**request), timeout=request_timeout)
+
+    try:
+        if scheduler is None:
+            response = await make_call()
+        else:
+            response = await scheduler.run(make_call, estimate_request_tokens(request), call_stats)
+    except (asyncio.TimeoutError, anthropic.APIError) as e:
+        latency = time.perf_counter() - call_stats["sent"] if "sent" in call_stats else None
+        status = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+        run_metrics.record(patient_id, trial_id, request["model"], None, latency, call_stats["retries"], status)
+        raise
+    usage = getattr(response, "usage", None)
+    run_usage.record(usage)
+    run_metrics.record(patient_id, trial_id, request["model"], usage, time.perf_counter() - call_stats["sent"],
+                       call_stats["retries"])
+    return extract_assessment(response)
+
+async def assess_patient_cascade_async(cascade, api_client, patient_id, patient_toon, eligibility_criteria,
+                                       request_timeout=DEFAULT_REQUEST_TIMEOUT, scheduler=None, trial_id=None):
+    """Async assess_patient_cascade: a triage call that failed or timed out is escalated too."""
+    start = time.perf_counter()
+    try:
+        result = await assess_patient_eligibility_async(api_client, patient_id, patient_toon, eligibility_criteria,
+                                                        request_timeout, scheduler, trial_id, cascade.triage_model)
+    except (asyncio.TimeoutError, anthropic.APIError):
+        result = None
+    reason = cascade.review(result)
+    if reason:
+        result = await assess_patient_eligibility_async(api_client, patient_id, patient_toon, eligibility_criteria,
+                                                        request_timeout, scheduler, trial_id)
+    return cascade.stamp(result, reason, time.perf_counter() - start)
+
+async def assess_patient_group_async(api_client, patients, eligibility_criteria, request_timeout=DEFAULT_REQUEST_TIMEOUT,
+                                     scheduler=None, trial_id=None, model=ASSESSMENT_MODEL):
+    """Async assess_patient_group; a patient whose fallback request fails or times out gets None."""
+    patient_ids = [patient_id for patient_id, _ in patients]
+    request = build_group_assessment_request(patients, eligibility_criteria, model)
+    call_stats = {"retries": 0}
+    run_groups.requests += 1
+    run_groups.patients += len(patients)
+
+    async def make_call():
+        call_stats["sent"] = time.perf_counter()
+        return await asyncio.wait_for(api_client.messages.create(**request), timeout=request_timeout)
+
+    try:
+        if scheduler is None:
+            response = await make_call()
+        else:
+            response = await scheduler.run(make_call, estimate_request_tokens(request), call_stats)
+    except (asyncio.TimeoutError, anthropic.APIError) as e:
+        latency = time.perf_counter() - call_stats["sent"] if "sent" in call_stats else None
+        status = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+        run_metrics.record(",".join(patient_ids), trial_id, model, None, latency, call_stats["retries"], status)
+        print(f"  Grouped request for {', '.join(patient_ids)} failed ({status}); assessing them one at a time")
+        assessments = {}
+    else:
+        usage = getattr(response, "usage", None)
+        run_usage.record(usage)
+        run_metrics.record(",".join(patient_ids), trial_id, model, usage, time.perf_counter() - call_stats["sent"],
+                           call_stats["retries"])
+        assessments = extract_group_assessments(response, patient_ids)
+
+    missing = [(patient_id, patient_toon) for patient_id, patient_toon in patients if patient_id not in assessments]
+    run_groups.fallbacks += len(missing)
+    fallbacks = await asyncio.gather(*(
+        assess_patient_eligibility_async(api_client, patient_id, patient_toon, eligibility_criteria, request_timeout,
+                                         scheduler, trial_id, model)
+        for patient_id, patient_toon in missing
+    ), return_exceptions=True)
+    for (patient_id, _), result in zip(missing, fallbacks):
+        if isinstance(result, BaseException):
+            print(f"  {patient_id} -> request failed: {result!r}")
+            result = None
+        assessments[patient_id] = result
+    return [assessments[patient_id] for patient_id in patient_ids]
+
+async def screen_patients_async(patients, eligibility_criteria, max_concurrency=DEFAULT_CONCURRENCY,
+                                request_timeout=DEFAULT_REQUEST_TIMEOUT, api_client=None, scheduler=None,
+                                on_result=None, cascade=None, patients_per_request=1):
+    """Assess (patient_id, patient_toon[, eligibility_criteria]) entries concurrently with at most
+    max_concurrency requests in flight.
+
+    Each result is handed to on_result(index, result) as soon as it completes; without on_result
+    the results are returned in the same order as `patients`. See screen_patient_queue.
+    """
+    results = None
+    if on_result is None:
+        results = [None] * len(patients)
+        on_result = results.__setitem__
+    queue = asyncio.Queue()
+    for index, patient in enumerate(patients):
+        queue.put_nowait((index, *patient))
+    queue.put_nowait(None)
+
+    await screen_patient_queue(queue, eligibility_criteria, on_result, max_concurrency, request_timeout,
+                               api_client, scheduler, cascade, patients_per_request)
+    return results
+
+async def screen_patient_queue(queue, eligibility_criteria, on_result, max_concurrency=DEFAULT_CONCURRENCY,
+                               request_timeout=DEFAULT_REQUEST_TIMEOUT, api_client=None, scheduler=None, cascade=None,
+                               patients_per_request=1):
+    """Assess (index, patient_id, patient_toon[, eligibility_criteria]) jobs from queue until a None
+    sentinel, calling on_result(index, result).
+
+    Requests go through `scheduler` (a RateLimitScheduler by default), which may run fewer than
+    max_concurrency at a time while the API is pushing back. A patient whose request failed or
+    timed out gets None so one bad call does not abort the whole screen.
+
+    The first job for each set of criteria is assessed before any other job with the same
+    criteria so that its response writes that prefix to the prompt cache; otherwise every worker
+    in the first wave would pay for a cache write. Jobs for other trials keep running meanwhile.
+
+    With a ModelCascade, each job is triaged by the cheaper model and escalated as the cascade decides.
+    Otherwise, with patients_per_request above 1, jobs that share criteria and trial are collected
+    into groups of that size, at most MAX_PATIENTS_PER_REQUEST, and each group is assessed in one
+    request (assess_patient_group_async); partial groups are assessed once the queue is drained.
+    """
+    api_client = api_client or async_client
+    scheduler = scheduler or RateLimitScheduler(max_concurrency=max_concurrency)
+    # Set once the first request for a given criteria prefix has completed
+    prefix_warmed = {}
+
+    # Jobs waiting for their group to fill, by (criteria, trial_id)
+    pending_groups = {}
+    patients_per_request = min(patients_per_request, MAX_PATIENTS_PER_REQUEST)
+
+    async def assess(group):
+        """Assess a list of (index, patient_id, patient_toon, criteria, trial_id) jobs sharing criteria."""
+        _, patient_id, patient_toon, criteria, trial_id = group[0]
+        warmed = prefix_warmed.get(criteria)
+        if warmed is None:
+            prefix_warmed[criteria] = asyncio.Event()
+        else:
+            await warmed.wait()
+        try:
+            if len(group) > 1:
+                results = await assess_patient_group_async(
+                    api_client, [(job[1], job[2]) for job in group], criteria, request_timeout, scheduler, trial_id
+                )
+            elif cascade is None:
+                results = [await assess_patient_eligibility_async(
+                    api_client, patient_id, patient_toon, criteria, request_timeout, scheduler, trial_id
+                )]
+            else:
+                results = [await assess_patient_cascade_async(
+                    cascade, api_client, patient_id, patient_toon, criteria, request_timeout, scheduler, trial_id
+                )]
+        except asyncio.TimeoutError:
+            print(f"  {patient_id} -> timed out after {request_timeout:.0f}s")
+            results = [None]
+        except anthropic.APIError as e:
+            print(f"  {patient_id} -> request failed: {e}")
+            results = [None]
+        finally:
+            if warmed is None:
+                prefix_warmed[criteria].set()
+
+        for (index, patient_id, *_), result in zip(group, results):
+            on_result(index, result)
+            if result:
+                print(f"  {patient_id} -> {result.get('overall_eligibility', 'UNKNOWN')} (confidence: {result.get('confidence_score', 0):.2f})")
+
+    async def worker():
+        while True:
+            job = await queue.get()
+            if job is None:
+                # Leave the sentinel for the other workers, then assess any partial groups
+                queue.put_nowait(None)
+                while pending_groups:
+                    _, group = pending_groups.popitem()
+                    await assess(group)
+                return
+            job = (job[0], *unpack_patient(job[1:], eligibility_criteria))
+            if patients_per_request <= 1 or cascade is not None:
+                await assess([job])
+                continue
+            group_key = (job[3], job[4])
+            group = pending_groups.setdefault(group_key, [])
+            group.append(job)
+            if len(group) >= patients_per_request:
+                del pending_groups[group_key]
+                await assess(group)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, max_concurrency))]
+    await asyncio.gather(*workers)
+
+#10 Message Batches mode: submit every patient as one or more batches, poll, then collect the results
+def chunk_batch_requests(batch_requests, max_requests=MAX_BATCH_REQUESTS, max_bytes=MAX_BATCH_BYTES):
+    """Split batch requests into chunks that respect the per-batch request count and size limits."""
+    chunk = []
+    chunk_bytes = 0
+    for batch_request in batch_requests:
+        request_bytes = len(json.dumps(batch_request))
+        if chunk and (len(chunk) >= max_requests or chunk_bytes + request_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(batch_request)
+        chunk_bytes += request_bytes
+    if chunk:
+        yield chunk
+
+def wait_for_batch(api_client, batch_id, poll_interval=DEFAULT_BATCH_POLL_INTERVAL):
+    """Poll a message batch until it has ended and return its final state."""
+    while True:
+        batch = api_client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == "ended":
+            return batch
+        counts = batch.request_counts
+        print(f"  Batch {batch_id}: {batch.processing_status} ({counts.processing} processing, "
+              f"{counts.succeeded} succeeded, {counts.errored} errored)")
+        time.sleep(poll_interval)
+
+def screen_patients_batch(patients, eligibility_criteria, api_client=None,
+                          poll_interval=DEFAULT_BATCH_POLL_INTERVAL, max_resubmits=1,
+                          max_requests=MAX_BATCH_REQUESTS, max_bytes=MAX_BATCH_BYTES, on_result=None,
+                          model=ASSESSMENT_MODEL, cascade=None):
+    """Assess (patient_id, patient_toon[, eligibility_criteria]) entries through the Message Batches API.
+
+    Every chunk is submitted before polling so they are processed in parallel. Patients whose
+    batch entry errored (other than an invalid request) or expired are resubmitted up to
+    max_resubmits times. Each result is handed to on_result(index, result) as it is collected,
+    with None for patients that could not be assessed; without on_result the results are
+    returned in input order.
+
+    With a ModelCascade, every patient goes through a triage round of batches first and the
+    escalated ones through a second round on ASSESSMENT_MODEL.
+    """
+    api_client = api_client or client
+    results = None
+    if on_result is None:
+        results = [None] * len(patients)
+        on_result = results.__setitem__
+
+    if cascade is not None:
+        escalated = []
+
+        def triaged(index, result):
+            reason = cascade.review(result)
+            if reason:
+                escalated.append((index, reason))
+            else:
+                on_result(index, cascade.stamp(result, None))
+
+        screen_patients_batch(patients, eligibility_criteria, api_client, poll_interval, max_resubmits,
+                              max_requests, max_bytes, triaged, cascade.triage_model)
+        if escalated:
+            print(f"Escalating {len(escalated)} patient(s) to {ASSESSMENT_MODEL}...")
+            screen_patients_batch(
+                [patients[index] for index, _ in escalated], eligibility_criteria, api_client, poll_interval,
+                max_resubmits, max_requests, max_bytes,
+                lambda position, result: on_result(escalated[position][0], cascade.stamp(result, escalated[position][1]))
+            )
+        return results
+
+    pending = list(range(len(patients)))
+
+    for attempt in range(max_resubmits + 1):
+        if not pending:
+            break
+        if attempt:
+            print(f"Resubmitting {len(pending)} failed patient(s)...")
+
+        batch_requests = [
+            {"custom_id": f"patient-{index}",
+             "params": build_assessment_request(*unpack_patient(patients[index], eligibility_criteria)[:3], model)}
+            for index in pending
+        ]
+        batch_ids = []
+        for chunk in chunk_batch_requests(batch_requests, max_requests, max_bytes):
+            batch = api_client.messages.batches.create(requests=chunk)
+            print(f"  Submitted batch {batch.id} with {len(chunk)} patient(s)")
+            batch_ids.append(batch.id)
+
+        retryable = []
+        for batch_id in batch_ids:
+            wait_for_batch(api_client, batch_id, poll_interval)
+            for entry in api_client.messages.batches.results(batch_id):
+                index = int(entry.custom_id.split("-", 1)[1])
+                patient_id, _, _, trial_id = unpack_patient(patients[index], eligibility_criteria)
+                if entry.result.type == "succeeded":
+                    usage = getattr(entry.result.message, "usage", None)
+                    run_usage.record(usage)
+                    run_metrics.record(patient_id, trial_id, model, usage, None, mode="batch")
+                    result = extract_assessment(entry.result.message)
+                    on_result(index, result)
+                    if result:
+                        print(f"  {patient_id} -> {result.get('overall_eligibility', 'UNKNOWN')} (confidence: {result.get('confidence_score', 0):.2f})")
+                    continue
+
+                reason = entry.result.type
+                if reason == "errored":
+                    reason = entry.result.error.error.type
+                run_metrics.record(patient_id, trial_id, model, None, None, status=reason, mode="batch")
+                print(f"  {patient_id} -> batch request {reason}")
+                if reason not in ("invalid_request_error", "canceled") and attempt < max_resubmits:
+                    retryable.append(index)
+                else:
+                    on_result(index, None)
+        pending = retryable
+
+    return results
+
+#11 Content-addressed result cache: skip patients whose prompt inputs have not changed since a previous run
+def assessment_cache_key(request):
+    """Hash everything that determines an assessment: model, tool schema, criteria and patient TOON."""
+    key_material = json.dumps(
+        [request["model"], request["tools"], request["system"], request["messages"]],
+        sort_keys=True
+    )
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """Persistent SQLite store of assessments keyed by assessment_cache_key.
+
+    Entries are evicted least-recently-used first once the cache holds more than max_entries.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=DEFAULT_RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS assessments (
+                key TEXT PRIMARY KEY,
+                patient_id TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS assessments_last_used ON assessments (last_used)")
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, key):
+        """Return the cached assessment for key, or None."""
+        row = self.connection.execute("SELECT result FROM assessments WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.connection.execute("UPDATE assessments SET last_used = ? WHERE key = ?", (time.time(), key))
+        # Commit straight away: an open write transaction would lock out the EHR change index
+        self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key, patient_id, result):
+        """Store an assessment under key."""
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO assessments (key, patient_id, result, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, patient_id, json.dumps(result), now, now)
         )
+        # Commit per assessment so results paid for before a crash are not lost
+        self.connection.commit()
+        self.stats["writes"] += 1
+
+    def evict(self):
+        """Drop least recently used entries beyond max_entries."""
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM assessments").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                "DELETE FROM assessments WHERE key IN (SELECT key FROM assessments ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self.stats["evictions"] += excess
+
+    def close(self):
+        self.evict()
+        self.connection.commit()
+        self.connection.close()
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0
+        return (f"Result cache: {self.stats['hits']} hit(s), {self.stats['misses']} miss(es) ({hit_rate:.0%} served from cache), "
+                f"{self.stats['writes']} written, {self.stats['evictions']} evicted")
+
+# EHR change detection: patients whose file, or at least the part of it the model and pre-screen
+# rules read, has not changed since it was last assessed keep their previous results
+def toon_section_hashes(patient_toon):
+    """Return {section: hash} of each section block (header line and rows) of csv_to_toon output."""
+    blocks = {}
+    section = None
+    for line in patient_toon.splitlines():
+        match = re.match(r"^(\w+)\[\d+\]", line)
+        if match:
+            section = match.group(1)
+            blocks[section] = [line]
+        elif section is not None and line.strip():
+            blocks[section].append(line)
+    return {section: hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+            for section, lines in blocks.items()}
 
+def changed_sections(old_hashes, new_hashes):
+    """Return the sorted names of sections added, removed or modified between two toon_section_hashes."""
+    return sorted(section for section in set(old_hashes) | set(new_hashes)
+                  if old_hashes.get(section) != new_hashes.get(section))
+
+class EhrChangeIndex:
+    """SQLite index of each patient file's mtime, size, content hash and TOON section hashes as last assessed.
+
+    check() and stage() collect the state seen during a run; commit() writes it for the patients
+    whose assessments all completed, so a patient that failed is compared with its older state again.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS ehr_files (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                section_hashes TEXT,
+                indexed_at REAL NOT NULL
+            )
+        """)
+        # Absolute path -> state to write on commit
+        self.pending = {}
+
+    def check(self, file_path):
+        """Compare a file with its indexed state; return (status, indexed section hashes).
+
+        status is "unchanged" (same mtime and size, the file is not read), "touched" (new mtime,
+        same content), "modified" or "new" (not indexed yet).
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, content_hash, section_hashes FROM ehr_files WHERE path = ?", (path,)
+        ).fetchone()
+        if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return "unchanged", None
+        section_hashes = json.loads(row[3]) if row and row[3] else None
+        with open(path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        self.pending[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "content_hash": content_hash,
+                              "section_hashes": section_hashes}
+        if row is None:
+            return "new", None
+        if row[2] == content_hash:
+            return "touched", section_hashes
+        return "modified", section_hashes
+
+    def stage(self, file_path, section_hashes):
+        """Record the section hashes of a file converted in this run."""
+        path = os.path.abspath(file_path)
+        if path not in self.pending:
+            self.check(path)
+        if path in self.pending:
+            self.pending[path]["section_hashes"] = section_hashes
+
+    def commit(self, skip_paths=()):
+        """Write the staged state of every file except skip_paths; return how many were written."""
+        skipped = {os.path.abspath(path) for path in skip_paths}
+        now = time.time()
+        rows = [(path, state["mtime_ns"], state["size"], state["content_hash"], json.dumps(state["section_hashes"]), now)
+                for path, state in self.pending.items() if path not in skipped]
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO ehr_files (path, mtime_ns, size, content_hash, section_hashes, indexed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        self.connection.commit()
+        self.pending = {}
+        return len(rows)
+
+    def close(self):
+        self.connection.close()
+
+#12 Streaming results: append each assessment to JSONL as it completes, then build the JSON array
+RESULTS_PATH = "eligibility_results.json"
+METRICS_PATH = "eligibility_metrics.jsonl"
+MATRIX_PATH = "eligibility_matrix.csv"
+
+def results_jsonl_path(output_file):
+    """Return the JSONL file that streams results for the given JSON output file."""
+    return os.path.splitext(output_file)[0] + ".jsonl"
+
+def read_results_jsonl(jsonl_path, include_skipped=False):
+    """Yield (offset, result) for each complete line of a results JSONL file.
+
+    A truncated last line, left by a run that crashed mid-write, is skipped. So are the lines that
+    only mark a pair as skipped (see ResultWriter.skip), unless include_skipped is set.
+    """
+    if not os.path.exists(jsonl_path):
+        return
+    with open(jsonl_path, "rb") as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                return
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if include_skipped or "skipped" not in result:
+                yield offset, result
+
+class ResultWriter:
+    """Append-only JSONL writer that flushes every result so a crash loses at most the one in flight."""
+
+    def __init__(self, jsonl_path, resume=False):
+        self.jsonl_path = jsonl_path
+        # (patient_id, trial_id) of every result or skip marker already written
+        self.completed = set()
+        if resume:
+            self.completed = {
+                (result.get("patient_id"), result.get("trial_id"))
+                for _, result in read_results_jsonl(jsonl_path, include_skipped=True)
+            }
+            self._drop_partial_line()
+        self.file = open(jsonl_path, "a" if resume else "w")
+
+    def _drop_partial_line(self):
+        # Truncate a half-written last line so appended results start on a fresh line
+        if not os.path.exists(self.jsonl_path):
+            return
+        with open(self.jsonl_path, "rb+") as f:
+            content_end = 0
+            for offset, _ in read_results_jsonl(self.jsonl_path, include_skipped=True):
+                f.seek(offset)
+                content_end = offset + len(f.readline())
+            f.truncate(content_end)
+
+    def write(self, patient_id, trial_id, result, criteria_version=None):
+        """Append one assessment, recorded under the screener's patient and trial IDs and, when
+        given, the criteria_version it was assessed against."""
+        stamp = {"patient_id": patient_id, "trial_id": trial_id}
+        if criteria_version:
+            stamp["criteria_version"] = criteria_version
+        self.file.write(json.dumps({**result, **stamp}) + "\n")
+        self.file.flush()
+        self.completed.add((patient_id, trial_id))
+
+    def skip(self, patient_id, trial_id, reason, criteria_version=None):
+        """Record that a pair was deliberately not assessed, e.g. "prefiltered", so --resume does not
+        revisit it; the marker line is not a result and read_results_jsonl leaves it out."""
+        self.write(patient_id, trial_id, {"skipped": reason}, criteria_version)
+
+    def close(self):
+        self.file.close()
+
+def _latest_result_offsets(jsonl_path):
+    """Map (patient_id, trial_id) to the offset of its latest line in a results JSONL file, in file order."""
+    offsets = {}
+    for offset, result in read_results_jsonl(jsonl_path):
+        key = (result.get("patient_id"), result.get("trial_id"))
+        offsets.pop(key, None)
+        offsets[key] = offset
+    return offsets
+
+def finalize_results(jsonl_path, output_file=RESULTS_PATH, patient_order=(), trial_order=()):
+    """Write the JSONL results as the JSON array read by dashboard.py and return the result count.
+
+    Results are ordered by patient as in patient_order, then by trial as in trial_order (any
+    others follow in file order), and the latest line wins when a patient and trial pair appears
+    more than once. Only line offsets are held in memory; each result is re-read from the JSONL
+    when it is written out. The array is written to a temporary file that then replaces output_file,
+    so the dashboard never reads a half-written file.
+    """
+    offsets = _latest_result_offsets(jsonl_path)
+    patient_rank = {patient_id: rank for rank, patient_id in enumerate(patient_order)}
+    trial_rank = {trial_id: rank for rank, trial_id in enumerate(trial_order)}
+    order = sorted(offsets, key=lambda key: (patient_rank.get(key[0], len(patient_rank)),
+                                             trial_rank.get(key[1], len(trial_rank))))
+
+    temporary_file = output_file + ".tmp"
+    with open(temporary_file, "w") as out:
+        if order:
+            with open(jsonl_path, "rb") as f:
+                out.write("[")
+                for position, key in enumerate(order):
+                    f.seek(offsets[key])
+                    result = json.loads(f.readline())
+                    out.write(",\n" if position else "\n")
+                    out.write(textwrap.indent(json.dumps(result, indent=2), "  "))
+                out.write("\n]")
+        else:
+            out.write("[]")
+    os.replace(temporary_file, output_file)
+    return len(order)
+
+def write_eligibility_matrix(jsonl_path, matrix_path=MATRIX_PATH, patient_order=(), trial_order=()):
+    """Write a patient x trial CSV of overall_eligibility from the results JSONL and return the row count.
+
+    Rows follow patient_order and columns follow trial_order (any others follow in file order);
+    a pair with no result is left blank.
+    """
+    statuses = {}
+    for _, result in read_results_jsonl(jsonl_path):
+        statuses.setdefault(result.get("patient_id"), {})[result.get("trial_id")] = result.get("overall_eligibility", "")
+
+    patient_ids = [patient_id for patient_id in patient_order if patient_id in statuses]
+    listed = set(patient_ids)
+    patient_ids += [patient_id for patient_id in statuses if patient_id not in listed]
+    trial_ids = list(trial_order)
+    for trials in statuses.values():
+        trial_ids += [trial_id for trial_id in trials if trial_id not in trial_ids]
+
+    with open(matrix_path, "w", newline="") as f:
+        matrix = csv.writer(f)
+        matrix.writerow(["patient_id"] + trial_ids)
+        for patient_id in patient_ids:
+            matrix.writerow([patient_id] + [statuses[patient_id].get(trial_id, "") for trial_id in trial_ids])
+    return len(patient_ids)
+
+# Results store: every run's assessments in SQLite, so the dashboard can query a screening history
+# with indexes instead of loading one JSON array. is_latest marks the current result of each pair.
+RESULTS_DB_PATH = "eligibility_results.sqlite"
+CRITERION_FIELDS = ("criterion_id", "criterion", "patient_value", "status", "score")
+
+class ResultsStore:
+    """SQLite store of runs, patients, assessments and their criteria.
+
+    Results reach it from the run's JSONL file in one transaction at the end of a run
+    (import_jsonl). The JSONL offset imported so far is recorded, so a --resume run also imports
+    what an interrupted run wrote, and nothing is imported twice. Patient IDs and MRNs are
+    indexed for the dashboard's patient search: case-insensitively for prefixes, and in a trigram
+    full-text table (patient_search) for substrings when SQLite has FTS5.
+    """
+
+    def __init__(self, path=RESULTS_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                assessments INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS patients (
+                patient_id TEXT PRIMARY KEY,
+                mrn TEXT,
+                first_screened_at REAL NOT NULL,
+                last_screened_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS assessments (
+                assessment_id INTEGER PRIMARY KEY,
+                run_id INTEGER NOT NULL REFERENCES runs (run_id),
+                patient_id TEXT NOT NULL REFERENCES patients (patient_id),
+                trial_id TEXT NOT NULL,
+                overall_eligibility TEXT NOT NULL,
+                confidence_score REAL NOT NULL,
+                criteria_count INTEGER NOT NULL,
+                met INTEGER NOT NULL,
+                not_met INTEGER NOT NULL,
+                review INTEGER NOT NULL,
+                recommendation TEXT,
+                criteria_version TEXT,
+                screened_at REAL NOT NULL,
+                is_latest INTEGER NOT NULL,
+                result TEXT NOT NULL
+            );
+            -- Covers the dashboard's filtered view, so it is read without touching the result JSON
+            CREATE INDEX IF NOT EXISTS assessments_latest_status
+                ON assessments (is_latest, overall_eligibility, confidence_score, patient_id, trial_id,
+                                criteria_count, met, not_met, review, recommendation);
+            CREATE INDEX IF NOT EXISTS assessments_trial ON assessments (trial_id, is_latest);
+            CREATE INDEX IF NOT EXISTS assessments_confidence ON assessments (confidence_score);
+            CREATE INDEX IF NOT EXISTS assessments_screened_at ON assessments (screened_at);
+            CREATE INDEX IF NOT EXISTS assessments_pair ON assessments (patient_id, trial_id, is_latest);
+            CREATE TABLE IF NOT EXISTS criteria (
+                assessment_id INTEGER NOT NULL REFERENCES assessments (assessment_id),
+                position INTEGER NOT NULL,
+                criterion_id TEXT,
+                criterion TEXT,
+                patient_value TEXT,
+                status TEXT,
+                score REAL,
+                PRIMARY KEY (assessment_id, position)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS criteria_status ON criteria (status);
+            CREATE TABLE IF NOT EXISTS jsonl_imports (
+                jsonl_path TEXT PRIMARY KEY,
+                imported_offset INTEGER NOT NULL
+            );
+        """)
+        # Stores written before MRNs were recorded
+        if "mrn" not in [column[1] for column in self.connection.execute("PRAGMA table_info(patients)")]:
+            self.connection.execute("ALTER TABLE patients ADD COLUMN mrn TEXT")
+        self.connection.executescript("""
+            CREATE INDEX IF NOT EXISTS patients_id_nocase ON patients (patient_id COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS patients_mrn_nocase ON patients (mrn COLLATE NOCASE);
+        """)
+        self._create_search_index()
+
+    def _create_search_index(self):
+        """Create the trigram index of patient IDs and MRNs, filled from patients and kept current by triggers."""
+        if self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'patient_search'").fetchone():
+            return
+        try:
+            self.connection.executescript("""
+                BEGIN;
+                CREATE VIRTUAL TABLE patient_search USING fts5 (patient_id, mrn, tokenize = 'trigram');
+                INSERT INTO patient_search (rowid, patient_id, mrn) SELECT rowid, patient_id, mrn FROM patients;
+                CREATE TRIGGER patients_search_insert AFTER INSERT ON patients BEGIN
+                    INSERT INTO patient_search (rowid, patient_id, mrn) VALUES (new.rowid, new.patient_id, new.mrn);
+                END;
+                CREATE TRIGGER patients_search_mrn AFTER UPDATE OF mrn ON patients WHEN old.mrn IS NOT new.mrn BEGIN
+                    UPDATE patient_search SET mrn = new.mrn WHERE rowid = new.rowid;
+                END;
+                COMMIT;
+            """)
+        except sqlite3.OperationalError:
+            # SQLite without FTS5 or its trigram tokenizer (before 3.34): the dashboard scans patients instead
+            self.connection.rollback()
+
+    def imported_offset(self, jsonl_path):
+        """Return how far into jsonl_path earlier runs were imported (0 if never)."""
+        row = self.connection.execute(
+            "SELECT imported_offset FROM jsonl_imports WHERE jsonl_path = ?", (os.path.abspath(jsonl_path),)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def import_jsonl(self, jsonl_path, start_offset=0, started_at=None, patient_files=None):
+        """Add the results written to jsonl_path from start_offset on as one run; return (run_id, count).
+
+        The latest line wins when a pair appears more than once, as in finalize_results, and
+        becomes that pair's is_latest assessment. patient_files maps patient IDs to their EHR
+        files, from which each imported patient's MRN is read. When there is nothing new, e.g. a
+        --resume run that had nothing left to assess, no run is recorded and run_id is None.
+        """
+        started_at = started_at or time.time()
+        offsets = [offset for offset in _latest_result_offsets(jsonl_path).values() if offset >= start_offset]
+        mrns = {}
+        with self.connection:
+            run_id = None
+            if offsets:
+                run_id = self.connection.execute("INSERT INTO runs (started_at) VALUES (?)", (started_at,)).lastrowid
+            with open(jsonl_path, "rb") as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    result = json.loads(f.readline())
+                    patient_id = result.get("patient_id")
+                    if patient_id not in mrns:
+                        patient_file = (patient_files or {}).get(patient_id)
+                        mrns[patient_id] = patient_mrn(patient_file) if patient_file else None
+                    self._add(run_id, result, started_at, mrns[patient_id])
+                end = f.seek(0, os.SEEK_END)
+            if run_id is not None:
+                self.connection.execute("UPDATE runs SET finished_at = ?, assessments = ? WHERE run_id = ?",
+                                        (time.time(), len(offsets), run_id))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO jsonl_imports (jsonl_path, imported_offset) VALUES (?, ?)",
+                (os.path.abspath(jsonl_path), end)
+            )
+        # Statistics let the planner start patient searches from the matching patients
+        self.connection.execute("ANALYZE")
+        return run_id, len(offsets)
+
+    def _add(self, run_id, result, screened_at, mrn=None):
+        patient_id = result.get("patient_id")
+        trial_id = result.get("trial_id")
+        evaluation = result.get("criteria_evaluation") or []
+        statuses = [item.get("status") for item in evaluation]
+        self.connection.execute(
+            "INSERT INTO patients (patient_id, mrn, first_screened_at, last_screened_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (patient_id) DO UPDATE SET last_screened_at = excluded.last_screened_at, "
+            "mrn = COALESCE(excluded.mrn, mrn)",
+            (patient_id, mrn, screened_at, screened_at)
+        )
+        self.connection.execute(
+            "UPDATE assessments SET is_latest = 0 WHERE patient_id = ? AND trial_id = ? AND is_latest = 1",
+            (patient_id, trial_id)
+        )
+        # The criteria live in their own table; result keeps every other field for the JSON export
+        stored = {key: value for key, value in result.items() if key != "criteria_evaluation"}
+        assessment_id = self.connection.execute(
+            "INSERT INTO assessments (run_id, patient_id, trial_id, overall_eligibility, confidence_score, criteria_count, "
+            "met, not_met, review, recommendation, criteria_version, screened_at, is_latest, result) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+            (run_id, patient_id, trial_id, result.get("overall_eligibility") or "UNKNOWN",
+             float(result.get("confidence_score") or 0), len(evaluation), statuses.count("MET"),
+             statuses.count("NOT_MET"), statuses.count("NEEDS_VERIFICATION"), result.get("recommendation"),
+             result.get("criteria_version"), screened_at, json.dumps(stored))
+        ).lastrowid
+        self.connection.executemany(
+            "INSERT INTO criteria (assessment_id, position, criterion_id, criterion, patient_value, status, score) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(assessment_id, position, *(item.get(field) for field in CRITERION_FIELDS))
+             for position, item in enumerate(evaluation)]
+        )
+
+    def latest_results(self):
+        """Yield the is_latest result of every pair, ordered by patient and trial, in the JSON results format."""
+        cursor = self.connection.execute(
+            "SELECT assessment_id, result FROM assessments WHERE is_latest = 1 ORDER BY patient_id, trial_id"
+        )
+        for assessment_id, stored in cursor:
+            result = json.loads(stored)
+            criteria = self.connection.execute(
+                f"SELECT {', '.join(CRITERION_FIELDS)} FROM criteria WHERE assessment_id = ? ORDER BY position",
+                (assessment_id,)
+            )
+            result["criteria_evaluation"] = [
+                {field: value for field, value in zip(CRITERION_FIELDS, row) if value is not None} for row in criteria
+            ]
+            yield result
+
+    def close(self):
+        self.connection.close()
+
+def export_results_json(db_path=RESULTS_DB_PATH, output_file=RESULTS_PATH):
+    """Write the latest result of every pair in the results store as the dashboard's JSON array; return the count."""
+    store = ResultsStore(db_path)
+    count = 0
+    temporary_file = output_file + ".tmp"
+    try:
+        with open(temporary_file, "w") as out:
+            out.write("[")
+            for result in store.latest_results():
+                out.write(",\n" if count else "\n")
+                out.write(textwrap.indent(json.dumps(result, indent=2), "  "))
+                count += 1
+            out.write("\n]" if count else "]")
+    finally:
+        store.close()
+    os.replace(temporary_file, output_file)
+    return count
+
+#13 Serial screening loop for --serial and --compare-serial, and the fake clients behind --simulate-latency
+def screen_patients_serial(patients, eligibility_criteria, api_client=None, on_result=None, cascade=None,
+                           patients_per_request=1):
+    """Assess (patient_id, patient_toon[, eligibility_criteria]) entries one at a time, as the original main loop did.
+
+    With patients_per_request above 1 (and no cascade), consecutive entries sharing criteria and
+    trial are assessed together, one grouped request of at most MAX_PATIENTS_PER_REQUEST at a time.
+    """
+    patients_per_request = min(patients_per_request, MAX_PATIENTS_PER_REQUEST)
+    results = None
+    if on_result is None:
+        results = [None] * len(patients)
+        on_result = results.__setitem__
+    if patients_per_request > 1 and cascade is None:
+        jobs = [(index, *unpack_patient(patient, eligibility_criteria)) for index, patient in enumerate(patients)]
+        start = 0
+        while start < len(jobs):
+            # Consecutive jobs with the same criteria and trial, up to patients_per_request of them
+            end = start + 1
+            while end < len(jobs) and end - start < patients_per_request and jobs[end][3:] == jobs[start][3:]:
+                end += 1
+            group = jobs[start:end]
+            print(f"Assessing {', '.join(job[1] for job in group)}...")
+            grouped = assess_patient_group([job[1:3] for job in group], group[0][3], api_client, group[0][4])
+            for (index, patient_id, *_), result in zip(group, grouped):
+                on_result(index, result)
+                if result:
+                    print(f"  {patient_id} -> {result.get('overall_eligibility', 'UNKNOWN')} (confidence: {result.get('confidence_score', 0):.2f})")
+            start = end
+        return results
+    for index, patient in enumerate(patients):
+        patient_id, patient_toon, criteria, trial_id = unpack_patient(patient, eligibility_criteria)
+        print(f"Assessing {patient_id}...")
+        if cascade is None:
+            result = assess_patient_eligibility(patient_id, patient_toon, criteria, api_client, trial_id)
+        else:
+            result = assess_patient_cascade(cascade, patient_id, patient_toon, criteria, api_client, trial_id)
+        on_result(index, result)
         if result:
-            all_results.append(result)
             print(f"  -> {result.get('overall_eligibility', 'UNKNOWN')} (confidence: {result.get('confidence_score', 0):.2f})")
+    return results
+
+FAKE_CLIENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fake_clients.py")
+
+def load_fake_clients(path=FAKE_CLIENTS_PATH):
+    """Import the local fake API clients (benchmarks/fake_clients.py) used for offline, simulated runs."""
+    spec = importlib.util.spec_from_file_location("fake_clients", path)
+    fake_clients = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fake_clients)
+    return fake_clients
+
+#14 Main: Read all patient CSV files and assess eligibility
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen patient EHR files against the clinical trial eligibility criteria.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="maximum number of assessment requests in flight (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help="per-request timeout in seconds (default: %(default)s)")
+    parser.add_argument("--serial", action="store_true",
+                        help="assess patients one at a time instead of concurrently")
+    parser.add_argument("--batch", action="store_true",
+                        help="submit all patients through the Message Batches API (results within 24h, lower cost)")
+    parser.add_argument("--batch-poll-interval", type=float, default=DEFAULT_BATCH_POLL_INTERVAL,
+                        help="seconds between batch status checks (default: %(default)s)")
+    parser.add_argument("--compare-serial", action="store_true",
+                        help="also time the serial loop and report the wall-clock speedup")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="requests-per-minute budget for the concurrent engine (default: %(default)s)")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE,
+                        help="input-tokens-per-minute budget for the concurrent engine (default: %(default)s)")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="retries per patient on 429/529 responses, timeouts, connection errors and 5xx "
+                             "responses (default: %(default)s)")
+    parser.add_argument("--ingest-workers", type=int,
+                        help="processes converting patient CSVs to TOON (default: CPU count; 0 converts in-process)")
+    parser.add_argument("--patients-per-request", type=int, default=1, metavar="N",
+                        help="assess up to N patients per request, one tool call each, to share the criteria prefix "
+                             f"(at most {MAX_PATIENTS_PER_REQUEST}; default: %(default)s)")
+    parser.add_argument("--cascade", action="store_true",
+                        help=f"triage every assessment with a cheaper model and escalate only uncertain ones to {ASSESSMENT_MODEL}")
+    parser.add_argument("--triage-model", default=TRIAGE_MODEL,
+                        help="model for the --cascade triage tier (default: %(default)s)")
+    parser.add_argument("--escalation-confidence", type=float, default=DEFAULT_ESCALATION_CONFIDENCE,
+                        help="with --cascade, escalate triage results below this confidence score (default: %(default)s)")
+    parser.add_argument("--prescreen", action="store_true",
+                        help="exclude patients who fail a structured criterion (age, MMSE, CDR, amyloid) without calling the model")
+    parser.add_argument("--prescreen-rules", metavar="PATH",
+                        help="JSON file of pre-screen rules for another protocol (implies --prescreen)")
+    parser.add_argument("--compact-toon", action="store_true",
+                        help="drop fields with no eligibility signal (name, address, prescriber, reference ranges, ...) "
+                             "and normalize units and dates before sending patient data")
+    parser.add_argument("--compact-profile", metavar="PATH",
+                        help="JSON TOON compaction profile with the same structure as COMPACT_PROFILE (implies --compact-toon)")
+    parser.add_argument("--project-fields", action="store_true",
+                        help="send each trial only the EHR sections and fields its criteria reference "
+                             "(selected once per protocol and cached)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-assess every patient instead of reusing cached results")
+    parser.add_argument("--cache-path", default=RESULT_CACHE_PATH,
+                        help="SQLite file for cached assessments (default: %(default)s)")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_RESULT_CACHE_MAX_ENTRIES,
+                        help="evict least recently used cached assessments beyond this count (default: %(default)s)")
+    parser.add_argument("--simulate-latency", type=float, metavar="SECONDS",
+                        help="use a local fake client with this per-request latency instead of the API")
+    parser.add_argument("--simulate-rate-limit", type=float, metavar="RPS",
+                        help="with --simulate-latency, make the fake client return 429s above this request rate")
+    parser.add_argument("--output", default=RESULTS_PATH,
+                        help="JSON results file for the dashboard; results stream to a .jsonl file next to it (default: %(default)s)")
+    parser.add_argument("--metrics-output", default=METRICS_PATH,
+                        help="JSONL file of per-call tokens, latency, retries, model and cost (default: %(default)s)")
+    parser.add_argument("--results-db",
+                        help=f"SQLite results store that each run's assessments are added to (default: {RESULTS_DB_PATH}; "
+                             "simulated runs are only added to a store named explicitly)")
+    parser.add_argument("--no-results-db", action="store_true",
+                        help="do not add this run's assessments to the SQLite results store")
+    parser.add_argument("--export-json", metavar="PATH",
+                        help="write the latest result of every patient and trial in --results-db as a JSON "
+                             "results file, then exit")
+    parser.add_argument("--resume", action="store_true",
+                        help="keep results already in the .jsonl file and skip those patients")
+    parser.add_argument("--rescreen-amendments", action="store_true",
+                        help="after a protocol amendment, re-evaluate only the criteria that changed since each "
+                             "patient's previous result and recompute overall eligibility (implies --resume)")
+    parser.add_argument("--rescreen-changed", action="store_true",
+                        help="re-assess a previously screened patient only when the EHR fields sent to the model or "
+                             "checked by pre-screen rules changed since it was last assessed (implies --resume)")
+    parser.add_argument("--protocol", default=PROTOCOL_PATH,
+                        help="clinical trial protocol PDF (default: %(default)s)")
+    parser.add_argument("--protocols-dir", metavar="DIR",
+                        help="screen every patient against every protocol PDF in DIR (trial ID = file name) instead of --protocol")
+    parser.add_argument("--matrix-output", default=MATRIX_PATH,
+                        help="with --protocols-dir, patient x trial CSV of overall eligibility (default: %(default)s)")
+    parser.add_argument("--candidate-trials", type=int, metavar="K",
+                        help="with --protocols-dir, assess each patient only against the K trials whose criteria best match "
+                             "the patient's summary in the vector index")
+    parser.add_argument("--embeddings", choices=["voyage", "hashing"],
+                        help="embedding backend for the trial index (default: voyage when VOYAGE_API_KEY is set and the "
+                             "run is not simulated, otherwise the local hashing backend)")
+    parser.add_argument("--vector-store-dir", default=VECTOR_STORE_PATH,
+                        help="directory of the persistent Chroma trial index (default: %(default)s)")
+    args = parser.parse_args()
+    if args.protocols_dir and args.prescreen_rules:
+        parser.error("--prescreen-rules applies to a single protocol; with --protocols-dir put rules in <protocol>.rules.json")
+    if args.patients_per_request > 1 and (args.batch or args.cascade):
+        parser.error("--patients-per-request applies to the concurrent and serial engines without --cascade")
+    if args.patients_per_request > MAX_PATIENTS_PER_REQUEST:
+        parser.error(f"--patients-per-request: at most {MAX_PATIENTS_PER_REQUEST} patients fit in one request's "
+                     f"{MAX_REQUEST_OUTPUT_TOKENS} output tokens")
+    # Simulated runs hold fake assessments, so they stay out of the dashboard's default store
+    if args.results_db is None and args.simulate_latency is not None:
+        args.no_results_db = True
+    args.results_db = args.results_db or RESULTS_DB_PATH
+    if args.export_json:
+        if not os.path.exists(args.results_db):
+            parser.error(f"--export-json: no results store at {args.results_db}")
+        exported = export_results_json(args.results_db, args.export_json)
+        print(f"{exported} result(s) exported from {args.results_db} to {args.export_json}")
+        raise SystemExit(0)
+
+    cascade = ModelCascade(args.triage_model, args.escalation_confidence) if args.cascade else None
+    fake_clients = None
+    simulated_script = None
+    if args.simulate_latency is not None:
+        if not os.path.exists(FAKE_CLIENTS_PATH):
+            parser.error(f"--simulate-latency needs the fake clients in {FAKE_CLIENTS_PATH}")
+        fake_clients = load_fake_clients()
+        # Simulated cascades get scripted verdicts so that only some assessments escalate
+        if args.cascade:
+            simulated_script = fake_clients.cascade_script(ASSESSMENT_MODEL)
+        sync_api_client = fake_clients.FakeAnthropic(args.simulate_latency, simulated_script)
+        if args.simulate_rate_limit is not None:
+            async_api_client = fake_clients.ThrottlingFakeAsyncAnthropic(
+                args.simulate_latency, requests_per_second=args.simulate_rate_limit, script=simulated_script
+            )
+        else:
+            async_api_client = fake_clients.FakeAsyncAnthropic(args.simulate_latency, simulated_script)
+    else:
+        sync_api_client = client
+        async_api_client = async_client
+
+    # Extracted criteria are cached by PDF content hash, so only a new or amended protocol is re-parsed
+    start = time.perf_counter()
+    extraction_model = EXTRACTION_MODEL if args.simulate_latency is None else f"simulated:{EXTRACTION_MODEL}"
+    if args.protocols_dir:
+        protocol_paths = sorted(glob.glob(os.path.join(args.protocols_dir, "*.pdf")))
+        if not protocol_paths:
+            parser.error(f"no protocol PDFs found in {args.protocols_dir}")
+    else:
+        protocol_paths = [args.protocol]
+    trials = load_trials(protocol_paths, args.cache_path, sync_api_client, extraction_model)
+    trial_order = [trial["trial_id"] for trial in trials]
+    if args.protocols_dir:
+        print(f"Eligibility criteria for {len(trials)} trial(s) loaded in {time.perf_counter() - start:.2f}s "
+              f"({sum(trial['cached'] for trial in trials)} cached)")
+    else:
+        print(f"Eligibility criteria loaded in {time.perf_counter() - start:.2f}s "
+              f"({'cached' if trials[0]['cached'] else 'extracted from ' + args.protocol})")
+
+    # Field selections are cached by criteria hash, so the mapping costs one call per new or amended protocol
+    for trial in trials:
+        trial["field_selection"] = None
+    if args.project_fields:
+        start = time.perf_counter()
+        selections = [load_field_selection(trial["criteria"], args.cache_path, sync_api_client, extraction_model)
+                      for trial in trials]
+        for trial, (selection, _) in zip(trials, selections):
+            trial["field_selection"] = selection
+        print(f"Field selection for {len(trials)} trial(s) loaded in {time.perf_counter() - start:.2f}s "
+              f"({sum(cached for _, cached in selections)} cached)")
+        for trial in trials:
+            print(f"  {trial['trial_id']}: {describe_field_selection(trial['field_selection'])}")
+
+    voyage_available = bool(os.environ.get("VOYAGE_API_KEY")) and args.simulate_latency is None
+    eligibility_criteria_vector_db = None
+    if args.candidate_trials or args.embeddings or voyage_available:
+        embedding_backend = args.embeddings or ("voyage" if voyage_available else "hashing")
+        start = time.perf_counter()
+        # Only a --protocols-dir run sees the whole portfolio, so only it removes protocols no longer present
+        eligibility_criteria_vector_db, index_stats = embed_eligibility_criteria(
+            trials, get_embeddings(embedding_backend), args.vector_store_dir, f"eligibility_criteria_{embedding_backend}",
+            prune=bool(args.protocols_dir)
+        )
+        print(f"Trial index ({embedding_backend} embeddings) synced in {time.perf_counter() - start:.2f}s: "
+              f"{index_stats['embedded']} protocol(s) embedded in {index_stats['batches']} batch(es), "
+              f"{index_stats['unchanged']} unchanged, {index_stats['removed']} removed")
+    # Pre-filter trials per patient through the index only when it would leave some trials out
+    candidate_trials = args.candidate_trials if args.candidate_trials and args.candidate_trials < len(trials) else None
+    prefiltered = []
+
+    # Pre-screen rules are protocol specific: --prescreen uses the bundled rules for a single protocol,
+    # and each protocol's own <protocol>.rules.json, if there is one, with --protocols-dir
+    for trial in trials:
+        trial["prescreen_rules"] = None
+        rules_path = os.path.splitext(trial["protocol"])[0] + ".rules.json"
+        if args.prescreen_rules:
+            trial["prescreen_rules"] = load_prescreen_rules(args.prescreen_rules)
+        elif args.prescreen and args.protocols_dir:
+            if os.path.exists(rules_path):
+                trial["prescreen_rules"] = load_prescreen_rules(rules_path)
+        elif args.prescreen:
+            trial["prescreen_rules"] = PRESCREEN_RULES
+    prescreening = any(trial["prescreen_rules"] for trial in trials)
+
+    def label(patient_id, trial_id):
+        return f"{patient_id} x {trial_id}" if args.protocols_dir else patient_id
+
+    patients_folder = "patients"
+    patient_files = sorted(glob.glob(os.path.join(patients_folder, "*.csv")))
+    patient_order = [patient_id_from_path(patient_file) for patient_file in patient_files]
+
+    # Results stream to JSONL as they complete; --resume keeps what an interrupted run already wrote
+    jsonl_path = results_jsonl_path(args.output)
+    resume = args.resume or args.rescreen_amendments or args.rescreen_changed
+    run_started_at = time.time()
+    writer = ResultWriter(jsonl_path, resume=resume)
+    # A fresh run rewrites the JSONL, so the store imports it from the start; a resumed run from
+    # wherever the last import stopped, which includes anything an interrupted run wrote
+    results_store = None if args.no_results_db else ResultsStore(args.results_db)
+    store_offset = results_store.imported_offset(jsonl_path) if results_store and resume else 0
+    run_metrics.open(args.metrics_output, append=resume)
+    for trial in trials:
+        trial["criteria_version"] = criteria_version(trial["criteria"])
+        # Criterion diff from each earlier criteria version of this trial that previous results were assessed on
+        trial["amendments"] = {}
+
+    # --rescreen-amendments: results assessed on an earlier version of their trial's criteria are
+    # re-screened, only on the changed criteria when the earlier version and criterion IDs allow it
+    previous_results = {}
+    amendment_stats = {"delta": 0, "merged": 0, "full": 0}
+    if args.rescreen_amendments:
+        trials_by_id = {trial["trial_id"]: trial for trial in trials}
+        latest_results = {}
+        for _, result in read_results_jsonl(jsonl_path, include_skipped=True):
+            latest_results[(result.get("patient_id"), result.get("trial_id"))] = result
+        for pair, result in latest_results.items():
+            trial = trials_by_id.get(pair[1])
+            if trial is None or result.get("criteria_version") == trial["criteria_version"]:
+                continue
+            writer.completed.discard(pair)
+            if "skipped" in result:
+                # Pre-filtered on the earlier criteria: the pair goes through the pre-filter again
+                continue
+            previous_results[pair] = result
+            old_version = result.get("criteria_version")
+            if old_version and old_version not in trial["amendments"]:
+                old_criteria = find_criteria_version(old_version, args.cache_path)
+                trial["amendments"][old_version] = diff_criteria(old_criteria, trial["criteria"]) if old_criteria else None
+        for trial in trials:
+            for old_version, diff in trial["amendments"].items():
+                if diff is None:
+                    print(f"Amendment {trial['trial_id']}: criteria version {old_version} is no longer cached, "
+                          f"its results are re-assessed in full")
+                else:
+                    print(f"Amendment {trial['trial_id']}: {old_version} -> {trial['criteria_version']}: "
+                          f"{len(diff['added'])} criteria added or reworded, {len(diff['removed'])} removed, "
+                          f"{len(diff['unchanged'])} unchanged")
+        print(f"{len(previous_results)} result(s) assessed on earlier criteria versions")
+    # --rescreen-changed: a patient with previous results is skipped while their file is unchanged, or
+    # changed only in fields that no trial sends to the model or checks by pre-screen rule; modified
+    # files are diffed by section once converted (and projected to those fields with --project-fields)
+    ehr_index = None
+    ehr_selection = None
+    patient_paths = dict(zip(patient_order, patient_files))
+    modified_patients = {}
+    ehr_skipped = {"unchanged": 0, "touched": 0, "irrelevant": 0}
+    ehr_rescreened = {"relevant": 0, "new": 0}
+    if args.rescreen_changed:
+        ehr_index = EhrChangeIndex(args.cache_path)
+        ehr_selection = union_field_selections(
+            [trial["field_selection"] for trial in trials]
+            + [{rule["section"]: list(rule["names"])} for trial in trials for rule in trial["prescreen_rules"] or []]
+        )
+        for patient_file, patient_id in zip(patient_files, patient_order):
+            if not any((patient_id, trial_id) in writer.completed for trial_id in trial_order):
+                continue
+            status, section_hashes = ehr_index.check(patient_file)
+            if status == "modified":
+                modified_patients[patient_id] = section_hashes or {}
+            elif status == "new":
+                # Not indexed yet, so there is nothing to compare the previous results' input with
+                ehr_rescreened["new"] += 1
+                for trial_id in trial_order:
+                    writer.completed.discard((patient_id, trial_id))
+                    previous_results.pop((patient_id, trial_id), None)
+            else:
+                ehr_skipped[status] += 1
+    if writer.completed:
+        print(f"Resuming: {len(writer.completed)} result(s) already in {jsonl_path}")
+    remaining_files = [
+        patient_file for patient_file, patient_id in zip(patient_files, patient_order)
+        if patient_id in modified_patients or any((patient_id, trial_id) not in writer.completed for trial_id in trial_order)
+    ]
+
+    print(f"Processing {len(patient_files)} patients against {len(trials)} trial(s) "
+          f"({len(patient_files) - len(remaining_files)} patient(s) already done)...")
+
+    result_cache = None if args.no_cache else ResultCache(args.cache_path, args.cache_max_entries)
+    prescreened = []
+    # Characters of patient TOON before and after field projection, over every job handed to the model
+    projection_sizes = [0, 0]
+    compact_profile = None
+    if args.compact_profile:
+        compact_profile = load_compact_profile(args.compact_profile)
+    elif args.compact_toon:
+        compact_profile = COMPACT_PROFILE
+
+    counters = [StageCounter("Ingest (CSV -> TOON)"), StageCounter("Result cache lookup"), StageCounter("Assessment")]
+    ingest_counter, cache_counter, assess_counter = counters
+    # patient ID, trial ID, cache key, criteria version and amendment (previous result, criteria diff)
+    # of every assessment handed to the model, by job index
+    jobs = {}
+    failed = []
+    failed_patients = set()
+
+    def detect_ehr_changes(patient_id, patient_toon):
+        """With --rescreen-changed, stage the section hashes of the fields the trials read and, when the
+        patient's file was modified in one of them, drop their previous results so every trial is re-assessed."""
+        read_toon = patient_toon if ehr_selection is None else project_toon(patient_toon, ehr_selection)
+        section_hashes = toon_section_hashes(read_toon)
+        ehr_index.stage(patient_paths[patient_id], section_hashes)
+        if patient_id not in modified_patients:
+            return
+        relevant = changed_sections(modified_patients[patient_id], section_hashes)
+        if not relevant:
+            ehr_skipped["irrelevant"] += 1
+            print(f"  {patient_id} -> only fields no trial reads changed, previous results kept")
+            return
+        ehr_rescreened["relevant"] += 1
+        print(f"  {patient_id} -> {', '.join(relevant)} changed, re-assessing")
+        for trial_id in trial_order:
+            writer.completed.discard((patient_id, trial_id))
+            previous_results.pop((patient_id, trial_id), None)
+
+    def retrieve_candidates(converted):
+        """Return the candidate trial IDs of each converted patient; runs off the event loop, since with
+        Voyage embeddings every query makes an HTTP call."""
+        return [set(candidate_trial_ids(eligibility_criteria_vector_db, patient_summary(parse_toon(patient_toon)),
+                                        candidate_trials))
+                for _, patient_toon in converted]
+
+    def prepare(patient_id, patient_toon, candidates=None):
+        """Settle each of the patient's trials by pre-screen rules or the result cache; return jobs for the rest.
+
+        The patient's TOON, converted once, is shared by the jobs for every trial; with --project-fields
+        each job gets only the sections and rows in its trial's field selection. With --candidate-trials,
+        `candidates` holds the patient's candidate trial IDs; they are looked up here when not given.
+        """
+        if ehr_index:
+            detect_ehr_changes(patient_id, patient_toon)
+        patient_jobs = []
+        sections = None
+        if candidate_trials and candidates is None:
+            candidates = retrieve_candidates([(patient_id, patient_toon)])[0]
+        for trial in trials:
+            trial_id = trial["trial_id"]
+            if (patient_id, trial_id) in writer.completed:
+                continue
+            if candidates is not None and trial_id not in candidates:
+                prefiltered.append((patient_id, trial_id))
+                writer.skip(patient_id, trial_id, "prefiltered", trial["criteria_version"])
+                continue
+            if trial["prescreen_rules"]:
+                if sections is None:
+                    sections = parse_toon(patient_toon)
+                excluded = prescreen_patient(patient_id, patient_toon, trial["prescreen_rules"], sections)
+                if excluded:
+                    prescreened.append((patient_id, trial_id))
+                    writer.write(patient_id, trial_id, excluded, trial["criteria_version"])
+                    print(f"  {label(patient_id, trial_id)} -> NOT_ELIGIBLE by pre-screen rules")
+                    continue
+            # After an amendment, only the added or reworded criteria are sent and the answer is
+            # merged into the previous result
+            criteria = trial["criteria"]
+            amendment = None
+            previous = previous_results.get((patient_id, trial_id))
+            if previous is not None:
+                diff = trial["amendments"].get(previous.get("criteria_version"))
+                if diff is None or not can_merge_delta(previous):
+                    amendment_stats["full"] += 1
+                elif not diff["added"]:
+                    amendment_stats["merged"] += 1
+                    writer.write(patient_id, trial_id, merge_delta_assessment(previous, {}, diff, trial["criteria_version"]),
+                                 trial["criteria_version"])
+                    continue
+                else:
+                    amendment_stats["delta"] += 1
+                    amendment = (previous, diff)
+                    criteria = delta_criteria(diff["added"])
+            trial_toon = patient_toon
+            if trial["field_selection"]:
+                trial_toon = project_toon(patient_toon, trial["field_selection"])
+            cache_key = assessment_cache_key(build_assessment_request(
+                patient_id, trial_toon, criteria, cascade.cache_model if cascade else ASSESSMENT_MODEL
+            ))
+            cached_result = result_cache.get(cache_key) if result_cache else None
+            cache_counter.record()
+            if cached_result is not None:
+                if amendment:
+                    cached_result = merge_delta_assessment(amendment[0], cached_result, amendment[1], trial["criteria_version"])
+                writer.write(patient_id, trial_id, cached_result, trial["criteria_version"])
+                continue
+            index = len(jobs)
+            jobs[index] = (patient_id, trial_id, cache_key, trial["criteria_version"], amendment)
+            projection_sizes[0] += len(patient_toon)
+            projection_sizes[1] += len(trial_toon)
+            patient_jobs.append((index, patient_id, trial_toon, criteria, trial_id))
+        return patient_jobs
+
+    def record_result(index, result):
+        """Persist each fresh assessment as soon as it completes."""
+        assess_counter.record()
+        patient_id, trial_id, cache_key, version, amendment = jobs[index]
+        if not result:
+            failed.append(label(patient_id, trial_id))
+            failed_patients.add(patient_id)
+            return
+        # The cache keeps the model's answer; a delta answer is merged again on every hit
+        if result_cache:
+            result_cache.put(cache_key, patient_id, result)
+        if amendment:
+            result = merge_delta_assessment(amendment[0], result, amendment[1], version)
+        writer.write(patient_id, trial_id, result, version)
+
+    serial_elapsed = None
+    if args.batch or args.serial or args.compare_serial:
+        # These modes need the whole cohort up front; conversion still runs on the process pool
+        patients = []
+        for patient_id, patient_toon in iter_patient_toons(remaining_files, args.ingest_workers, profile=compact_profile):
+            ingest_counter.record()
+            patients += [job[1:] for job in prepare(patient_id, patient_toon)]
+        print(f"{len(patients)} assessment(s) to run")
+
+    if args.batch:
+        batch_api_client = fake_clients.FakeBatchAnthropic(script=simulated_script) if fake_clients else client
+        poll_interval = args.simulate_latency if args.simulate_latency is not None else args.batch_poll_interval
+        start = time.perf_counter()
+        screen_patients_batch(patients, None, batch_api_client, poll_interval,
+                              on_result=record_result, cascade=cascade)
+        print(f"Batch mode: {time.perf_counter() - start:.2f}s")
+    elif args.serial or args.compare_serial:
+        start = time.perf_counter()
+        # A --compare-serial timing run is discarded; the concurrent engine's results are kept
+        screen_patients_serial(patients, None, sync_api_client,
+                               on_result=record_result if args.serial else lambda index, result: None, cascade=cascade,
+                               patients_per_request=args.patients_per_request)
+        serial_elapsed = time.perf_counter() - start
+        print(f"Serial loop: {serial_elapsed:.2f}s")
+        if not args.serial:
+            # Only report token usage and telemetry for the engine whose results are kept
+            run_usage = TokenUsage()
+            run_metrics.close()
+            run_metrics = CallMetrics()
+            run_metrics.open(args.metrics_output, append=resume)
+            run_groups = GroupedRequestStats()
+            if cascade:
+                cascade = ModelCascade(args.triage_model, args.escalation_confidence)
+            assess_counter = StageCounter("Assessment")
+            counters[2] = assess_counter
+
+    if not args.serial and not args.batch:
+        scheduler = RateLimitScheduler(
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            max_concurrency=args.concurrency,
+            max_retries=args.max_retries
+        )
 
-    # Save results to JSON file for the dashboard
-    output_file = "eligibility_results.json"
-    with open(output_file, "w") as f:
-        json.dump(all_results, f, indent=2)
+        async def run_pipeline():
+            """Ingestion feeds a bounded queue that the assessment workers drain concurrently."""
+            if serial_elapsed is None:
+                queue = asyncio.Queue(maxsize=args.concurrency * 4)
+                feeder = feed_patient_queue(remaining_files, queue, prepare, args.ingest_workers, counter=ingest_counter,
+                                            profile=compact_profile,
+                                            retrieve=retrieve_candidates if candidate_trials else None)
+            else:
+                # --compare-serial already converted the cohort; time the engine on the same jobs
+                queue = asyncio.Queue()
+                for index, patient in enumerate(patients):
+                    queue.put_nowait((index, *patient))
+                queue.put_nowait(None)
+                feeder = asyncio.sleep(0)
+            await asyncio.gather(feeder, screen_patient_queue(
+                queue,
+                None,
+                record_result,
+                max_concurrency=args.concurrency,
+                request_timeout=args.timeout,
+                api_client=async_api_client,
+                scheduler=scheduler,
+                cascade=cascade,
+                patients_per_request=args.patients_per_request
+            ))
 
-    print(f"\nResults saved to {output_file}")
+        start = time.perf_counter()
+        asyncio.run(run_pipeline())
+        concurrent_elapsed = time.perf_counter() - start
+        print(f"Concurrent engine ({args.concurrency} workers): {concurrent_elapsed:.2f}s")
+        print(f"Scheduler: {scheduler.stats['requests']} requests, {scheduler.stats['retries']} retries "
+              f"({scheduler.stats['rate_limited']} rate limited, {scheduler.stats['overloaded']} overloaded, "
+              f"{scheduler.stats['transient']} transient errors), "
+              f"peak concurrency {scheduler.stats['peak_concurrency']}, final limit {scheduler.concurrency_limit}")
+        if serial_elapsed is not None and concurrent_elapsed > 0:
+            print(f"Speedup vs serial loop: {serial_elapsed / concurrent_elapsed:.1f}x")
 
+    writer.close()
+    if candidate_trials:
+        considered = len(prefiltered) + len(prescreened) + cache_counter.items
+        print(f"Trial pre-filter (top {candidate_trials} of {len(trials)}): {len(prefiltered)} of {considered} "
+              f"patient-trial pair(s) skipped, {len(prefiltered) / considered if considered else 0:.0%} fewer "
+              f"assessments than exhaustive screening")
+    if prescreening:
+        print(f"Pre-screen: {len(prescreened)} assessment(s) settled as NOT_ELIGIBLE without a model call")
+    if previous_results:
+        print(f"Amendment re-screen: {amendment_stats['delta']} assessment(s) re-evaluated on the changed criteria only, "
+              f"{amendment_stats['merged']} updated without a model call (criteria only removed), "
+              f"{amendment_stats['full']} re-assessed in full (earlier version unknown or no criterion IDs)")
+    if ehr_index:
+        ehr_index.commit(patient_paths[patient_id] for patient_id in failed_patients)
+        ehr_index.close()
+        print(f"EHR change detection: {sum(ehr_skipped.values())} previously screened patient(s) skipped "
+              f"({ehr_skipped['unchanged']} unchanged, {ehr_skipped['touched']} touched with identical content, "
+              f"{ehr_skipped['irrelevant']} changed only in fields no trial reads); "
+              f"{sum(ehr_rescreened.values())} re-assessed ({ehr_rescreened['relevant']} with changes in fields "
+              f"the trials read, {ehr_rescreened['new']} not indexed yet)")
+    if args.project_fields and projection_sizes[0]:
+        print(f"Field projection: {projection_sizes[1]:,} of {projection_sizes[0]:,} patient TOON characters sent, "
+              f"{1 - projection_sizes[1] / projection_sizes[0]:.0%} fewer")
+    for counter in counters:
+        print(counter.summary())
+    print(run_usage.summary())
+    run_metrics.close()
+    print(run_metrics.summary())
+    if cascade:
+        print(cascade.summary(run_metrics))
+    if run_groups.requests:
+        print(run_groups.summary())
+    if result_cache:
+        result_cache.close()
+        print(result_cache.summary())
+    if failed:
+        print(f"{len(failed)} assessment(s) could not be completed: {', '.join(failed)}")
 
+    # Save results to JSON file for the dashboard, in input order
+    saved = finalize_results(jsonl_path, args.output, patient_order, trial_order)
 
+    print(f"\n{saved} result(s) saved to {args.output}")
+    if results_store:
+        run_id, stored = results_store.import_jsonl(jsonl_path, store_offset, run_started_at, patient_paths)
+        results_store.close()
+        if run_id is None:
+            print(f"No new results to add to {args.results_db}")
+        else:
+            print(f"{stored} result(s) added to {args.results_db} as run {run_id}")
+    if args.protocols_dir:
+        rows = write_eligibility_matrix(jsonl_path, args.matrix_output, patient_order, trial_order)
+        print(f"Eligibility matrix ({rows} patients x {len(trials)} trials) saved to {args.matrix_output}")
@@ -0,0 +1,67 @@
+"""Shared fixtures: the screener and dashboard_data as modules, and CLI runs in a scratch copy of the repo's inputs."""
+import importlib
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCREENER_PATH = os.path.join(REPO_ROOT, "elgibility-screener.py")
+BENCHMARKS_DIR = os.path.join(REPO_ROOT, "benchmarks")
+
+
+@pytest.fixture(scope="session")
+def screener():
+    """elgibility-screener.py imported as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("screener", SCREENER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["screener"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def fake_clients(screener):
+    """benchmarks/fake_clients.py, the fake API clients behind --simulate-latency."""
+    return screener.load_fake_clients()
+
+
+@pytest.fixture(scope="session")
+def dashboard_data():
+    """dashboard_data.py, the dashboard's data layer (importable without Streamlit)."""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    return importlib.import_module("dashboard_data")
+
+
+@pytest.fixture(scope="session")
+def benchmarks(screener):
+    """Import a module from benchmarks/ by name, e.g. benchmarks("common")."""
+    if BENCHMARKS_DIR not in sys.path:
+        sys.path.insert(0, BENCHMARKS_DIR)
+    return importlib.import_module
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    """A scratch directory holding the protocol PDF and a copy of patients/, for CLI runs."""
+    shutil.copy(os.path.join(REPO_ROOT, "clinical-trial-protocol.pdf"), tmp_path)
+    shutil.copytree(os.path.join(REPO_ROOT, "patients"), tmp_path / "patients")
+    return tmp_path
+
+
+@pytest.fixture
+def run_screener(workdir):
+    """Run the screener CLI in workdir with a local fake client; return the completed process."""
+
+    def run(*args):
+        env = dict(os.environ, ANTHROPIC_API_KEY="test", VOYAGE_API_KEY="")
+        process = subprocess.run([sys.executable, SCREENER_PATH, "--simulate-latency", "0", *args],
+                                 cwd=workdir, env=env, capture_output=True, text=True, timeout=300)
+        assert process.returncode == 0, process.stderr
+        return process
+
+    return run
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def patients(fake_clients):
+    return [(f"P{number}", f"PATIENT_DEMOGRAPHICS[1]{{Field,Value}}:\n  age,{60 + number}\n",
+             fake_clients.SIMULATED_CRITERIA) for number in range(5)]
+
+
+def screen(screener, patients, api_client, **kwargs):
+    return screener.screen_patients_batch(patients, None, api_client, poll_interval=0, **kwargs)
+
+
+def submitted(api_client):
+    """The patient count of every batch created, in order."""
+    return [len(batch["requests"]) for batch in api_client.batches.values()]
+
+
+def test_every_patient_is_assessed_in_input_order(screener, fake_clients, patients):
+    api_client = fake_clients.FakeBatchAnthropic(polls_until_ended=2)
+    results = screen(screener, patients, api_client)
+    assert [result["patient_id"] for result in results] == ["P0", "P1", "P2", "P3", "P4"]
+    assert submitted(api_client) == [5]
+
+
+def test_batches_respect_the_request_limit(screener, fake_clients, patients):
+    api_client = fake_clients.FakeBatchAnthropic()
+    results = screen(screener, patients, api_client, max_requests=2)
+    assert all(results)
+    assert submitted(api_client) == [2, 2, 1]
+
+
+def test_errored_requests_are_resubmitted(screener, fake_clients, patients):
+    api_client = fake_clients.FakeBatchAnthropic(fail_patient_ids={"P1", "P3"})
+    results = screen(screener, patients, api_client)
+    assert [result["patient_id"] for result in results] == ["P0", "P1", "P2", "P3", "P4"]
+    assert submitted(api_client) == [5, 2]
+
+
+def test_failures_beyond_max_resubmits_are_reported_as_none(screener, fake_clients, patients):
+    api_client = fake_clients.FakeBatchAnthropic(fail_patient_ids={"P2"})
+    collected = {}
+    assert screen(screener, patients, api_client, max_resubmits=0, on_result=collected.__setitem__) is None
+    assert collected[2] is None
+    assert sorted(index for index, result in collected.items() if result) == [0, 1, 3, 4]
+
+
+def test_invalid_requests_are_not_resubmitted(screener, fake_clients, patients):
+    api_client = fake_clients.FakeBatchAnthropic(fail_patient_ids={"P0"}, error_type="invalid_request_error")
+    results = screen(screener, patients, api_client)
+    assert results[0] is None and all(results[1:])
+    assert submitted(api_client) == [5]
+
+
+def test_resume_submits_only_the_patients_without_results(run_screener, workdir):
+    run_screener("--batch", "--batch-poll-interval", "0")
+    jsonl_path = workdir / "eligibility_results.jsonl"
+    kept = jsonl_path.read_text().splitlines()[:6]
+    # A run interrupted mid-write leaves a partial last line, which resume discards
+    jsonl_path.write_text("\n".join(kept) + "\n" + kept[-1][:20])
+
+    result = run_screener("--batch", "--batch-poll-interval", "0", "--resume", "--no-cache")
+    assert "Submitted batch msgbatch_fake_1 with 9 patient(s)" in result.stdout
+    with open(workdir / "eligibility_results.json") as f:
+        assert sorted(result["patient_id"] for result in json.load(f)) == [f"EHR_{n:03d}" for n in range(1, 16)]
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each benchmark script at its smallest useful size, so CI catches scripts that no longer run
+SMOKE_RUNS = {
+    "bench_csv_to_toon": ["--sizes", "20"],
+    "bench_ingestion": ["--files", "40", "--workers", "0,2"],
+    "bench_toon_tokens": ["--synthetic", "20"],
+    "bench_field_projection": [],
+    "bench_cascade": ["--patients", "20", "--sonnet-latency", "0.01", "--triage-latency", "0.01"],
+    "bench_patient_groups": ["--patients", "16", "--sizes", "1,4", "--latency", "0.01", "--rpm", "60000",
+                             "--tpm", "100000000"],
+    "bench_dashboard_load": ["--sizes", "50", "--repeats", "2"],
+    "bench_excel_report": ["--sizes", "50", "--baseline-max", "50"],
+    "bench_patient_search": ["--patients", "200", "--repeats", "2"],
+    "bench_results_store": ["--sizes", "50", "--runs", "2", "--repeats", "2"],
+}
+
+
+@pytest.mark.parametrize("name", sorted(SMOKE_RUNS))
+def test_benchmark_runs(name, tmp_path):
+    process = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "benchmarks", f"{name}.py"), *SMOKE_RUNS[name]],
+                             cwd=tmp_path, capture_output=True, text=True, timeout=300)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip()
@@ -0,0 +1,97 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+def call(patient_id, **tokens):
+    tokens = dict(dict(input_tokens=100, cache_read_input_tokens=0, cache_creation_input_tokens=0, output_tokens=50), **tokens)
+    return {"timestamp": 1760000000.0, "patient_id": patient_id, "trial_id": "T1", "model": "claude-sonnet-4-20250514",
+            "mode": "interactive", "status": "ok", "latency_s": 1.0, "retries": 0, "cost_usd": 0.001, **tokens}
+
+
+def write_calls(path, calls, mode="w"):
+    with open(path, mode) as f:
+        for line in calls:
+            f.write(json.dumps(line) + "\n")
+
+
+def test_metrics_are_parsed_once_per_file_version(dashboard_data, tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    write_calls(path, [call("EHR_001", cache_read_input_tokens=900)])
+    metrics = dashboard_data.load_call_metrics(str(path))
+    assert metrics["total_input_tokens"].tolist() == [1000]
+    assert str(metrics["timestamp"].dtype).startswith("datetime64")
+    assert dashboard_data.load_call_metrics(str(path)) is metrics
+
+    write_calls(path, [call("EHR_002")], mode="a")
+    reloaded = dashboard_data.load_call_metrics(str(path))
+    assert reloaded is not metrics
+    assert reloaded["patient_id"].tolist() == ["EHR_001", "EHR_002"]
+
+
+def test_missing_or_empty_metrics(dashboard_data, tmp_path):
+    assert dashboard_data.load_call_metrics(str(tmp_path / "missing.jsonl")).empty
+    (tmp_path / "empty.jsonl").write_text("")
+    assert dashboard_data.load_call_metrics(str(tmp_path / "empty.jsonl")).empty
+
+
+def test_grouped_call_tokens_are_split_across_patients(dashboard_data, tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    write_calls(path, [call("EHR_001,EHR_002", input_tokens=300, output_tokens=100), call("EHR_001"),
+                       call("EHR_003", input_tokens=1000)])
+    tokens = dashboard_data.load_patient_tokens(str(path))
+    assert tokens.index.tolist() == ["EHR_003", "EHR_001", "EHR_002"]
+    assert tokens["input_tokens"].to_dict() == {"EHR_003": 1000, "EHR_001": 250, "EHR_002": 150}
+    assert tokens["total"].to_dict() == {"EHR_003": 1050, "EHR_001": 350, "EHR_002": 200}
+    assert dashboard_data.load_patient_tokens(str(path)) is tokens
+    assert dashboard_data.load_patient_tokens(str(tmp_path / "missing.jsonl")).empty
+
+
+def usage(**tokens):
+    return SimpleNamespace(**dict(dict(input_tokens=0, cache_read_input_tokens=0, cache_creation_input_tokens=0,
+                                       output_tokens=0), **tokens))
+
+
+def test_cost_uses_each_token_type_price(screener):
+    model = "claude-sonnet-4-20250514"
+    cost = screener.estimate_cost(model, usage(input_tokens=1_000_000, cache_creation_input_tokens=1_000_000,
+                                               cache_read_input_tokens=1_000_000, output_tokens=1_000_000))
+    assert cost == pytest.approx(3.00 + 3.75 + 0.30 + 15.00)
+    assert screener.estimate_cost(model, usage(output_tokens=1_000_000), batch=True) == pytest.approx(7.50)
+    assert screener.estimate_cost("unpriced-model", usage(output_tokens=1)) is None
+    assert screener.estimate_cost(model, None) is None
+
+
+def test_nearest_rank_percentile(screener):
+    values = list(range(1, 101))
+    assert [screener.percentile(values, fraction) for fraction in (0.5, 0.95, 0.99, 1.0)] == [50, 95, 99, 100]
+    assert screener.percentile([7], 0.99) == 7
+    assert screener.percentile([], 0.5) is None
+
+
+def test_calls_are_logged_and_summarized(screener, tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = screener.CallMetrics()
+    metrics.open(str(path))
+    metrics.record("EHR_001", "T1", screener.TRIAGE_MODEL, usage(input_tokens=1000, output_tokens=100), 0.5)
+    metrics.record("EHR_001", "T1", screener.ASSESSMENT_MODEL, usage(input_tokens=1000, output_tokens=100), 1.5,
+                   retries=2)
+    metrics.record("EHR_002", "T1", screener.ASSESSMENT_MODEL, None, None, status="timeout")
+    metrics.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line["model"], line["latency_s"], line["retries"], line["status"]) for line in lines] == [
+        (screener.TRIAGE_MODEL, 0.5, 0, "ok"), (screener.ASSESSMENT_MODEL, 1.5, 2, "ok"),
+        (screener.ASSESSMENT_MODEL, None, 0, "timeout")]
+    assert lines[0]["cost_usd"] == pytest.approx(0.0015) and lines[2]["cost_usd"] is None
+    assert (metrics.calls, metrics.tokens) == (3, 2200)
+    assert metrics.cost == pytest.approx(0.0015 + 0.0045)
+    # The triage call, priced as if ASSESSMENT_MODEL had made it
+    assert metrics.assessment_model_cost == pytest.approx(0.0045)
+    assert "latency p50 0.50s, p95 1.50s, p99 1.50s" in metrics.summary()
+
+
+def test_batch_calls_have_no_latency(screener):
+    metrics = screener.CallMetrics()
+    metrics.record("EHR_001", "T1", screener.ASSESSMENT_MODEL, usage(output_tokens=1_000_000), None, mode="batch")
+    assert metrics.summary() == "Calls: 1, latency not measured; estimated cost $7.5000"
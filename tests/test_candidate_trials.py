@@ -0,0 +1,58 @@
+import asyncio
+import json
+import shutil
+import time
+
+
+def test_resume_does_not_revisit_prefiltered_pairs(run_screener, workdir):
+    (workdir / "protocols").mkdir()
+    for trial_id in ("TRIAL_A", "TRIAL_B", "TRIAL_C"):
+        shutil.copy(workdir / "clinical-trial-protocol.pdf", workdir / "protocols" / f"{trial_id}.pdf")
+    args = ("--protocols-dir", "protocols", "--candidate-trials", "1", "--embeddings", "hashing")
+
+    first = run_screener(*args)
+    assert "30 of 45 patient-trial pair(s) skipped" in first.stdout
+    lines = [json.loads(line) for line in (workdir / "eligibility_results.jsonl").read_text().splitlines()]
+    assert sum(1 for line in lines if line.get("skipped") == "prefiltered") == 30
+
+    resumed = run_screener(*args, "--resume")
+    assert "(15 patient(s) already done)" in resumed.stdout
+    with open(workdir / "eligibility_results.json") as f:
+        results = json.load(f)
+    assert len(results) == 15 and not any("skipped" in result for result in results)
+    # Pre-filtered pairs are blank cells in the matrix
+    rows = [row.split(",") for row in (workdir / "eligibility_matrix.csv").read_text().splitlines()[1:]]
+    assert all(sum(1 for cell in row[1:] if cell) == 1 for row in rows)
+
+
+def test_retrieval_runs_off_the_event_loop(screener, workdir):
+    patient_files = sorted(str(path) for path in (workdir / "patients").glob("*.csv"))[:4]
+    prepared = []
+
+    def retrieve(converted):
+        time.sleep(0.1)
+        return [f"candidates of {patient_id}" for patient_id, _ in converted]
+
+    def prepare(patient_id, patient_toon, candidates):
+        prepared.append((patient_id, candidates))
+        return [patient_id]
+
+    async def run():
+        queue = asyncio.Queue()
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(asyncio.get_running_loop().time())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        await screener.feed_patient_queue(patient_files, queue, prepare, max_workers=0, retrieve=retrieve)
+        ticker.cancel()
+        return ticks
+
+    ticks = asyncio.run(run())
+    # The loop kept running while each lookup blocked its thread for 0.1s
+    assert len(ticks) > 20
+    assert prepared == [(screener.patient_id_from_path(path), f"candidates of {screener.patient_id_from_path(path)}")
+                        for path in patient_files]
@@ -0,0 +1,38 @@
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+
+def test_review_escalates_uncertain_results(screener):
+    cascade = screener.ModelCascade(min_confidence=0.8)
+    decisive = {"overall_eligibility": "ELIGIBLE", "confidence_score": 0.9, "criteria_evaluation": [{"status": "MET"}]}
+    assert cascade.review(decisive) is None
+    assert cascade.review(None) == "triage failed"
+    assert cascade.review(dict(decisive, overall_eligibility="UNCLEAR")) == "UNCLEAR"
+    assert cascade.review(dict(decisive, confidence_score=0.5)) == "low confidence"
+    assert cascade.review(dict(decisive, criteria_evaluation=[{"status": "NEEDS_VERIFICATION"}])) == "NEEDS_VERIFICATION"
+    assert cascade.triaged == 5 and sum(cascade.escalations.values()) == 4
+
+
+@pytest.mark.parametrize("engine", ["async", "batch"])
+def test_escalated_patients_are_assessed_by_the_assessment_model(screener, fake_clients, engine):
+    script = fake_clients.cascade_script(screener.ASSESSMENT_MODEL)
+    patients = [(f"P{number}", "PATIENT_DEMOGRAPHICS[1]{Field,Value}:\n  age,70\n", fake_clients.SIMULATED_CRITERIA)
+                for number in range(20)]
+    cascade = screener.ModelCascade()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if engine == "async":
+            results = asyncio.run(screener.screen_patients_async(
+                patients, None, 4, api_client=fake_clients.FakeAsyncAnthropic(0, script), cascade=cascade
+            ))
+        else:
+            results = screener.screen_patients_batch(patients, None, fake_clients.FakeBatchAnthropic(script=script),
+                                                     poll_interval=0, cascade=cascade)
+
+    escalated = [result for result in results if result["assessed_by"] == screener.ASSESSMENT_MODEL]
+    assert 0 < len(escalated) < len(results)
+    assert len(escalated) == sum(cascade.escalations.values())
+    assert all(result["escalation_reason"] for result in escalated)
+    assert all(result["overall_eligibility"] in ("ELIGIBLE", "NOT_ELIGIBLE") for result in results)
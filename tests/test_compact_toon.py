@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVERY_NORMALIZATION = (True, True, True)
+
+
+@pytest.mark.parametrize("value, compacted", [
+    ("01/03/2026", "2026-01-03"),
+    ("1/3/2026", "2026-01-03"),
+    ("180.8 lbs (82 kg)", "82 kg"),
+    ("5'9\" (175 cm)", "175 cm"),
+    ("150 lbs", "68.0 kg"),
+    ("1 lb", "0.5 kg"),
+    ("98.6 F", "37.0 C"),
+    ("100.4°F", "38.0 C"),
+    ("Once daily", "QD"),
+    ("Oral", "PO"),
+    ("130/80 mmHg", "130/80 mmHg"),
+    ("26.8 (Overweight)", "26.8 (Overweight)"),
+])
+def test_compact_value(screener, value, compacted):
+    assert screener.compact_value(value, screener.COMPACT_PROFILE, EVERY_NORMALIZATION) == compacted
+
+
+def test_only_the_normalizations_given_apply(screener):
+    assert screener.compact_value("98.6 F", screener.COMPACT_PROFILE, (True, False, True)) == "98.6 F"
+    assert screener.compact_value("01/03/2026", screener.COMPACT_PROFILE, (False, True, True)) == "01/03/2026"
+    assert screener.compact_value("Oral", screener.COMPACT_PROFILE, (True, True, False)) == "Oral"
+
+
+def test_profile_names_the_normalized_columns(screener):
+    profile = screener.COMPACT_PROFILE
+    assert screener.column_normalizations(profile, "VITAL_SIGNS", "Value") == (False, True, False)
+    assert screener.column_normalizations(profile, "VITAL_SIGNS", "Date") == (True, False, False)
+    assert screener.column_normalizations(profile, "MEDICATIONS", "Frequency") == (False, False, True)
+    assert screener.column_normalizations(profile, "MEDICATIONS", "Dose") == (False, False, False)
+    # Older profiles with true/false settings apply them to every column
+    assert screener.column_normalizations({"normalize_dates": True}, "PROBLEM_LIST", "Onset") == (True, False, False)
+
+
+def test_free_text_outside_the_named_columns_is_kept(screener, tmp_path):
+    path = tmp_path / "EHR_900.csv"
+    path.write_text('MEDICATIONS\nMedication,Dose,Route,Frequency,Indication,Prescriber\n'
+                    '"Foley catheter","16 F","Oral","Once daily","Retention","Dr. Urologist"\n'
+                    '"Oral rehydration","2 lbs","Oral","As needed","Dehydration","Dr. GP"\n\n'
+                    'PROBLEM LIST\nCondition,ICD-10 Code,Onset,Status\n'
+                    '"Atrial Fibrillation","I48.91","03/15/2019","Active"\n\n'
+                    'VITAL SIGNS\nMeasurement,Value,Date\n"temp","98.6 F","01/03/2026"\n')
+    assert screener.csv_to_toon(str(path), screener.COMPACT_PROFILE) == (
+        "MEDICATIONS[2]{Medication,Dose,Route,Frequency,Indication}:\n"
+        "  Foley catheter,16 F,PO,QD,Retention\n"
+        "  Oral rehydration,2 lbs,PO,PRN,Dehydration\n"
+        "\n"
+        "PROBLEM_LIST[1]{Condition,ICD-10 Code,Onset,Status}:\n"
+        "  Atrial Fibrillation,I48.91,03/15/2019,Active\n"
+        "\n"
+        "VITAL_SIGNS[1]{Measurement,Value,Date}:\n"
+        "  temp,37.0 C,2026-01-03\n"
+    )
+
+
+def test_bundled_patient_compaction(screener):
+    toon = screener.csv_to_toon(os.path.join(REPO_ROOT, "patients", "EHR_001.csv"), screener.COMPACT_PROFILE)
+    assert toon.startswith("PATIENT_DEMOGRAPHICS[4]{Field,Value}:\n  age,68\n  sex,Male\n")
+    assert "  weight,82 kg,2026-01-03\n" in toon and "  temp,37.0 C,2026-01-03\n" in toon
+    assert "MEDICATIONS[1]{Medication,Dose,Route,Frequency,Indication}:\n  Donepezil,10mg,PO,QD,AD\n" in toon
+    assert "ALLERGIES[0]:\n" in toon
+    assert "Reference Range" not in toon and "Patient 001" not in toon
+    assert len(toon) < len(screener.csv_to_toon(os.path.join(REPO_ROOT, "patients", "EHR_001.csv")))
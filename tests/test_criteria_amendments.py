@@ -0,0 +1,96 @@
+import pytest
+
+CRITERIA = """Inclusion Criteria:
+1. Age 55-85 years
+2. MMSE score 22-30
+   - documented within 3 months
+3. Positive amyloid biomarker
+Exclusion Criteria:
+1. Non-AD dementia"""
+
+# Renumbered, one criterion reworded, one removed and one added
+AMENDED = """Inclusion Criteria:
+1. Age 55-85 years
+2. MMSE score 20-30
+   - documented within 3 months
+Exclusion Criteria:
+1. Non-AD dementia
+2. Recent stroke"""
+
+
+@pytest.fixture
+def items(screener):
+    return {item["text"]: item for item in screener.parse_criteria_items(CRITERIA)}
+
+
+def test_items_group_nested_bullets_and_take_their_section(items):
+    assert list(items) == ["Age 55-85 years", "MMSE score 22-30 - documented within 3 months",
+                           "Positive amyloid biomarker", "Non-AD dementia"]
+    assert [item["id"][:3] for item in items.values()] == ["IN-", "IN-", "IN-", "EX-"]
+
+
+def test_ids_ignore_numbering_and_formatting(screener, items):
+    reformatted = "Inclusion Criteria:\n- **Age 55-85  years**\n"
+    assert screener.parse_criteria_items(reformatted)[0]["id"] == items["Age 55-85 years"]["id"]
+
+
+def test_tagged_criteria_parse_back_to_the_same_ids(screener):
+    tagged = screener.tag_criteria(CRITERIA)
+    assert "1. [IN-" in tagged
+    assert screener.parse_criteria_items(tagged) == screener.parse_criteria_items(CRITERIA)
+    assert screener.tag_criteria(tagged) == tagged
+
+
+def test_diff_reports_added_removed_and_unchanged(screener):
+    diff = screener.diff_criteria(CRITERIA, AMENDED)
+    assert [item["text"] for item in diff["added"]] == ["MMSE score 20-30 - documented within 3 months", "Recent stroke"]
+    assert sorted(item["text"] for item in diff["removed"]) == ["MMSE score 22-30 - documented within 3 months",
+                                                                "Positive amyloid biomarker"]
+    assert [item["text"] for item in diff["unchanged"]] == ["Age 55-85 years", "Non-AD dementia"]
+
+
+def test_delta_criteria_keep_their_ids(screener):
+    added = screener.diff_criteria(CRITERIA, AMENDED)["added"]
+    delta = screener.delta_criteria(added)
+    assert [item["id"] for item in screener.parse_criteria_items(delta)] == [item["id"] for item in added]
+
+
+def evaluation(item, status):
+    return {"criterion_id": item["id"], "criterion": item["text"], "status": status, "score": 1.0}
+
+
+def test_merge_replaces_amended_evaluations_and_recomputes_eligibility(screener, items):
+    previous = {"patient_id": "P1", "overall_eligibility": "ELIGIBLE", "confidence_score": 0.9,
+                "criteria_evaluation": [evaluation(item, "MET") for item in items.values()]}
+    diff = screener.diff_criteria(CRITERIA, AMENDED)
+    delta = {"confidence_score": 0.7, "criteria_evaluation": [evaluation(diff["added"][0], "MET"),
+                                                              evaluation(diff["added"][1], "NOT_MET")]}
+    merged = screener.merge_delta_assessment(previous, delta, diff, "v2")
+
+    assert [item["criterion"] for item in merged["criteria_evaluation"]] == [
+        "Age 55-85 years", "Non-AD dementia", "MMSE score 20-30 - documented within 3 months", "Recent stroke"]
+    assert merged["overall_eligibility"] == "NOT_ELIGIBLE"
+    assert merged["confidence_score"] == 0.7
+    assert merged["criteria_version"] == "v2"
+    assert merged["rescreened_criteria"] == sorted(item["id"] for item in diff["added"])
+    assert previous["overall_eligibility"] == "ELIGIBLE"
+
+
+def test_removal_only_amendments_merge_without_a_delta(screener, items):
+    previous = {"confidence_score": 0.8, "criteria_evaluation": [
+        evaluation(items["Positive amyloid biomarker"], "NEEDS_VERIFICATION"),
+        evaluation(items["Age 55-85 years"], "MET"),
+    ]}
+    diff = {"added": [], "removed": [items["Positive amyloid biomarker"]], "unchanged": []}
+    merged = screener.merge_delta_assessment(previous, {}, diff, "v2")
+    assert merged["overall_eligibility"] == "ELIGIBLE"
+    assert merged["confidence_score"] == 0.8
+
+
+@pytest.mark.parametrize("criteria_evaluation, mergeable", [
+    ([{"criterion_id": "IN-00000000", "status": "MET"}], True),
+    ([{"criterion_id": "IN-00000000", "status": "MET"}, {"criterion": "Age", "status": "MET"}], False),
+    ([], False),
+])
+def test_only_fully_tagged_assessments_can_be_merged(screener, criteria_evaluation, mergeable):
+    assert screener.can_merge_delta({"criteria_evaluation": criteria_evaluation}) is mergeable
@@ -0,0 +1,64 @@
+import os
+import shutil
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROTOCOL = os.path.join(REPO_ROOT, "clinical-trial-protocol.pdf")
+
+
+class CountingClient:
+    """A FakeAnthropic that counts its extraction calls."""
+
+    def __init__(self, fake_clients):
+        self.calls = 0
+        self.fake = fake_clients.FakeAnthropic(0)
+        self.messages = self
+
+    def create(self, **request):
+        self.calls += 1
+        return self.fake.messages.create(**request)
+
+
+@pytest.fixture
+def api_client(fake_clients):
+    return CountingClient(fake_clients)
+
+
+def test_unchanged_protocol_is_not_parsed_or_extracted_again(screener, fake_clients, api_client, tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "cache.sqlite")
+    assert screener.load_eligibility_criteria(PROTOCOL, cache_path, api_client) == (fake_clients.SIMULATED_CRITERIA, False)
+    monkeypatch.setattr(screener, "read_protocol", None)
+    assert screener.load_eligibility_criteria(PROTOCOL, cache_path, api_client) == (fake_clients.SIMULATED_CRITERIA, True)
+    assert api_client.calls == 1
+
+
+def test_new_model_or_changed_pdf_is_extracted_again(screener, api_client, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    protocol = str(tmp_path / "protocol.pdf")
+    shutil.copy(PROTOCOL, protocol)
+    screener.load_eligibility_criteria(protocol, cache_path, api_client)
+    assert not screener.load_eligibility_criteria(protocol, cache_path, api_client, model=screener.ASSESSMENT_MODEL)[1]
+    # Same content under another name is a hit; an amended PDF is not
+    renamed = str(tmp_path / "renamed.pdf")
+    shutil.copy(protocol, renamed)
+    assert screener.load_eligibility_criteria(renamed, cache_path, api_client)[1]
+    with open(protocol, "ab") as f:
+        f.write(b"\n% amended\n")
+    assert not screener.load_eligibility_criteria(protocol, cache_path, api_client)[1]
+    assert api_client.calls == 3
+
+
+def test_trials_keep_input_order(screener, api_client, tmp_path):
+    paths = []
+    for number in range(5):
+        path = str(tmp_path / f"NCT0000000{number}.pdf")
+        with open(PROTOCOL, "rb") as source, open(path, "wb") as f:
+            f.write(source.read() + f"\n% {number}\n".encode())
+        paths.append(path)
+    trials = screener.load_trials(paths[::-1], str(tmp_path / "cache.sqlite"), api_client, max_workers=3)
+    assert [trial["trial_id"] for trial in trials] == [f"NCT0000000{number}" for number in range(4, -1, -1)]
+    assert [trial["protocol"] for trial in trials] == paths[::-1]
+    assert not any(trial["cached"] for trial in trials) and api_client.calls == 5
+    assert all(trial["cached"] for trial in screener.load_trials(paths, str(tmp_path / "cache.sqlite"), api_client))
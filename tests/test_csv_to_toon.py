@@ -0,0 +1,39 @@
+import glob
+import os
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUNDLED_PATIENTS = sorted(glob.glob(os.path.join(REPO_ROOT, "patients", "*.csv")))
+
+
+@pytest.fixture(scope="module")
+def legacy_csv_to_toon(benchmarks):
+    return benchmarks("bench_csv_to_toon").legacy_csv_to_toon
+
+
+@pytest.mark.parametrize("path", BUNDLED_PATIENTS, ids=os.path.basename)
+def test_bundled_patients_match_the_original_converter(screener, legacy_csv_to_toon, path):
+    assert screener.csv_to_toon(path) == legacy_csv_to_toon(path)
+
+
+def test_synthetic_patients_match_the_original_converter(screener, benchmarks, legacy_csv_to_toon, tmp_path):
+    paths = benchmarks("common").write_synthetic_patients(str(tmp_path / "cohort"), 200)
+    assert [path for path in paths if screener.csv_to_toon(path) != legacy_csv_to_toon(path)] == []
+
+
+@pytest.mark.parametrize("text", [
+    # Short rows are padded and long rows truncated to the header
+    "VITAL SIGNS\nMeasurement,Value,Date\nbp,120/80\nhr,70 bpm,01/03/2026,extra\n",
+    # Blank lines, whitespace-only cells and padding around values
+    "\n,,\nPATIENT DEMOGRAPHICS\n Field , Value \n\n age , 72 \n",
+    # A section without rows, a repeated section and rows before any section
+    "orphan,row\nALLERGIES\nAllergen,Reaction\nMEDICATIONS\nMedication,Dose\nDonepezil,10mg\nMEDICATIONS\nMedication\nMemantine\n",
+    # Quoted commas and a mixed-case line that is not a section header
+    'PROBLEM LIST\nCondition,Code\n"Alzheimer\'s Disease, early onset",G30.0\nNot A Section\n',
+])
+def test_edge_cases_match_the_original_converter(screener, legacy_csv_to_toon, tmp_path, text):
+    path = tmp_path / "EHR_TEST.csv"
+    path.write_text(text)
+    assert screener.csv_to_toon(str(path)) == legacy_csv_to_toon(str(path))
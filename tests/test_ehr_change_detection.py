@@ -0,0 +1,51 @@
+import json
+
+
+def test_rescreen_changed_after_normal_run(run_screener, workdir):
+    run_screener()
+    # Served from the result cache, whose SQLite file the EHR index writes to at the end of the run
+    second = run_screener("--rescreen-changed")
+    assert "15 re-assessed" in second.stdout
+    third = run_screener("--rescreen-changed")
+    assert "15 previously screened patient(s) skipped (15 unchanged" in third.stdout
+    with open(workdir / "eligibility_results.json") as f:
+        assert len(json.load(f)) == 15
+
+
+def edit_patient(workdir, old, new, patient="EHR_001"):
+    path = workdir / "patients" / f"{patient}.csv"
+    text = path.read_text()
+    assert old in text
+    path.write_text(text.replace(old, new))
+
+
+def indexed_run(run_screener, *args):
+    """Screen every patient and index their files, so the next --rescreen-changed pass has a baseline."""
+    run_screener(*args)
+    run_screener("--rescreen-changed", *args)
+
+
+def test_vital_signs_and_demographics_changes_are_rescreened(run_screener, workdir):
+    indexed_run(run_screener)
+    edit_patient(workdir, '"hr","72 bpm"', '"hr","96 bpm"')
+    edit_patient(workdir, '"age","', '"age","9', patient="EHR_002")
+    result = run_screener("--rescreen-changed")
+    assert "EHR_001 -> VITAL_SIGNS changed, re-assessing" in result.stdout
+    assert "EHR_002 -> PATIENT_DEMOGRAPHICS changed, re-assessing" in result.stdout
+    assert "2 re-assessed (2 with changes" in result.stdout
+
+
+def test_changes_to_fields_not_sent_are_skipped(run_screener, workdir):
+    indexed_run(run_screener, "--compact-toon")
+    edit_patient(workdir, "123 Clinical Way", "9 Other Street")
+    result = run_screener("--rescreen-changed", "--compact-toon")
+    assert "EHR_001 -> only fields no trial reads changed, previous results kept" in result.stdout
+
+
+def test_field_projection_limits_the_compared_fields(run_screener, workdir):
+    indexed_run(run_screener, "--project-fields")
+    edit_patient(workdir, '"temp","98.6 F"', '"temp","99.1 F"')
+    edit_patient(workdir, '"hr","', '"hr","1', patient="EHR_002")
+    result = run_screener("--rescreen-changed", "--project-fields")
+    assert "EHR_001 -> only fields no trial reads changed" in result.stdout
+    assert "EHR_002 -> VITAL_SIGNS changed, re-assessing" in result.stdout
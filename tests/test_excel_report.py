@@ -0,0 +1,130 @@
+import gc
+import os
+import threading
+import time
+
+import pytest
+
+
+def result(number):
+    return {"patient_id": f"P{number}", "trial_id": "T1", "overall_eligibility": "ELIGIBLE",
+            "confidence_score": 0.9, "recommendation": "Enroll",
+            "criteria_evaluation": [{"criterion": "Age 50-85", "patient_value": "70", "status": "MET", "score": 1}]}
+
+
+@pytest.fixture
+def reports(dashboard_data, monkeypatch, tmp_path):
+    """dashboard_data with an empty report cache writing into tmp_path."""
+    monkeypatch.setattr(dashboard_data, "_reports", {})
+    monkeypatch.setattr(dashboard_data, "_report_locks", {})
+    monkeypatch.setattr(dashboard_data, "_report_downloads", {})
+    monkeypatch.setattr(dashboard_data, "_released_reports", set())
+    monkeypatch.setattr(dashboard_data, "_report_dir", str(tmp_path))
+    return dashboard_data
+
+
+def slow_writes(dashboard_data, monkeypatch):
+    """Make write_excel_report take 0.2s; return the list of (start, end) times of each write."""
+    writes = []
+    write_excel_report = dashboard_data.write_excel_report
+
+    def write(*args):
+        start = time.perf_counter()
+        time.sleep(0.2)
+        write_excel_report(*args)
+        writes.append((start, time.perf_counter()))
+
+    monkeypatch.setattr(dashboard_data, "write_excel_report", write)
+    return writes
+
+
+def in_threads(func, *calls):
+    paths = [None] * len(calls)
+
+    def run(index, args):
+        paths[index] = func(*args)
+
+    threads = [threading.Thread(target=run, args=(index, args)) for index, args in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return paths
+
+
+def test_report_is_cached_per_version_and_filter(reports):
+    data = reports.ResultsData([result(1), result(2)], ("results.json", 1, 1))
+    assert reports.cached_excel_report(data, ["ELIGIBLE"]) is None
+    path = reports.excel_report(data, ["ELIGIBLE"])
+    assert os.path.getsize(path) > 0
+    assert reports.cached_excel_report(data, ["ELIGIBLE"]) == path
+    assert reports.excel_report(data, ["ELIGIBLE"]) == path
+    assert reports.cached_excel_report(data, ["ELIGIBLE"], 0.5) is None
+
+
+def test_different_reports_are_written_in_parallel(reports, monkeypatch):
+    writes = slow_writes(reports, monkeypatch)
+    data = reports.ResultsData([result(1)], ("results.json", 1, 1))
+    paths = in_threads(reports.excel_report, (data, ["ELIGIBLE"]), (data, ["ELIGIBLE"], 0.5))
+    assert len(set(paths)) == 2
+    (first_start, first_end), (second_start, second_end) = writes
+    assert first_start < second_end and second_start < first_end
+
+
+def test_same_report_is_written_once(reports, monkeypatch):
+    writes = slow_writes(reports, monkeypatch)
+    data = reports.ResultsData([result(1)], ("results.json", 1, 1))
+    paths = in_threads(reports.excel_report, *[(data, ["ELIGIBLE"])] * 4)
+    assert len(writes) == 1
+    assert len(set(paths)) == 1
+
+
+def test_oldest_reports_are_deleted(reports):
+    data = reports.ResultsData([result(1)], ("results.json", 1, 1))
+    paths = [reports.excel_report(data, ["ELIGIBLE"], threshold / 10)
+             for threshold in range(reports.MAX_CACHED_REPORTS + 1)]
+    assert not os.path.exists(paths[0])
+    assert all(os.path.exists(path) for path in paths[1:])
+    assert len(reports._reports) == reports.MAX_CACHED_REPORTS
+
+
+def test_unsaved_results_report_is_deleted_once_read(reports):
+    data = reports.ResultsData([result(1)])
+    path = reports.excel_report(data, ["ELIGIBLE"])
+    assert reports.cached_excel_report(data, ["ELIGIBLE"]) is None
+    assert reports.read_excel_report(path, remove=True).startswith(b"PK")
+    assert not os.path.exists(path)
+
+
+def test_evicted_report_is_kept_for_a_pending_download(reports):
+    data = reports.ResultsData([result(1)], ("results.json", 1, 1))
+    first = reports.excel_report(data, ["ELIGIBLE"])
+    download = reports.report_download(first)
+    for threshold in range(1, reports.MAX_CACHED_REPORTS + 1):
+        reports.excel_report(data, ["ELIGIBLE"], threshold / 10)
+    assert reports.cached_excel_report(data, ["ELIGIBLE"]) is None
+    assert download().startswith(b"PK")
+    del download
+    gc.collect()
+    assert not os.path.exists(first)
+
+
+def test_cached_report_outlives_its_downloads(reports):
+    data = reports.ResultsData([result(1)], ("results.json", 1, 1))
+    path = reports.excel_report(data, ["ELIGIBLE"])
+    reports.report_download(path)
+    gc.collect()
+    assert reports.cached_excel_report(data, ["ELIGIBLE"]) == path
+    assert reports._report_downloads == {}
+
+
+def test_unsaved_results_report_is_deleted_with_its_download(reports):
+    data = reports.ResultsData([result(1)])
+    path = reports.excel_report(data, ["ELIGIBLE"])
+    download = reports.report_download(path, remove=True)
+    # Clicked twice before the next rerun
+    assert download() == download()
+    del download
+    gc.collect()
+    assert not os.path.exists(path)
+    assert reports.report_download(path) is None
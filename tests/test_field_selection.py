@@ -0,0 +1,101 @@
+import os
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATIENT_TOON = """PATIENT_DEMOGRAPHICS[4]{Field,Value}:
+  name,Patient 001
+  age,68
+  sex,Male
+  address,123 Clinical Way, Research City
+
+VITAL_SIGNS[2]{Measurement,Value,Date}:
+  bp,130/80 mmHg,2026-01-03
+  temp,37.0 C,2026-01-03
+
+MEDICATIONS[1]{Medication,Dose,Route,Frequency,Indication,Prescriber}:
+  Donepezil,10mg,PO,QD,AD,Dr. Neurologist
+
+ALLERGIES[0]:
+
+LABORATORY_RESULTS[1]{Test,Value,Reference Range,Date,Flag}:
+  MMSE,24,24-30,2026-01-03,Normal
+"""
+
+
+class SelectionClient:
+    """An api_client whose field selection tool call returns `sections`."""
+
+    def __init__(self, sections):
+        self.messages = self
+        self.sections = sections
+
+    def create(self, **request):
+        return SimpleNamespace(content=[SimpleNamespace(type="tool_use", name="record_field_selection",
+                                                        input={"sections": self.sections})])
+
+
+def test_projection_keeps_only_the_selected_rows(screener):
+    projected = screener.project_toon(PATIENT_TOON, {"PATIENT_DEMOGRAPHICS": ["Age", "SEX"], "VITAL_SIGNS": ["bp"]})
+    assert projected == ("PATIENT_DEMOGRAPHICS[2]{Field,Value}:\n  age,68\n  sex,Male\n\n"
+                         "VITAL_SIGNS[1]{Measurement,Value,Date}:\n  bp,130/80 mmHg,2026-01-03\n")
+
+
+def test_empty_field_list_keeps_the_whole_section(screener):
+    projected = screener.project_toon(PATIENT_TOON, {"MEDICATIONS": [], "LABORATORY_RESULTS": []})
+    assert projected == ("MEDICATIONS[1]{Medication,Dose,Route,Frequency,Indication,Prescriber}:\n"
+                         "  Donepezil,10mg,PO,QD,AD,Dr. Neurologist\n\n"
+                         "LABORATORY_RESULTS[1]{Test,Value,Reference Range,Date,Flag}:\n"
+                         "  MMSE,24,24-30,2026-01-03,Normal\n")
+
+
+def test_sections_without_selected_rows_are_dropped(screener):
+    projected = screener.project_toon(PATIENT_TOON, {"VITAL_SIGNS": ["weight"], "PROBLEM_LIST": [],
+                                                     "PATIENT_DEMOGRAPHICS": ["age"]})
+    assert projected == "PATIENT_DEMOGRAPHICS[1]{Field,Value}:\n  age,68\n"
+
+
+def test_explicit_empty_sections_are_kept(screener):
+    # ALLERGIES[0]: records that the patient has none, which a criterion may depend on
+    projected = screener.project_toon(PATIENT_TOON, {"ALLERGIES": [], "PATIENT_DEMOGRAPHICS": ["sex"]})
+    assert projected == "PATIENT_DEMOGRAPHICS[1]{Field,Value}:\n  sex,Male\n\nALLERGIES[0]:\n"
+
+
+def test_projection_of_a_bundled_patient(screener):
+    patient_toon = screener.csv_to_toon(os.path.join(REPO_ROOT, "patients", "EHR_001.csv"))
+    projected = screener.project_toon(patient_toon, {"PATIENT_DEMOGRAPHICS": ["age", "sex"], "LABORATORY_RESULTS": []})
+    assert "  age,68" in projected and "  mrn," not in projected and "MMSE" in projected
+    assert "VITAL_SIGNS" not in projected and "Donepezil" not in projected
+
+
+def test_model_selection_is_cleaned_up(screener):
+    api_client = SelectionClient([
+        {"section": "VITAL_SIGNS", "fields": ["BP", "pulse"]},
+        {"section": "VITAL_SIGNS", "fields": ["hr"]},
+        {"section": "PATIENT_DEMOGRAPHICS", "fields": ["dob"]},
+        {"section": "MEDICATIONS", "fields": ["Donepezil"]},
+        {"section": "SOCIAL_HISTORY", "fields": []},
+    ])
+    selection = screener.select_ehr_fields("Age 55-85 years", api_client)
+    # Unknown rows and sections are ignored, and age and sex are always kept
+    assert selection == {"VITAL_SIGNS": ["bp", "hr"], "PATIENT_DEMOGRAPHICS": ["dob", "age", "sex"],
+                         "MEDICATIONS": []}
+
+
+def test_selection_is_cached_per_criteria(screener, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    api_client = SelectionClient([{"section": "LABORATORY_RESULTS", "fields": []}])
+    selection, cache_hit = screener.load_field_selection("MMSE 22-30", cache_path, api_client)
+    assert not cache_hit
+    api_client.sections = []
+    assert screener.load_field_selection("MMSE 22-30", cache_path, api_client) == (selection, True)
+    assert screener.load_field_selection("MMSE 20-30", cache_path, api_client)[0] == {"PATIENT_DEMOGRAPHICS": ["age", "sex"]}
+
+
+def test_union_keeps_what_any_trial_reads(screener):
+    union = screener.union_field_selections([
+        {"PATIENT_DEMOGRAPHICS": ["age"], "VITAL_SIGNS": ["bp"]},
+        {"PATIENT_DEMOGRAPHICS": ["sex", "age"], "VITAL_SIGNS": []},
+    ])
+    assert union == {"PATIENT_DEMOGRAPHICS": ["age", "sex"], "VITAL_SIGNS": []}
+    assert screener.union_field_selections([{"MEDICATIONS": []}, None]) is None
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def patient_files(benchmarks, tmp_path_factory):
+    return benchmarks("common").write_synthetic_patients(str(tmp_path_factory.mktemp("cohort")), 25)
+
+
+def test_process_pool_matches_in_process_conversion(screener, patient_files):
+    serial = list(screener.iter_patient_toons(patient_files, max_workers=0))
+    assert [patient_id for patient_id, _ in serial] == [screener.patient_id_from_path(path) for path in patient_files]
+    assert list(screener.iter_patient_toons(patient_files, max_workers=2, chunk_size=4)) == serial
+
+
+def test_compaction_profile_reaches_the_workers(screener, patient_files):
+    compacted = list(screener.iter_patient_toons(patient_files[:5], max_workers=2, chunk_size=2,
+                                                 profile=screener.COMPACT_PROFILE))
+    assert compacted == [(screener.patient_id_from_path(path), screener.csv_to_toon(path, screener.COMPACT_PROFILE))
+                         for path in patient_files[:5]]
+
+
+def drain(screener, patient_files, prepare, **kwargs):
+    """Run feed_patient_queue to completion; return the queued jobs up to the sentinel."""
+    async def run():
+        queue = asyncio.Queue()
+        await screener.feed_patient_queue(patient_files, queue, prepare, **kwargs)
+        jobs = []
+        while (job := queue.get_nowait()) is not None:
+            jobs.append(job)
+        return jobs
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_feeder_queues_every_patient_in_order(screener, patient_files, max_workers):
+    counter = screener.StageCounter("Ingestion")
+    jobs = drain(screener, patient_files, lambda patient_id, patient_toon: [patient_id, patient_id + "-T2"],
+                 max_workers=max_workers, chunk_size=4, counter=counter)
+    patient_ids = [screener.patient_id_from_path(path) for path in patient_files]
+    assert jobs == [job for patient_id in patient_ids for job in (patient_id, patient_id + "-T2")]
+    assert counter.items == len(patient_files)
+
+
+def test_feeder_ends_the_queue_when_conversion_fails(screener, patient_files, tmp_path):
+    async def run():
+        queue = asyncio.Queue()
+        with pytest.raises(FileNotFoundError):
+            await screener.feed_patient_queue(patient_files[:3] + [str(tmp_path / "EHR_MISSING.csv")], queue,
+                                              lambda patient_id, patient_toon: [patient_id], max_workers=0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    # The workers still see the end of the queue after the patients converted so far
+    assert asyncio.run(run()) == [screener.patient_id_from_path(path) for path in patient_files[:3]] + [None]
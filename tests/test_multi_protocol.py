@@ -0,0 +1,45 @@
+import csv
+import json
+import shutil
+
+
+def test_trial_id_is_the_protocol_file_name(screener):
+    assert screener.trial_id_from_path("protocols/NCT01234567.pdf") == "NCT01234567"
+
+
+def test_entries_carry_their_own_criteria_and_trial(screener):
+    assert screener.unpack_patient(("EHR_001", "toon"), "run criteria") == ("EHR_001", "toon", "run criteria", None)
+    assert screener.unpack_patient(("EHR_001", "toon", "trial criteria", "T2"), "run criteria") == (
+        "EHR_001", "toon", "trial criteria", "T2")
+
+
+def test_matrix_follows_the_patient_and_trial_order(screener, tmp_path):
+    jsonl_path, matrix_path = str(tmp_path / "results.jsonl"), str(tmp_path / "matrix.csv")
+    writer = screener.ResultWriter(jsonl_path)
+    writer.write("EHR_002", "T2", {"overall_eligibility": "ELIGIBLE"})
+    writer.write("EHR_001", "T1", {"overall_eligibility": "UNCLEAR"})
+    writer.write("EHR_001", "T3", {"overall_eligibility": "NOT_ELIGIBLE"})
+    writer.skip("EHR_002", "T1", "prefiltered")
+    writer.write("EHR_001", "T1", {"overall_eligibility": "LIKELY_ELIGIBLE"})
+    writer.close()
+    assert screener.write_eligibility_matrix(jsonl_path, matrix_path, ["EHR_001", "EHR_002"], ["T1", "T2"]) == 2
+    with open(matrix_path, newline="") as f:
+        assert list(csv.reader(f)) == [["patient_id", "T1", "T2", "T3"],
+                                       ["EHR_001", "LIKELY_ELIGIBLE", "", "NOT_ELIGIBLE"],
+                                       ["EHR_002", "", "ELIGIBLE", ""]]
+
+
+def test_every_patient_is_screened_against_every_protocol(run_screener, workdir):
+    (workdir / "protocols").mkdir()
+    for trial_id in ("NCT_A", "NCT_B"):
+        shutil.copy(workdir / "clinical-trial-protocol.pdf", workdir / "protocols" / f"{trial_id}.pdf")
+    output = run_screener("--protocols-dir", "protocols").stdout
+    assert "Processing 15 patients against 2 trial(s)" in output
+    assert "Eligibility matrix (15 patients x 2 trials)" in output
+    with open(workdir / "eligibility_results.json") as f:
+        results = json.load(f)
+    assert [(result["patient_id"], result["trial_id"]) for result in results[:4]] == [
+        ("EHR_001", "NCT_A"), ("EHR_001", "NCT_B"), ("EHR_002", "NCT_A"), ("EHR_002", "NCT_B")]
+    assert len(results) == 30
+    # Both trials are cached per pair, so a second run makes no model calls
+    assert "Result cache: 30 hit(s), 0 miss(es)" in run_screener("--protocols-dir", "protocols").stdout
@@ -0,0 +1,42 @@
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+
+def patients(fake_clients, count):
+    return [(f"P{number}", f"PATIENT_DEMOGRAPHICS[1]{{Field,Value}}:\n  age,{60 + number}\n",
+             fake_clients.SIMULATED_CRITERIA) for number in range(count)]
+
+
+def test_group_request_budgets_output_per_patient(screener, fake_clients):
+    group = [patient[:2] for patient in patients(fake_clients, screener.MAX_PATIENTS_PER_REQUEST)]
+    request = screener.build_group_assessment_request(group, fake_clients.SIMULATED_CRITERIA)
+    assert request["max_tokens"] == screener.ASSESSMENT_MAX_TOKENS * len(group)
+    assert request["max_tokens"] <= screener.MAX_REQUEST_OUTPUT_TOKENS
+    assert request["messages"][-1]["content"].count("<patient>") == len(group)
+
+
+def test_group_request_refuses_more_patients_than_fit(screener, fake_clients, monkeypatch):
+    group = [patient[:2] for patient in patients(fake_clients, screener.MAX_PATIENTS_PER_REQUEST + 1)]
+    # Refused before any prompt is built
+    monkeypatch.setattr(screener, "build_assessment_request", None)
+    with pytest.raises(ValueError):
+        screener.build_group_assessment_request(group, fake_clients.SIMULATED_CRITERIA)
+
+
+@pytest.mark.parametrize("engine", ["async", "serial"])
+def test_engines_split_oversized_groups(screener, fake_clients, engine):
+    cohort = patients(fake_clients, 25)
+    screener.run_groups = screener.GroupedRequestStats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if engine == "async":
+            results = asyncio.run(screener.screen_patients_async(
+                cohort, None, 1, api_client=fake_clients.FakeAsyncAnthropic(0), patients_per_request=25
+            ))
+        else:
+            results = screener.screen_patients_serial(cohort, None, fake_clients.FakeAnthropic(0), patients_per_request=25)
+    assert [result["patient_id"] for result in results] == [patient[0] for patient in cohort]
+    assert screener.run_groups.requests == 3
+    assert screener.run_groups.fallbacks == 0
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+ALL = ("ELIGIBLE", "NOT_ELIGIBLE", "LIKELY_ELIGIBLE", "UNCLEAR")
+# patient_id, status, confidence, MRN
+PATIENTS = [
+    ("EHR_001", "ELIGIBLE", 0.9, "202600001"),
+    ("EHR_002", "NOT_ELIGIBLE", 0.4, "202600002"),
+    ("EHR_010", "UNCLEAR", 0.5, "771100010"),
+    ("ABC_100", "ELIGIBLE", 0.7, "202699100"),
+    ("EHR_011", "LIKELY_ELIGIBLE", 0.9, None),
+]
+
+
+def result(patient_id, status, confidence):
+    return {"patient_id": patient_id, "trial_id": "T1", "overall_eligibility": status, "confidence_score": confidence,
+            "recommendation": "Review", "criteria_evaluation": []}
+
+
+@pytest.fixture
+def store(dashboard_data, screener, tmp_path):
+    """A StoreResultsData over PATIENTS, with MRNs read from their EHR files."""
+    jsonl_path, db_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite")
+    patient_files = {}
+    with open(jsonl_path, "w") as f:
+        for patient_id, status, confidence, mrn in PATIENTS:
+            f.write(json.dumps(result(patient_id, status, confidence)) + "\n")
+            if mrn is not None:
+                patient_files[patient_id] = str(tmp_path / f"{patient_id}.csv")
+                with open(patient_files[patient_id], "w") as ehr:
+                    ehr.write(f"PATIENT DEMOGRAPHICS\nField,Value\n\"mrn\",\"{mrn}\"\n\nVITAL SIGNS\n")
+    results_store = screener.ResultsStore(db_path)
+    results_store.import_jsonl(str(jsonl_path), patient_files=patient_files)
+    results_store.close()
+    return dashboard_data.StoreResultsData(db_path)
+
+
+@pytest.fixture
+def in_memory(dashboard_data):
+    return dashboard_data.ResultsData([result(patient_id, status, confidence)
+                                       for patient_id, status, confidence, _ in PATIENTS])
+
+
+def ids(page):
+    return page[0]["patient_id"].tolist(), page[1]
+
+
+@pytest.mark.parametrize("source", ["store", "in_memory"])
+def test_short_queries_match_the_start_of_the_id(source, request):
+    data = request.getfixturevalue(source)
+    assert ids(data.search(ALL, query="eh")) == (["EHR_001", "EHR_002", "EHR_010", "EHR_011"], 4)
+    assert ids(data.search(ALL, query="10")) == ([], 0)
+
+
+@pytest.mark.parametrize("source", ["store", "in_memory"])
+def test_longer_queries_match_anywhere_in_the_id(source, request):
+    data = request.getfixturevalue(source)
+    assert ids(data.search(ALL, query=" r_01 ")) == (["EHR_010", "EHR_011"], 2)
+    assert ids(data.search(["UNCLEAR"], query="R_01")) == (["EHR_010"], 1)
+
+
+def test_store_searches_mrns(store):
+    assert store._has_search_index
+    assert ids(store.search(ALL, query="20")) == (["ABC_100", "EHR_001", "EHR_002"], 3)
+    assert ids(store.search(ALL, query="699")) == (["ABC_100"], 1)
+    page, _ = store.search(ALL, query="771100010")
+    assert page["mrn"].tolist() == ["771100010"]
+
+
+def test_store_search_without_the_full_text_index(store):
+    # SQLite without FTS5 trigrams scans the patients table instead
+    store._has_search_index = False
+    assert ids(store.search(ALL, query="r_01")) == (["EHR_010", "EHR_011"], 2)
+    assert ids(store.search(ALL, query="699")) == (["ABC_100"], 1)
+
+
+def test_like_wildcards_are_matched_literally(store):
+    assert ids(store.search(ALL, query="_"))[1] == 0
+    assert ids(store.search(ALL, query="%"))[1] == 0
+
+
+@pytest.mark.parametrize("source", ["store", "in_memory"])
+@pytest.mark.parametrize("sort, expected", [
+    ("patient_id", ["ABC_100", "EHR_001", "EHR_002", "EHR_010", "EHR_011"]),
+    ("confidence_desc", ["EHR_001", "EHR_011", "ABC_100", "EHR_010", "EHR_002"]),
+    ("confidence_asc", ["EHR_002", "EHR_010", "ABC_100", "EHR_001", "EHR_011"]),
+    ("status", ["ABC_100", "EHR_001", "EHR_002", "EHR_011", "EHR_010"]),
+])
+def test_sort_orders(source, sort, expected, request):
+    data = request.getfixturevalue(source)
+    assert ids(data.search(ALL, sort=sort)) == (expected, 5)
+
+
+@pytest.mark.parametrize("source", ["store", "in_memory"])
+def test_pages(source, request):
+    data = request.getfixturevalue(source)
+    pages = [ids(data.search(ALL, 0.45, page=page, page_size=2)) for page in range(3)]
+    assert pages == [(["ABC_100", "EHR_001"], 4), (["EHR_010", "EHR_011"], 4), ([], 4)]
@@ -0,0 +1,63 @@
+import pytest
+
+
+def labs(**values):
+    return {"LABORATORY_RESULTS": [{"Test": test.replace("_", " "), "Value": value} for test, value in values.items()]}
+
+
+def rule(screener, criterion):
+    return next(rule for rule in screener.PRESCREEN_RULES if rule["criterion"].startswith(criterion))
+
+
+@pytest.mark.parametrize("value, status", [("24", "MET"), ("18", "NOT_MET"), ("31", "NOT_MET")])
+def test_range_rule(screener, value, status):
+    evaluation = screener.evaluate_prescreen_rule(rule(screener, "MMSE"), labs(MMSE=value))
+    assert evaluation["status"] == status
+    assert evaluation["patient_value"] == value
+
+
+@pytest.mark.parametrize("value, status", [("0.5", "MET"), ("1.0", "MET"), ("2", "NOT_MET")])
+def test_numeric_one_of_rule(screener, value, status):
+    evaluation = screener.evaluate_prescreen_rule(rule(screener, "CDR"), labs(CDR_Global=value))
+    assert evaluation["status"] == status
+
+
+@pytest.mark.parametrize("value, status", [("Positive", "MET"), ("negative", "NOT_MET")])
+def test_categorical_rule(screener, value, status):
+    evaluation = screener.evaluate_prescreen_rule(rule(screener, "Biomarker"), labs(Amyloid_PET=value))
+    assert evaluation["status"] == status
+
+
+@pytest.mark.parametrize("criterion, sections", [
+    ("MMSE", labs(MMSE="not done")),
+    ("CDR", labs(CDR_Global="Pending")),
+    ("Biomarker", labs(Amyloid_PET="Pending")),
+    ("Biomarker", labs(Amyloid_CSF="Equivocal")),
+    ("Biomarker", labs(MMSE="24")),
+])
+def test_missing_or_unparseable_values_are_undecided(screener, criterion, sections):
+    assert screener.evaluate_prescreen_rule(rule(screener, criterion), sections) is None
+
+
+def test_any_passing_value_meets_the_rule(screener):
+    sections = labs(Amyloid_PET="Negative", Amyloid_CSF="Positive")
+    assert screener.evaluate_prescreen_rule(rule(screener, "Biomarker"), sections)["status"] == "MET"
+
+
+def patient_toon(age, **lab_values):
+    rows = "\n".join(f"  {test.replace('_', ' ')},{value}" for test, value in lab_values.items())
+    return (f"PATIENT_DEMOGRAPHICS[1]{{Field,Value}}:\n  age,{age}\n"
+            f"LABORATORY_RESULTS[{len(lab_values)}]{{Test,Value}}:\n{rows}\n")
+
+
+def test_prescreen_patient_excludes_on_a_failed_rule(screener):
+    result = screener.prescreen_patient("EHR_X", patient_toon(72, MMSE="12", Amyloid_PET="Pending"))
+    assert result["overall_eligibility"] == "NOT_ELIGIBLE"
+    assert [evaluation["status"] for evaluation in result["criteria_evaluation"]] == ["MET", "NOT_MET"]
+    assert "MMSE Score 22-30 (patient value: 12)" in result["recommendation"]
+
+
+def test_prescreen_patient_leaves_undecided_patients_for_the_model(screener):
+    toon = patient_toon(72, MMSE="24", CDR_Global="Pending", Amyloid_PET="Pending")
+    assert screener.prescreen_patient("EHR_X", toon) is None
+
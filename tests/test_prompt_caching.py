@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def usage(screener, monkeypatch):
+    """A fresh run-level TokenUsage, with call telemetry kept off disk."""
+    monkeypatch.setattr(screener, "run_usage", screener.TokenUsage())
+    monkeypatch.setattr(screener, "run_metrics", screener.CallMetrics())
+    return screener.run_usage
+
+
+def test_requests_share_the_criteria_prefix(screener, fake_clients):
+    first = screener.build_assessment_request("EHR_001", "age,70", fake_clients.SIMULATED_CRITERIA)
+    second = screener.build_assessment_request("EHR_002", "age,80", fake_clients.SIMULATED_CRITERIA)
+    for field in ("model", "tools", "tool_choice", "system"):
+        assert first[field] == second[field]
+    # The breakpoint closes the criteria block; the patient's data comes after it
+    assert first["system"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert "<trialeligibilitycriteria>" in first["system"][-1]["text"]
+    assert "age,70" in first["messages"][-1]["content"] and "age,70" not in str(first["system"])
+
+
+def test_group_requests_share_the_single_patient_prefix(screener, fake_clients):
+    single = screener.build_assessment_request("EHR_001", "age,70", fake_clients.SIMULATED_CRITERIA)
+    group = screener.build_group_assessment_request([("EHR_001", "age,70"), ("EHR_002", "age,80")],
+                                                    fake_clients.SIMULATED_CRITERIA)
+    assert (group["tools"], group["system"]) == (single["tools"], single["system"])
+
+
+def test_first_request_warms_the_cache_before_the_others(screener, fake_clients, usage):
+    api_client = fake_clients.FakeAsyncAnthropic(0.05)
+    calls = []
+    create = api_client.messages.create
+
+    async def record(**request):
+        start = asyncio.get_running_loop().time()
+        response = await create(**request)
+        calls.append((start, asyncio.get_running_loop().time()))
+        return response
+
+    api_client.messages.create = record
+    patients = [(f"EHR_{number:03d}", f"age,{60 + number}") for number in range(6)]
+    scheduler = screener.RateLimitScheduler(requests_per_minute=60000, tokens_per_minute=10 ** 9, max_concurrency=6)
+    results = asyncio.run(screener.screen_patients_async(patients, fake_clients.SIMULATED_CRITERIA, max_concurrency=6,
+                                                         api_client=api_client, scheduler=scheduler))
+    assert all(results)
+    first_end = min(end for _, end in calls)
+    assert sum(1 for start, _ in calls if start < first_end) == 1
+    # One cache write; the rest of the first wave reads it
+    assert usage.calls == 6
+    assert usage.cache_creation_input_tokens > 0
+    assert usage.cache_read_input_tokens == 5 * usage.cache_creation_input_tokens
+
+
+def test_token_usage_summary_splits_the_input(screener):
+    usage = screener.TokenUsage()
+    usage.record(SimpleNamespace(input_tokens=100, cache_read_input_tokens=300, cache_creation_input_tokens=0,
+                                 output_tokens=50))
+    usage.record(None)
+    assert usage.calls == 1
+    assert usage.summary() == ("Tokens over 1 call(s): 300 cache hit, 0 cache write, 100 uncached input, "
+                               "50 output (75% of input served from cache)")
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def cache(screener, tmp_path):
+    cache = screener.ResultCache(str(tmp_path / "cache.sqlite"), max_entries=3)
+    yield cache
+    cache.connection.close()
+
+
+def put(cache, *keys):
+    for key in keys:
+        cache.put(key, f"patient {key}", {"overall_eligibility": "ELIGIBLE", "key": key})
+        # Distinct last_used times, so the LRU order is well defined
+        time.sleep(0.002)
+
+
+def keys(cache):
+    return sorted(key for (key,) in cache.connection.execute("SELECT key FROM assessments"))
+
+
+def test_key_covers_every_prompt_input(screener, fake_clients):
+    def key(**changes):
+        arguments = dict(dict(patient_id="EHR_001", patient_toon="age,70", eligibility_criteria=fake_clients.SIMULATED_CRITERIA),
+                         **changes)
+        return screener.assessment_cache_key(screener.build_assessment_request(**arguments))
+
+    assert key() == key()
+    assert len({key(), key(patient_toon="age,71"), key(patient_id="EHR_002"),
+                key(eligibility_criteria=fake_clients.SIMULATED_CRITERIA + "\n2. MMSE 20-30"),
+                key(model=screener.TRIAGE_MODEL)}) == 5
+
+
+def test_hits_and_misses(cache):
+    put(cache, "a")
+    assert cache.get("a") == {"overall_eligibility": "ELIGIBLE", "key": "a"}
+    assert cache.get("b") is None
+    assert (cache.stats["hits"], cache.stats["misses"], cache.stats["writes"]) == (1, 1, 1)
+
+
+def test_eviction_drops_the_least_recently_used(cache):
+    put(cache, "a", "b", "c", "d", "e")
+    # Reading "a" makes it the most recently used
+    cache.get("a")
+    cache.evict()
+    assert keys(cache) == ["a", "d", "e"]
+    assert cache.stats["evictions"] == 2
+    cache.evict()
+    assert cache.stats["evictions"] == 2
+
+
+def test_entries_survive_reopening(screener, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = screener.ResultCache(path, max_entries=1)
+    put(cache, "a", "b")
+    cache.close()
+    reopened = screener.ResultCache(path)
+    assert reopened.get("a") is None and reopened.get("b")["key"] == "b"
+    reopened.close()
+
+
+def test_second_run_is_served_from_the_cache(run_screener):
+    run_screener()
+    second = run_screener()
+    assert "Result cache: 15 hit(s), 0 miss(es) (100% served from cache)" in second.stdout
+    assert "Result cache: 0 hit(s), 15 miss(es)" in run_screener("--compact-toon").stdout
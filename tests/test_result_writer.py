@@ -0,0 +1,69 @@
+import json
+
+
+def test_resume_keeps_complete_lines_and_drops_a_partial_one(screener, tmp_path):
+    jsonl_path = str(tmp_path / "results.jsonl")
+    writer = screener.ResultWriter(jsonl_path)
+    writer.write("EHR_001", "T1", {"overall_eligibility": "ELIGIBLE"}, "v1")
+    writer.skip("EHR_002", "T1", "prefiltered")
+    writer.close()
+    with open(jsonl_path, "a") as f:
+        f.write('{"patient_id": "EHR_003", "overall_eli')
+
+    resumed = screener.ResultWriter(jsonl_path, resume=True)
+    assert resumed.completed == {("EHR_001", "T1"), ("EHR_002", "T1")}
+    resumed.write("EHR_003", "T1", {"overall_eligibility": "NOT_ELIGIBLE"})
+    resumed.close()
+    lines = [json.loads(line) for line in open(jsonl_path)]
+    assert lines == [
+        {"overall_eligibility": "ELIGIBLE", "patient_id": "EHR_001", "trial_id": "T1", "criteria_version": "v1"},
+        {"skipped": "prefiltered", "patient_id": "EHR_002", "trial_id": "T1"},
+        {"overall_eligibility": "NOT_ELIGIBLE", "patient_id": "EHR_003", "trial_id": "T1"},
+    ]
+    # Skip markers are not results
+    assert [result["patient_id"] for _, result in screener.read_results_jsonl(jsonl_path)] == ["EHR_001", "EHR_003"]
+
+
+def test_a_fresh_writer_starts_over(screener, tmp_path):
+    jsonl_path = str(tmp_path / "results.jsonl")
+    screener.ResultWriter(jsonl_path).write("EHR_001", "T1", {})
+    writer = screener.ResultWriter(jsonl_path)
+    writer.close()
+    assert writer.completed == set() and open(jsonl_path).read() == ""
+
+
+def test_finalize_orders_results_and_keeps_the_latest(screener, tmp_path):
+    jsonl_path, output = str(tmp_path / "results.jsonl"), str(tmp_path / "results.json")
+    writer = screener.ResultWriter(jsonl_path)
+    for patient_id, trial_id, confidence in [("EHR_002", "T2", 0.1), ("EHR_001", "T1", 0.2), ("EHR_002", "T1", 0.3),
+                                             ("EHR_009", "T1", 0.4), ("EHR_002", "T2", 0.5)]:
+        writer.write(patient_id, trial_id, {"confidence_score": confidence})
+    writer.close()
+    assert screener.finalize_results(jsonl_path, output, ["EHR_001", "EHR_002"], ["T1", "T2"]) == 4
+    with open(output) as f:
+        results = json.load(f)
+    assert [(result["patient_id"], result["trial_id"], result["confidence_score"]) for result in results] == [
+        ("EHR_001", "T1", 0.2), ("EHR_002", "T1", 0.3), ("EHR_002", "T2", 0.5), ("EHR_009", "T1", 0.4)]
+    assert not (tmp_path / "results.json.tmp").exists()
+
+
+def test_finalize_without_results_writes_an_empty_array(screener, tmp_path):
+    output = tmp_path / "results.json"
+    assert screener.finalize_results(str(tmp_path / "missing.jsonl"), str(output)) == 0
+    assert json.loads(output.read_text()) == []
+
+
+def test_interrupted_run_resumes_where_it_stopped(run_screener, workdir):
+    run_screener("--no-cache")
+    jsonl = workdir / "eligibility_results.jsonl"
+    lines = jsonl.read_text().splitlines(keepends=True)
+    # As if the run had crashed while writing its sixth result
+    jsonl.write_text("".join(lines[:5]) + lines[5][:20])
+    resumed = run_screener("--no-cache", "--resume")
+    assert "(5 patient(s) already done)" in resumed.stdout
+    # Only the other ten were assessed and appended
+    assert len(jsonl.read_text().splitlines()) == 15
+    with open(workdir / "eligibility_results.json") as f:
+        results = json.load(f)
+    assert [result["patient_id"] for result in results] == sorted(result["patient_id"] for result in results)
+    assert len(results) == 15
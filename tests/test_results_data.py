@@ -0,0 +1,108 @@
+import json
+import sys
+import threading
+
+
+def result(patient_id, trial_id="T1", status="ELIGIBLE", confidence=0.9, criteria=("MET", "NOT_MET")):
+    return {"patient_id": patient_id, "trial_id": trial_id, "overall_eligibility": status, "confidence_score": confidence,
+            "recommendation": "Review",
+            "criteria_evaluation": [{"criterion": f"Criterion {position}", "patient_value": "x", "status": criterion,
+                                     "score": 1} for position, criterion in enumerate(criteria)]}
+
+
+def write_results(path, results):
+    path.write_text(json.dumps(results))
+
+
+def test_results_are_parsed_once_per_file_version(dashboard_data, tmp_path):
+    path = tmp_path / "results.json"
+    write_results(path, [result("EHR_001")])
+    first = dashboard_data.load_results_data(str(path), None)
+    assert dashboard_data.load_results_data(str(path), None) is first
+    assert first.signature == dashboard_data.file_signature(str(path))
+
+    write_results(path, [result("EHR_001"), result("EHR_002")])
+    second = dashboard_data.load_results_data(str(path), None)
+    assert second is not first and len(second) == 2
+
+
+def test_missing_results_are_empty(dashboard_data, tmp_path):
+    data = dashboard_data.load_results_data(str(tmp_path / "results.json"), str(tmp_path / "results.sqlite"))
+    assert len(data) == 0 and data.signature is None
+    assert data.summary(dashboard_data.ELIGIBILITY_STATUSES)["total"] == 0
+
+
+def sample(dashboard_data):
+    return dashboard_data.ResultsData([
+        result("EHR_001", criteria=("MET", "MET")),
+        result("EHR_002", status="NOT_ELIGIBLE", confidence=0.4, criteria=("NOT_MET",)),
+        {"patient_id": "EHR_003", "trial_id": "T1", "overall_eligibility": "UNCLEAR", "confidence_score": None},
+        result("EHR_004", status="LIKELY_ELIGIBLE", confidence=0.7, criteria=("NEEDS_VERIFICATION", "MET", "NOT_MET")),
+    ])
+
+
+def test_filter_applies_statuses_and_confidence(dashboard_data):
+    data = sample(dashboard_data)
+    view = data.filter(["ELIGIBLE", "LIKELY_ELIGIBLE", "UNCLEAR"], 0.5)
+    assert view["patient_id"].tolist() == ["EHR_001", "EHR_004"]
+    assert data.filter(["UNCLEAR", "LIKELY_ELIGIBLE", "ELIGIBLE"], 0.5) is view
+    assert data.filter([])["patient_id"].tolist() == []
+
+
+def test_patients_tally_each_results_criteria(dashboard_data):
+    patients = sample(dashboard_data).patients
+    assert patients[["criteria", "met", "not_met", "review"]].values.tolist() == [
+        [2, 2, 0, 0], [1, 0, 1, 0], [0, 0, 0, 0], [3, 1, 1, 1]]
+    assert patients["confidence"].tolist() == [0.9, 0.4, 0.0, 0.7]
+
+
+def test_summary_of_a_filter(dashboard_data):
+    data = sample(dashboard_data)
+    summary = data.summary(dashboard_data.ELIGIBILITY_STATUSES, 0.5)
+    assert summary["total"] == 2
+    assert summary["status_counts"] == {"ELIGIBLE": 1, "NOT_ELIGIBLE": 0, "LIKELY_ELIGIBLE": 1, "UNCLEAR": 0}
+    assert abs(summary["average_confidence"] - 0.8) < 1e-9
+    assert summary["criteria_checked"] == 5
+    assert summary["criteria_counts"] == {"MET": 3, "NOT_MET": 1, "NEEDS_VERIFICATION": 1}
+    assert data.status_counts == {"ELIGIBLE": 1, "NOT_ELIGIBLE": 1, "LIKELY_ELIGIBLE": 1, "UNCLEAR": 1}
+
+
+def test_criteria_and_results_by_row(dashboard_data):
+    data = sample(dashboard_data)
+    assert data.criteria_for(3)["status"].tolist() == ["NEEDS_VERIFICATION", "MET", "NOT_MET"]
+    assert data.criteria_for(2).empty
+    assert [r["patient_id"] for r in data.results_for([3, 0])] == ["EHR_004", "EHR_001"]
+    assert data.result_for(1)["overall_eligibility"] == "NOT_ELIGIBLE"
+
+
+def test_criteria_rows_follow_the_filter(dashboard_data):
+    data = sample(dashboard_data)
+    rows = list(data.criteria_rows(["ELIGIBLE", "NOT_ELIGIBLE"]))
+    assert [(patient_id, status) for patient_id, _, _, status, _ in rows] == [
+        ("EHR_001", "MET"), ("EHR_001", "MET"), ("EHR_002", "NOT_MET")]
+
+
+def test_views_are_cached_safely_across_threads(dashboard_data):
+    cache = {}
+    errors = []
+
+    def remember(offset):
+        try:
+            for key in range(offset, offset + 2000):
+                dashboard_data._remember(cache, key, key)
+        except Exception as e:
+            errors.append(e)
+
+    # Switch threads as often as possible, so unguarded evictions race within the test
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=remember, args=(offset,)) for offset in range(0, 16000, 2000)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert len(cache) <= dashboard_data.MAX_CACHED_VIEWS
@@ -0,0 +1,118 @@
+import json
+import sqlite3
+
+
+def result(patient_id, trial_id="T1", status="ELIGIBLE", confidence=0.9, criteria=("MET", "NOT_MET")):
+    return {"patient_id": patient_id, "trial_id": trial_id, "overall_eligibility": status, "confidence_score": confidence,
+            "recommendation": "Review", "criteria_version": "v1",
+            "criteria_evaluation": [{"criterion_id": f"IN-{position}", "criterion": f"Criterion {position}",
+                                     "patient_value": "x", "status": criterion, "score": 1}
+                                    for position, criterion in enumerate(criteria)]}
+
+
+def append(path, *lines):
+    with open(path, "a") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+
+def rows(db_path, query):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(query).fetchall()
+    finally:
+        connection.close()
+
+
+def test_import_keeps_history_and_marks_the_latest(screener, tmp_path):
+    jsonl_path, db_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite")
+    append(jsonl_path, result("EHR_001"), result("EHR_002"))
+    store = screener.ResultsStore(db_path)
+    assert store.import_jsonl(str(jsonl_path)) == (1, 2)
+
+    append(jsonl_path, result("EHR_001", status="NOT_ELIGIBLE", confidence=0.4))
+    offset = store.imported_offset(str(jsonl_path))
+    assert offset > 0
+    assert store.import_jsonl(str(jsonl_path), offset) == (2, 1)
+    store.close()
+
+    assert rows(db_path, "SELECT patient_id, overall_eligibility, is_latest FROM assessments ORDER BY assessment_id") == [
+        ("EHR_001", "ELIGIBLE", 0), ("EHR_002", "ELIGIBLE", 1), ("EHR_001", "NOT_ELIGIBLE", 1)]
+    assert rows(db_path, "SELECT met, not_met, review FROM assessments WHERE assessment_id = 1") == [(1, 1, 0)]
+    assert rows(db_path, "SELECT run_id, assessments FROM runs") == [(1, 2), (2, 1)]
+
+
+def test_latest_line_of_a_pair_wins_within_one_import(screener, tmp_path):
+    jsonl_path, db_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite")
+    append(jsonl_path, result("EHR_001"), {"patient_id": "EHR_002", "trial_id": "T1", "skipped": "prefiltered"},
+           result("EHR_001", confidence=0.5))
+    store = screener.ResultsStore(db_path)
+    assert store.import_jsonl(str(jsonl_path)) == (1, 1)
+    assert [result["confidence_score"] for result in store.latest_results()] == [0.5]
+    store.close()
+
+
+def test_resumed_run_with_nothing_new_records_no_run(screener, tmp_path):
+    jsonl_path, db_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite")
+    append(jsonl_path, result("EHR_001"))
+    store = screener.ResultsStore(db_path)
+    store.import_jsonl(str(jsonl_path))
+    assert store.import_jsonl(str(jsonl_path), store.imported_offset(str(jsonl_path))) == (None, 0)
+    store.close()
+    assert rows(db_path, "SELECT COUNT(*) FROM runs") == [(1,)]
+
+
+def test_export_round_trips_the_criteria(screener, tmp_path):
+    jsonl_path, db_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite")
+    append(jsonl_path, result("EHR_002"), result("EHR_001", trial_id="T2"))
+    store = screener.ResultsStore(db_path)
+    store.import_jsonl(str(jsonl_path))
+    store.close()
+    assert screener.export_results_json(db_path, str(tmp_path / "results.json")) == 2
+    with open(tmp_path / "results.json") as f:
+        exported = json.load(f)
+    assert [(item["patient_id"], item["trial_id"]) for item in exported] == [("EHR_001", "T2"), ("EHR_002", "T1")]
+    assert exported[0]["criteria_evaluation"] == result("EHR_001")["criteria_evaluation"]
+
+
+def test_simulated_runs_stay_out_of_the_default_store(run_screener, workdir):
+    run_screener()
+    assert not (workdir / "eligibility_results.sqlite").exists()
+    run_screener("--results-db", "simulated.sqlite")
+    assert rows(str(workdir / "simulated.sqlite"), "SELECT COUNT(*) FROM assessments") == [(15,)]
+    resumed = run_screener("--results-db", "simulated.sqlite", "--resume")
+    assert "No new results to add to simulated.sqlite" in resumed.stdout
+    assert rows(str(workdir / "simulated.sqlite"), "SELECT COUNT(*) FROM runs") == [(1,)]
+
+
+def test_dashboard_can_read_the_json_despite_a_store(dashboard_data, screener, tmp_path):
+    jsonl_path, db_path, json_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite"), tmp_path / "results.json"
+    append(jsonl_path, result("EHR_001"))
+    store = screener.ResultsStore(db_path)
+    store.import_jsonl(str(jsonl_path))
+    store.close()
+    json_path.write_text(json.dumps([result("EHR_001"), result("EHR_002")]))
+    assert isinstance(dashboard_data.load_results_data(str(json_path), db_path), dashboard_data.StoreResultsData)
+    assert len(dashboard_data.load_results_data(str(json_path), None)) == 2
+
+
+def test_store_and_json_results_agree(dashboard_data, screener, tmp_path):
+    results = [result("EHR_001", criteria=("MET", "NEEDS_VERIFICATION")),
+               result("EHR_002", status="NOT_ELIGIBLE", confidence=0.3, criteria=("NOT_MET",)),
+               result("EHR_003", status="UNCLEAR", confidence=0.6, criteria=())]
+    jsonl_path, db_path = tmp_path / "results.jsonl", str(tmp_path / "results.sqlite")
+    append(jsonl_path, *results)
+    store = screener.ResultsStore(db_path)
+    store.import_jsonl(str(jsonl_path))
+    store.close()
+    stored, in_memory = dashboard_data.StoreResultsData(db_path), dashboard_data.ResultsData(results)
+
+    for statuses, min_confidence in ((dashboard_data.ELIGIBILITY_STATUSES, 0.0), (["ELIGIBLE", "UNCLEAR"], 0.5)):
+        assert stored.summary(statuses, min_confidence) == in_memory.summary(statuses, min_confidence)
+        assert (stored.filter(statuses, min_confidence)["patient_id"].tolist()
+                == in_memory.filter(statuses, min_confidence)["patient_id"].tolist())
+        assert list(stored.criteria_rows(statuses, min_confidence)) == list(in_memory.criteria_rows(statuses, min_confidence))
+    assessment_id = stored.filter(["ELIGIBLE"]).index[0]
+    assert stored.result_for(assessment_id)["criteria_evaluation"] == results[0]["criteria_evaluation"]
+    columns = dashboard_data.CRITERIA_COLUMNS
+    assert stored.criteria_for(assessment_id)[columns].values.tolist() == in_memory.criteria_for(0)[columns].values.tolist()
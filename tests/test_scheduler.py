@@ -0,0 +1,202 @@
+import asyncio
+
+import anthropic
+import httpx
+import pytest
+
+REQUEST = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+
+
+def status_error(status_code, retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(status_code, headers=headers, request=REQUEST)
+    error_class = anthropic.RateLimitError if status_code == 429 else anthropic.APIStatusError
+    return error_class(f"{status_code} response", response=response, body=None)
+
+
+def scripted_call(*errors):
+    """A make_call that raises `errors` in order, then returns "ok"; records each call's time."""
+    errors = list(errors)
+    calls = []
+
+    async def make_call():
+        calls.append(asyncio.get_running_loop().time())
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return make_call, calls
+
+
+def scheduler(screener, **kwargs):
+    kwargs = dict(dict(requests_per_minute=60000, tokens_per_minute=10 ** 9, base_delay=0.001), **kwargs)
+    return screener.RateLimitScheduler(**kwargs)
+
+
+def test_429_retries_after_the_requested_delay_and_halves_concurrency(screener):
+    async def run():
+        gate = scheduler(screener, max_concurrency=8)
+        make_call, calls = scripted_call(status_error(429, retry_after=0.2))
+        assert await gate.run(make_call, 100) == "ok"
+        return gate, calls
+
+    gate, calls = asyncio.run(run())
+    assert calls[1] - calls[0] >= 0.2
+    assert gate.stats["rate_limited"] == 1 and gate.stats["retries"] == 1
+    assert gate.concurrency_limit == 2
+
+
+def test_529_is_retried_as_overload(screener):
+    async def run():
+        gate = scheduler(screener)
+        make_call, _ = scripted_call(status_error(529), status_error(529))
+        call_stats = {}
+        assert await gate.run(make_call, 100, call_stats) == "ok"
+        return gate, call_stats
+
+    gate, call_stats = asyncio.run(run())
+    assert gate.stats["overloaded"] == 2 and call_stats["retries"] == 2
+
+
+@pytest.mark.parametrize("error", [
+    status_error(500), status_error(502), status_error(503),
+    anthropic.APIConnectionError(request=REQUEST), anthropic.APITimeoutError(request=REQUEST), asyncio.TimeoutError(),
+])
+def test_transient_errors_are_retried_without_reducing_concurrency(screener, error):
+    async def run():
+        gate = scheduler(screener, max_concurrency=8)
+        make_call, calls = scripted_call(error)
+        assert await gate.run(make_call, 100) == "ok"
+        return gate, calls
+
+    gate, calls = asyncio.run(run())
+    assert len(calls) == 2
+    assert gate.stats["transient"] == 1 and gate.stats["rate_limited"] == gate.stats["overloaded"] == 0
+    assert gate.concurrency_limit == 4
+
+
+def test_other_errors_are_not_retried(screener):
+    async def run():
+        make_call, calls = scripted_call(status_error(400))
+        with pytest.raises(anthropic.APIStatusError):
+            await scheduler(screener).run(make_call, 100)
+        return calls
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_gives_up_after_max_retries(screener):
+    async def run():
+        gate = scheduler(screener, max_retries=2)
+        make_call, calls = scripted_call(*[status_error(503)] * 5)
+        with pytest.raises(anthropic.APIStatusError):
+            await gate.run(make_call, 100)
+        return calls
+
+    assert len(asyncio.run(run())) == 3
+
+
+def test_concurrency_grows_by_one_per_window_of_successes(screener):
+    async def run():
+        gate = scheduler(screener, max_concurrency=4)
+        limits = []
+        for _ in range(8):
+            make_call, _ = scripted_call()
+            await gate.run(make_call, 100)
+            limits.append(gate.concurrency_limit)
+        return limits
+
+    # Starts at half of max_concurrency, then +1 after `limit` successes, up to max_concurrency
+    assert asyncio.run(run()) == [2, 3, 3, 3, 4, 4, 4, 4]
+
+
+def test_in_flight_calls_stay_within_the_limit(screener):
+    async def run():
+        gate = scheduler(screener, max_concurrency=6)
+        peak = 0
+
+        async def make_call():
+            nonlocal peak
+            peak = max(peak, gate.in_flight)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        await asyncio.gather(*(gate.run(make_call, 100) for _ in range(30)))
+        return gate, peak
+
+    gate, peak = asyncio.run(run())
+    assert peak <= gate.max_concurrency
+    assert gate.stats["peak_concurrency"] == peak
+
+
+def test_token_budget_paces_calls(screener):
+    async def run():
+        gate = scheduler(screener, tokens_per_minute=600)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for tokens in (600, 5):
+            make_call, _ = scripted_call()
+            await gate.run(make_call, tokens)
+        return loop.time() - start
+
+    # The first call drains the full bucket; the second waits for 5 tokens to refill at 10/s
+    assert asyncio.run(run()) >= 0.45
+
+
+def test_retry_after_headers(screener):
+    def error(headers):
+        response = httpx.Response(429, headers=headers, request=REQUEST)
+        return anthropic.RateLimitError("429 response", response=response, body=None)
+
+    assert screener.retry_after_seconds(error({"retry-after-ms": "250", "retry-after": "3"})) == 0.25
+    assert screener.retry_after_seconds(error({"retry-after": "3"})) == 3.0
+    # An HTTP-date or other unparsable value falls back to the scheduler's backoff
+    assert screener.retry_after_seconds(error({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+    assert screener.retry_after_seconds(error({})) is None
+    assert screener.retry_after_seconds(asyncio.TimeoutError()) is None
+
+
+def test_burst_of_throttles_halves_concurrency_once(screener):
+    async def run():
+        gate = scheduler(screener, max_concurrency=16)
+        limits = []
+
+        async def make_call():
+            limits.append(gate.concurrency_limit)
+            if len(limits) <= 4:
+                await asyncio.sleep(0.01)
+                raise status_error(529)
+            return "ok"
+
+        await asyncio.gather(*(gate.run(make_call, 100) for _ in range(4)))
+        return gate, limits
+
+    gate, limits = asyncio.run(run())
+    assert gate.stats["overloaded"] == 4
+    # All four fail within a second: 8 -> 4, not 8 -> 4 -> 2 -> 1 -> 1
+    assert limits[4] == 4
+
+
+def test_concurrency_never_drops_below_one(screener):
+    gate = scheduler(screener, max_concurrency=2)
+    for _ in range(3):
+        gate._last_decrease = 0.0
+        gate._record_throttle()
+    assert gate.concurrency_limit == 1
+
+
+def test_429_pauses_every_caller(screener):
+    async def run():
+        gate = scheduler(screener)
+        throttled, throttled_calls = scripted_call(status_error(429, retry_after=0.3))
+        other, other_calls = scripted_call()
+
+        async def later():
+            await asyncio.sleep(0.05)
+            await gate.run(other, 100)
+
+        await asyncio.gather(gate.run(throttled, 100), later())
+        return throttled_calls, other_calls
+
+    throttled_calls, other_calls = asyncio.run(run())
+    assert other_calls[0] - throttled_calls[0] >= 0.3
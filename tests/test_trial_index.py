@@ -0,0 +1,51 @@
+import pytest
+
+
+def trials(*trial_ids, criteria="Inclusion Criteria:\n1. Age 50-85 years"):
+    return [{"trial_id": trial_id, "criteria": f"{criteria} ({trial_id})", "protocol": f"protocols/{trial_id}.pdf"}
+            for trial_id in trial_ids]
+
+
+@pytest.fixture
+def sync(screener, tmp_path):
+    """Sync trials into a Chroma index in tmp_path with the local hashing embeddings; return the stats and indexed IDs."""
+    def run(trial_list, **kwargs):
+        vector_store, stats = screener.embed_eligibility_criteria(
+            trial_list, screener.HashingEmbeddings(), str(tmp_path / "chroma"), "test", **kwargs
+        )
+        return stats, sorted(vector_store.get()["ids"])
+
+    return run
+
+
+def test_unchanged_protocols_are_not_embedded_again(sync):
+    stats, ids = sync(trials("A", "B", "C"))
+    assert stats["embedded"] == 3 and stats["batches"] == 1 and ids == ["A", "B", "C"]
+    stats, _ = sync(trials("A", "B", "C"))
+    assert stats["embedded"] == 0 and stats["unchanged"] == 3 and stats["batches"] == 0
+
+
+def test_protocols_are_embedded_in_batches(sync):
+    stats, _ = sync(trials("A", "B", "C", "D", "E"), batch_size=2)
+    assert stats["batches"] == 3
+
+
+def test_changed_protocol_is_embedded_again(sync):
+    sync(trials("A", "B"))
+    stats, ids = sync(trials("A") + trials("B", criteria="Inclusion Criteria:\n1. Age 55-85 years"))
+    assert (stats["embedded"], stats["unchanged"]) == (1, 1)
+    assert ids == ["A", "B"]
+
+
+def test_single_protocol_sync_keeps_the_portfolio(sync):
+    sync(trials("A", "B", "C"), prune=True)
+    stats, ids = sync(trials("B"))
+    assert stats["removed"] == 0 and ids == ["A", "B", "C"]
+    stats, _ = sync(trials("A", "B", "C"), prune=True)
+    assert stats["embedded"] == 0
+
+
+def test_prune_removes_protocols_no_longer_present(sync):
+    sync(trials("A", "B", "C"))
+    stats, ids = sync(trials("A", "C"), prune=True)
+    assert stats["removed"] == 1 and ids == ["A", "C"]